@@ -1,3 +1,6 @@
+import asyncio
+import contextlib
+import functools
 import os
 
 import structlog
@@ -5,11 +8,14 @@ from aiohttp.client_exceptions import ClientError, ClientResponseError
 from dotenv import load_dotenv
 from fastapi import FastAPI, Query, Request, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, Response
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 
+from animeippo import admission, memory, precompute
 from animeippo.logging import configure_logging
 from animeippo.profiling import analyser
 from animeippo.profiling.characteristics import Characteristics
+from animeippo.profiling.model import UserProfile
+from animeippo.providers.abstract_provider import QueryProfile
 from animeippo.recommendation import recommender_builder
 from animeippo.view import views
 
@@ -19,37 +25,128 @@ log_level = configure_logging()
 logger = structlog.get_logger()
 
 DEBUG = os.getenv("DEBUG", "false").lower() == "true"
+# Per request memory use by pipeline stage, slows requests down noticeably
+MEMORY_TRACKING = os.getenv("MEMORY_TRACKING", "false").lower() == "true"
+
+if MEMORY_TRACKING:
+    memory.enable()
+
+ADMISSION_QUEUE_SIZE = int(os.getenv("ADMISSION_QUEUE_SIZE", "8"))
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "5"))
+# Concurrent requests per worker to CPU heavy endpoints, 0 disables the limit.
+# Other endpoints are cheap and bypass admission.
+limiters = {
+    path: admission.AdmissionLimiter(
+        int(os.getenv(variable, "2")),
+        queue_size=ADMISSION_QUEUE_SIZE,
+        queue_timeout=ADMISSION_QUEUE_TIMEOUT,
+    )
+    for path, variable in [
+        ("/recommend", "RECOMMEND_CONCURRENCY"),
+        ("/analyse", "ANALYSE_CONCURRENCY"),
+    ]
+}
+
+# UTC hour to precompute recommendations for recently active users, unset disables
+PRECOMPUTE_HOUR = os.getenv("PRECOMPUTE_HOUR")
+PRECOMPUTE_MAX_USERS = int(os.getenv("PRECOMPUTE_MAX_USERS", str(precompute.DEFAULT_MAX_USERS)))
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    if PRECOMPUTE_HOUR is None:
+        yield
+        return
+
+    precomputer = precompute.Precomputer(
+        get_responses(),
+        lambda provider: get_provider_instances(provider)[0],
+        max_users=PRECOMPUTE_MAX_USERS,
+    )
+    task = asyncio.create_task(precompute.run_daily(precomputer, int(PRECOMPUTE_HOUR)))
+
+    yield
 
-app = FastAPI()
+    task.cancel()
+    with contextlib.suppress(asyncio.CancelledError):
+        await task
+
+
+app = FastAPI(lifespan=lifespan)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:3000"],
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(admission.AdmissionMiddleware)
 
 logger.info("app_starting", mode="DEBUG" if DEBUG else "PRODUCTION", log_level=log_level)
 
-recommenders = {
-    "anilist": recommender_builder.build_recommender("anilist"),
-    "mixed": recommender_builder.build_recommender("mixed"),
-}
+PROVIDERS = ("anilist", "mixed")
+
+# Built on the first request to each provider, so workers start fast
+recommenders = {}
+profilers = {}
+
+
+@functools.cache
+def get_cache():
+    """One cache connection shared by all providers."""
+    return recommender_builder.build_cache()
+
 
-profilers = {
-    name: analyser.ProfileAnalyser(
-        rec.provider,
-        clustering_defaults=recommender_builder.CLUSTERING_DEFAULTS,
+@functools.cache
+def get_responses():
+    return precompute.ResponseCache(get_cache())
+
+
+RECOMMEND_MEDIA_TYPES = {**views.ARROW_MEDIA_TYPES, "ndjson": views.NDJSON_MEDIA_TYPE}
+
+
+def negotiate_format(request, requested, media_types):
+    """Response format from the format parameter, or else the Accept header, out of
+    json and the given media types. Returns None for unknown formats."""
+    if requested is not None:
+        return requested if requested == "json" or requested in media_types else None
+
+    accept = request.headers.get("accept", "")
+
+    return next(
+        (name for name, media_type in media_types.items() if media_type in accept),
+        "json",
     )
-    for name, rec in recommenders.items()
-}
 
 
-def get_provider_instances(provider):
-    return recommenders.get(provider, recommenders["anilist"]), profilers.get(
-        provider, profilers["anilist"]
+def unknown_format_response(media_types):
+    return JSONResponse(
+        {"error": f"Unknown format, use one of: json, {', '.join(media_types)}"},
+        status_code=status.HTTP_400_BAD_REQUEST,
     )
 
 
+async def iterate_on_loop(lines):
+    """Renders each chunk on the event loop, between sends, rather than in a thread.
+    Categories keep per render state on shared instances."""
+    for line in lines:
+        yield line
+
+
+def get_provider_instances(provider):
+    provider = provider if provider in PROVIDERS else "anilist"
+
+    if provider not in recommenders:
+        recommender = recommender_builder.build_recommender(provider, get_cache())
+        recommenders[provider] = recommender
+        profilers[provider] = analyser.ProfileAnalyser(
+            recommender.provider,
+            clustering_defaults=recommender_builder.CLUSTERING_DEFAULTS,
+        )
+        logger.info("provider_initialized", provider=provider)
+
+    return recommenders[provider], profilers[provider]
+
+
 @app.exception_handler(ClientResponseError)
 async def client_response_error_handler(request: Request, exc: ClientResponseError):
     user = request.query_params.get("user", "?")
@@ -86,6 +183,31 @@ async def runtime_error_handler(request: Request, exc: RuntimeError):
     )
 
 
+@app.exception_handler(admission.Overloaded)
+async def overloaded_handler(request: Request, exc: admission.Overloaded):
+    limiter = limiters[request.url.path]
+    logger.warning(
+        "request_shed",
+        reason=exc.reason,
+        active=limiter.active,
+        waiting=len(limiter.waiters),
+    )
+    return JSONResponse(
+        {"error": "Server is busy, please try again shortly."},
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+async def admit(request):
+    """Takes an admission slot for a CPU heavy request, turned away with 503 if
+    there's none free in time."""
+    limiter = limiters.get(request.url.path)
+
+    if limiter is not None and limiter.concurrency:
+        await admission.admit(request.scope, limiter)
+
+
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
     structlog.contextvars.clear_contextvars()
@@ -96,27 +218,55 @@ async def log_requests(request: Request, call_next):
         user=request.query_params.get("user"),
     )
     logger.info("request_started")
-    response = await call_next(request)
-    logger.info("request_completed", status=response.status_code)
+
+    if not MEMORY_TRACKING:
+        response = await call_next(request)
+        logger.info("request_completed", status=response.status_code)
+        return response
+
+    with memory.tracking() as tracker, tracker.stage("request"):
+        response = await call_next(request)
+
+    logger.info(
+        "request_completed",
+        status=response.status_code,
+        memory=tracker.summary(),
+        max_rss_mb=round(memory.max_resident_memory() / memory.MB, 2),
+    )
     return response
 
 
 @app.get("/seasonal")
 async def seasonal_anime(
+    request: Request,
     year: str = Query(None),
     season: str = Query(None),
     provider: str = Query("anilist"),
+    requested_format: str = Query(None, alias="format"),
 ):
-    """Returns a json-list of seasonal or yearly anime titles."""
+    """Returns a json-list of seasonal or yearly anime titles.
+    Also available as an Arrow stream or Parquet file with format=arrow|parquet
+    or an Accept header of their media type.
+    """
     if not year:
         return JSONResponse(
             {"error": "Missing required parameter: year"},
             status_code=status.HTTP_400_BAD_REQUEST,
         )
 
+    response_format = negotiate_format(request, requested_format, views.ARROW_MEDIA_TYPES)
+    if response_format is None:
+        return unknown_format_response(views.ARROW_MEDIA_TYPES)
+
     recommender, _ = get_provider_instances(provider)
     dataset = await recommender.recommend_seasonal_anime(year, season)
 
+    if response_format != "json":
+        return Response(
+            content=views.recommendations_arrow_view(dataset.seasonal, file_format=response_format),
+            media_type=views.ARROW_MEDIA_TYPES[response_format],
+        )
+
     return Response(
         content=views.recommendations_web_view(dataset.seasonal),
         media_type="application/json",
@@ -124,15 +274,22 @@ async def seasonal_anime(
 
 
 @app.get("/recommend")
-async def recommend_anime(
+async def recommend_anime(  # noqa: PLR0913
+    request: Request,
+    *,
     user: str = Query(None),
     year: str = Query(None),
     season: str = Query(None),
     provider: str = Query("anilist"),
     only_categories: str = Query(None),
+    requested_format: str = Query(None, alias="format"),
 ):
     """Recommends new anime to a user, either from a year or a single season.
     Accepts provider parameter: 'anilist' (default) or 'mixed' (for MAL users).
+    Also available as an Arrow stream or Parquet file with format=arrow|parquet
+    or an Accept header of their media type, categories are in the schema metadata.
+    With format=ndjson, shows are streamed first and then each category as soon as
+    it's rendered, one JSON object per line.
     """
     if not user:
         return JSONResponse(
@@ -145,23 +302,58 @@ async def recommend_anime(
             status_code=status.HTTP_400_BAD_REQUEST,
         )
 
+    response_format = negotiate_format(request, requested_format, RECOMMEND_MEDIA_TYPES)
+    if response_format is None:
+        return unknown_format_response(RECOMMEND_MEDIA_TYPES)
+
+    provider = provider if provider in PROVIDERS else "anilist"
+    # Recorded for precomputing once the user is known to exist
+    recommend_request = precompute.RecommendRequest(user, provider, year, season)
+    responses = get_responses()
+
+    if response_format == "json" and not only_categories and not DEBUG:
+        payload = await asyncio.to_thread(responses.take, recommend_request)
+
+        if payload is not None:
+            await asyncio.to_thread(responses.record, recommend_request)
+            logger.info("precomputed_response_served", user=user)
+            return Response(content=payload, media_type="application/json")
+
+    # Precomputed payloads are a cache read, only computing needs a slot
+    await admit(request)
     recommender, _ = get_provider_instances(provider)
     dataset = await recommender.recommend_seasonal_anime(year, season, user)
+    await asyncio.to_thread(responses.record, recommend_request)
+    shows = None if only_categories else dataset.recommendations
+    tags_and_genres = list(set(dataset.all_features) - set(dataset.nsfw_tags))
+
+    if response_format == "ndjson":
+        lines = views.recommendations_ndjson_view(
+            shows, recommender.iter_categories(dataset), tags_and_genres, debug=DEBUG
+        )
+        return StreamingResponse(iterate_on_loop(lines), media_type=views.NDJSON_MEDIA_TYPE)
+
     categories = recommender.get_categories(dataset)
 
+    with memory.stage("view"):
+        if response_format != "json":
+            content = views.recommendations_arrow_view(
+                shows, categories, tags_and_genres, response_format, debug=DEBUG
+            )
+        else:
+            content = views.recommendations_web_view(
+                shows, categories, tags_and_genres, debug=DEBUG
+            )
+
     return Response(
-        content=views.recommendations_web_view(
-            None if only_categories else dataset.recommendations,
-            categories,
-            list(set(dataset.all_features) - set(dataset.nsfw_tags)),
-            debug=DEBUG,
-        ),
-        media_type="application/json",
+        content=content,
+        media_type=views.ARROW_MEDIA_TYPES.get(response_format, "application/json"),
     )
 
 
 @app.get("/analyse")
 async def analyze_profile(
+    request: Request,
     user: str = Query(None),
     year: str = Query(None),
     season: str = Query(None),
@@ -176,6 +368,7 @@ async def analyze_profile(
             status_code=status.HTTP_400_BAD_REQUEST,
         )
 
+    await admit(request)
     _, profiler = get_provider_instances(provider)
     profile, categories, seasonal = await profiler.analyse(user, year=year, season=season)
 
@@ -204,7 +397,10 @@ async def profile_characteristics(
         )
 
     _, profiler = get_provider_instances(provider)
-    profile, _, _ = await profiler.analyse(user)
+    watchlist = await profiler.provider.get_user_anime_list(
+        user, profile=QueryProfile.PROFILE_STATS
+    )
+    profile = UserProfile(user, watchlist)
     profile.characteristics = Characteristics(profile.watchlist, profiler.provider.get_genres())
 
     logger.debug(
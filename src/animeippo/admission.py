@@ -0,0 +1,123 @@
+"""Admission control for CPU heavy endpoints.
+
+Recommending and analysing run clustering and scoring on the event loop, so a
+burst of them makes every request slow. A limiter admits a few at a time, lets
+a bounded number wait for a slot up to a deadline, and turns the rest away with
+Overloaded so they can be answered at once with 503 and Retry-After.
+
+Endpoints take a slot with admit() once they know the request needs the work,
+and AdmissionMiddleware releases it when the request ends in any way, after
+the body has been sent, on errors and when the client goes away before it.
+"""
+
+import asyncio
+import collections
+import math
+import time
+
+DEFAULT_QUEUE_TIMEOUT = 5.0
+# Weight of the latest request in the running mean of service times
+SERVICE_TIME_WEIGHT = 0.2
+# Slots taken by a request, as (limiter, start) pairs in its ASGI scope
+SCOPE_KEY = "animeippo.admitted"
+
+
+class Overloaded(Exception):
+    """The request was turned away, it can be retried after retry_after seconds."""
+
+    def __init__(self, reason, retry_after):
+        super().__init__(f"Overloaded: {reason}")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionLimiter:
+    """Caps concurrent requests with a bounded queue."""
+
+    def __init__(self, concurrency, *, queue_size=0, queue_timeout=DEFAULT_QUEUE_TIMEOUT):
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self.waiters = collections.deque()
+        self.service_time = None
+
+    async def acquire(self):
+        if self.active < self.concurrency and not self.waiters:
+            self.active += 1
+            return
+
+        if len(self.waiters) >= self.queue_size:
+            raise Overloaded("queue_full", self.retry_after())
+
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiters.append(waiter)
+
+        try:
+            await asyncio.wait_for(waiter, self.queue_timeout)
+        except BaseException as error:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as the wait ended, pass it on
+                self.release()
+            elif waiter in self.waiters:
+                self.waiters.remove(waiter)
+
+            if isinstance(error, TimeoutError):
+                raise Overloaded("queue_timeout", self.retry_after()) from None
+            raise
+
+    def release(self):
+        """Hands the slot to the longest waiting request, if any."""
+        while self.waiters:
+            waiter = self.waiters.popleft()
+
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+
+        self.active -= 1
+
+    def finish(self, start):
+        """Releases the slot of a request admitted at start, a time.monotonic() value."""
+        self.record(time.monotonic() - start)
+        self.release()
+
+    def record(self, seconds):
+        if self.service_time is None:
+            self.service_time = seconds
+        else:
+            self.service_time += SERVICE_TIME_WEIGHT * (seconds - self.service_time)
+
+    def retry_after(self):
+        """Seconds until the queue has likely drained, at least one."""
+        service_time = self.queue_timeout if self.service_time is None else self.service_time
+
+        return max(1, math.ceil(service_time * (len(self.waiters) + 1) / self.concurrency))
+
+
+async def admit(scope, limiter):
+    """Takes a slot of limiter for the rest of the request of scope, which must be
+    served through AdmissionMiddleware. Raises Overloaded if it's turned away."""
+    await limiter.acquire()
+    scope[SCOPE_KEY].append((limiter, time.monotonic()))
+
+
+class AdmissionMiddleware:
+    """Releases the slots a request took once it has ended, including streamed
+    bodies that are still being rendered after the endpoint returns."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        admitted = scope[SCOPE_KEY] = []
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            for limiter, start in admitted:
+                limiter.finish(start)
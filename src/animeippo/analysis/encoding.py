@@ -1,3 +1,4 @@
+import numpy as np
 import polars as pl
 
 
@@ -41,4 +42,30 @@ class WeightedCategoricalEncoder:
         self.dtype = pl.Struct(dict.fromkeys(self.classes, pl.UInt8))
 
     def encode(self, dataframe):
-        return dataframe.select(pl.col("clustering_ranks").cast(self.dtype)).to_series()
+        ranks = dataframe[self.weight_field]
+
+        # Sparse (name, weight) lists are densified, wide structs from frames
+        # cached before ranks were stored sparse are cast as they are
+        if not isinstance(ranks.dtype, pl.Struct):
+            ranks = densify(ranks)
+
+        return ranks.cast(self.dtype)
+
+
+def densify(ranks):
+    """Expand sparse (name, weight) lists to a struct with a field for each name
+    that occurs in the series. Missing pairs and null weights are 0."""
+    pairs = (
+        ranks.to_frame("ranks")
+        .with_row_index("row")
+        .explode("ranks")
+        .unnest("ranks")
+        .drop_nulls("name")
+    )
+    names = pairs["name"].unique().sort()
+    columns = pairs["name"].rank("dense") - 1
+
+    matrix = np.zeros((len(ranks), len(names)))
+    matrix[pairs["row"].to_numpy(), columns.to_numpy()] = pairs["weight"].fill_null(0).to_numpy()
+
+    return pl.DataFrame(matrix, schema=names.to_list()).to_struct(ranks.name)
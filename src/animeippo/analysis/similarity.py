@@ -1,5 +1,4 @@
 import polars as pl
-import scipy.spatial.distance as scdistance
 
 
 def distance(x_orig, y_orig, metric="cosine"):
@@ -7,6 +6,9 @@ def distance(x_orig, y_orig, metric="cosine"):
     Calculate pairwise distance between two series.
     Just a wrapper for scipy cdist for a matching
     signature with analysis.similairty."""
+    # scipy is slow to import, so it's imported on first use
+    import scipy.spatial.distance as scdistance  # noqa: PLC0415
+
     return scdistance.cdist(x_orig, y_orig, metric=metric)
 
 
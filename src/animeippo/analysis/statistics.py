@@ -1,6 +1,5 @@
 import numpy as np
 import polars as pl
-from sklearn.feature_extraction.text import TfidfTransformer
 
 
 def weighted_mean_for_categorical_values(dataframe, column, weights, fillna=0.0):
@@ -160,6 +159,9 @@ def get_descriptive_features(  # noqa: PLR0913
 
     count_matrix = contingency_table.select(pl.exclude(feature_column)).to_numpy()
 
+    # sklearn takes seconds to import, so it's imported on first use
+    from sklearn.feature_extraction.text import TfidfTransformer  # noqa: PLC0415
+
     # Apply TF-IDF transformation
     tfidf = TfidfTransformer()
     tfidf_matrix = tfidf.fit_transform(count_matrix.T).T  # Transpose: clusters as documents
@@ -0,0 +1,47 @@
+"""Invalidating cache entries by pattern.
+
+Keys are scanned in batches and unlinked, which frees their memory in the
+background, so clearing part of the cache never blocks Redis the way FLUSHALL
+does.
+"""
+
+from collections import Counter
+
+from . import keys
+
+LEGACY = "legacy"
+
+
+def matching_keys(cache, kinds=(), provider=None, user=None, stale=False):
+    """Keys matching the selection. Only keys of outdated versions or formats if
+    stale."""
+    found = set()
+
+    for pattern in keys.patterns(kinds, provider, user):
+        found.update(
+            key for key in cache.scan_keys(pattern) if not stale or not keys.is_current(key)
+        )
+
+    return found
+
+
+def legacy_keys(cache):
+    """Keys written before the cache was namespaced."""
+    return {key for key in cache.scan_keys("*") if keys.parse_key(key) is None}
+
+
+def describe(key):
+    """The provider and kind of a key, for reporting."""
+    parsed = keys.parse_key(key)
+
+    return (LEGACY, LEGACY) if parsed is None else parsed[:2]
+
+
+def invalidate(cache, found, dry_run=False):
+    """Removes keys, returning how many there were of each provider and kind."""
+    removed = Counter(describe(key) for key in found)
+
+    if not dry_run:
+        cache.unlink(sorted(found))
+
+    return removed
@@ -0,0 +1,294 @@
+"""Cache key names.
+
+Every key is namespaced as
+
+    animeippo:<provider>:<kind>:v<version>[:<user>]:<identifier>
+
+so that entries can be invalidated by pattern: one kind of data, one provider,
+one user, or everything stored in an old version of its format. Bump the
+version of a kind in SCHEMA_VERSIONS when the way its values are stored changes.
+
+Formatted data also carries a fingerprint of the schemas, mappings and
+transforms that define its format, so a formatter change reads new keys instead
+of serving frames with different columns. The fingerprint follows the functions
+and constants the definitions reference, so only changes to them change it.
+Raw responses are not fingerprinted, formatting them again is cheap compared to
+requesting them.
+"""
+
+import enum
+import functools
+import hashlib
+import importlib
+import inspect
+import types
+
+import polars as pl
+
+NAMESPACE = "animeippo"
+PACKAGE = __package__.rpartition(".")[0]
+# Keys that aren't about a provider's data, like locks and progress
+APP = "app"
+GLOB_SPECIAL = "*?[]\\"
+
+
+class Kind(enum.StrEnum):
+    QUERY = "query"
+    USER_QUERY = "user_query"
+    SEASONAL = "seasonal"
+    SEASON_ARTIFACTS = "season_artifacts"
+    USER_LIST = "user_list"
+    MEDIA = "media"
+    RESPONSE = "response"
+    STATE = "state"
+
+
+SCHEMA_VERSIONS = dict.fromkeys(Kind, 1)
+# Kinds whose identifier starts with the user
+USER_KINDS = (Kind.USER_QUERY, Kind.USER_LIST, Kind.RESPONSE)
+
+# Schemas, mappings and transforms that define the format of each kind of
+# formatted data, as module:attribute names in the package
+FORMATTER_DEFINITIONS = [
+    "providers.columns:Columns",
+    "providers.anilist.schema:ANI_WATCHLIST_SCHEMA",
+    "providers.anilist.schema:ANI_WATCHLIST_ENTRY_SCHEMA",
+    "providers.anilist.schema:ANI_MEDIA_SCHEMA",
+    "providers.anilist.schema:ANI_SEASONAL_SCHEMA",
+    "providers.anilist.schema:ANI_MANGA_SCHEMA",
+    "providers.anilist.formatter:ANILIST_MAPPING",
+    "providers.anilist.formatter:transform_seasonal_data",
+    "providers.anilist.formatter:transform_watchlist_data",
+    "providers.anilist.formatter:transform_user_manga_list_data",
+    "providers.mixed.schema:MIXED_MAL_WATCHLIST_SCHEMA",
+    "providers.mixed.schema:MIXED_MAL_MANGA_SCHEMA",
+    "providers.mixed.schema:MIXED_ANI_MANGA_SCHEMA",
+    "providers.mixed.schema:MIXED_ANI_WATCHLIST_SCHEMA",
+    "providers.mixed.schema:MIXED_ANI_SEASONAL_SCHEMA",
+    "providers.mixed.formatter:MIXED_ANI_MAPPING",
+    "providers.mixed.formatter:transform_mal_watchlist_data",
+    "providers.mixed.formatter:transform_ani_watchlist_data",
+    "providers.mixed.formatter:transform_mal_manga_data",
+    "providers.mixed.formatter:transform_ani_manga_data",
+    "providers.mixed.formatter:transform_ani_seasonal_data",
+    "providers.myanimelist.schema:MAL_WATCHLIST_SCHEMA",
+    "providers.myanimelist.formatter:MAL_MAPPING",
+    "providers.myanimelist.formatter:transform_watchlist_data",
+]
+FORMAT_DEFINITIONS = {
+    Kind.SEASONAL: FORMATTER_DEFINITIONS,
+    Kind.USER_LIST: FORMATTER_DEFINITIONS,
+    Kind.MEDIA: FORMATTER_DEFINITIONS,
+    Kind.SEASON_ARTIFACTS: [*FORMATTER_DEFINITIONS, "recommendation.season_artifacts:prepare"],
+}
+# Memos the definitions reference, their contents change while running
+MEMOS = ["providers.util:_MAPPING_PLANS", "providers.anilist.formatter:_ANILIST_MAPPINGS"]
+
+
+def digest(identifier):
+    # Queries are long, better to hash them for perf
+    return hashlib.sha256(identifier.encode("utf-8")).hexdigest()
+
+
+def namespace_of(owner):
+    """The provider segment for keys of an object, its cache_namespace if it has one."""
+    return getattr(owner, "cache_namespace", type(owner).__name__)
+
+
+def resolve(name):
+    module, attribute = name.split(":")
+
+    return getattr(importlib.import_module(f"{PACKAGE}.{module}"), attribute)
+
+
+def in_package(value):
+    return (getattr(value, "__module__", None) or "").startswith(PACKAGE)
+
+
+def code_names(code):
+    """Global and attribute names a function's code uses, its nested functions'
+    included."""
+    names = set(code.co_names)
+
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            names |= code_names(const)
+
+    return names
+
+
+def referenced(func):
+    """Functions, classes and constants of the package a function refers to by
+    name, directly or as attributes of the package's modules."""
+    names = code_names(func.__code__)
+    scopes = [func.__globals__] + [
+        vars(value)
+        for name in sorted(names)
+        if isinstance(value := func.__globals__.get(name), types.ModuleType)
+        and value.__name__.startswith(PACKAGE)
+    ]
+
+    for name in sorted(names):
+        for scope in scopes:
+            value = scope.get(name)
+
+            if isinstance(value, (types.FunctionType, type)) and in_package(value):
+                yield name, value
+                break
+
+            if name.lstrip("_").isupper() and isinstance(
+                value, (dict, list, tuple, set, frozenset, str, int, float, pl.Expr)
+            ):
+                yield name, value
+                break
+
+
+def describe_code(code, seen, docstring=None):
+    """Bytecode and constants of a function, without its docstring, so changes
+    to its body change the description but moving it around doesn't."""
+    consts = [const for const in code.co_consts if const is not docstring]
+
+    return f"{code.co_code.hex()}{describe(consts, seen)}"
+
+
+def describe(value, seen):  # noqa: C901, PLR0911
+    """A description of a definition that changes whenever what it defines does.
+    Unlike reprs, it covers the bodies of functions, the constants they use and
+    whole expressions, which polars truncates in reprs."""
+    if isinstance(value, (types.FunctionType, type)) and in_package(value):
+        name = f"{value.__module__}.{value.__qualname__}"
+
+        if id(value) in seen:
+            return name
+
+        seen.add(id(value))
+
+        if isinstance(value, enum.EnumMeta):
+            return f"{name}{describe([(member.name, member.value) for member in value], seen)}"
+
+        if isinstance(value, type):
+            methods = {
+                attribute: inspect.unwrap(getattr(method, "__func__", method))
+                for attribute, method in vars(value).items()
+                if isinstance(method, (types.FunctionType, staticmethod, classmethod))
+            }
+            return f"{name}{describe(methods, seen)}"
+
+        value = inspect.unwrap(value)
+        body = describe_code(value.__code__, seen, value.__doc__)
+
+        return f"{name}({body}{describe(dict(referenced(value)), seen)})"
+
+    if isinstance(value, types.CodeType):
+        return describe_code(value, seen)
+
+    if isinstance(value, pl.Expr):
+        return hashlib.sha256(value.meta.serialize()).hexdigest()
+
+    if isinstance(value, dict):
+        if id(value) in seen:
+            return "{...}"
+
+        return (
+            "{"
+            + ", ".join(f"{describe(k, seen)}: {describe(v, seen)}" for k, v in value.items())
+            + "}"
+        )
+
+    if isinstance(value, (set, frozenset)):
+        return "{" + ", ".join(sorted(describe(item, seen) for item in value)) + "}"
+
+    if isinstance(value, (list, tuple)):
+        return "[" + ", ".join(describe(item, seen) for item in value) + "]"
+
+    if in_package(type(value)) and not isinstance(value, enum.Enum):
+        return f"{describe(type(value), seen)}({describe(vars(value), seen)})"
+
+    if callable(value) and not isinstance(value, pl.DataType):
+        return f"{getattr(value, '__module__', None)}.{value.__qualname__}"
+
+    return repr(value)
+
+
+@functools.cache
+def format_fingerprint(kind):
+    """A digest of the definitions of a kind's format. Only changes to them, or
+    to the functions and constants they use, change it."""
+    definitions = hashlib.sha256()
+    # Memos are left out
+    seen = {id(resolve(name)) for name in MEMOS}
+
+    for name in FORMAT_DEFINITIONS[kind]:
+        definitions.update(f"{name}={describe(resolve(name), seen)}\n".encode())
+
+    return definitions.hexdigest()[:12]
+
+
+def version(kind):
+    """The current version of a kind, with its format fingerprint if it's formatted."""
+    kind = Kind(kind)
+
+    if kind in FORMAT_DEFINITIONS:
+        return f"{SCHEMA_VERSIONS[kind]}.{format_fingerprint(kind)}"
+
+    return str(SCHEMA_VERSIONS[kind])
+
+
+def make_key(provider, kind, identifier, user=None):
+    kind = Kind(kind)
+    scope = f"{user}:" if kind in USER_KINDS else ""
+
+    return f"{NAMESPACE}:{provider}:{kind}:v{version(kind)}:{scope}{identifier}"
+
+
+def parse_key(key):
+    """The provider, kind and version of a key, or None if it isn't in the namespace."""
+    parts = key.split(":", 4)
+
+    if len(parts) < 5 or parts[0] != NAMESPACE or not parts[3].startswith("v"):  # noqa: PLR2004
+        return None
+
+    return parts[1], parts[2], parts[3].removeprefix("v")
+
+
+def current_version(key):
+    """The version a key of its kind has now, None if it isn't in the namespace."""
+    parsed = parse_key(key)
+
+    if parsed is None or parsed[1] not in SCHEMA_VERSIONS:
+        return None
+
+    return version(parsed[1])
+
+
+def is_current(key):
+    """Whether a key is in the namespace and its kind's current version, and
+    current format if the kind is formatted."""
+    parsed = parse_key(key)
+
+    return parsed is not None and parsed[2] == current_version(key)
+
+
+def glob_user(user):
+    """A pattern matching the user in any case, as providers ignore the case of names."""
+    return "".join(
+        f"[{char.lower()}{char.upper()}]"
+        if char.lower() != char.upper()
+        else f"\\{char}"
+        if char in GLOB_SPECIAL
+        else char
+        for char in user
+    )
+
+
+def patterns(kinds=(), provider=None, user=None):
+    """Patterns matching the keys of kinds, all kinds if none are given, optionally
+    only ones of a provider or a user."""
+    provider = glob_user(provider) if provider else "*"
+
+    if user is None:
+        return [f"{NAMESPACE}:{provider}:{kind}:*" for kind in kinds or ["*"]]
+
+    user_kinds = [kind for kind in USER_KINDS if not kinds or kind in kinds]
+
+    return [f"{NAMESPACE}:{provider}:{kind}:v*:{glob_user(user)}:*" for kind in user_kinds]
@@ -1,9 +1,23 @@
 import enum
-import hashlib
+import itertools
 from datetime import timedelta
 
 import polars as pl
 import redis
+import structlog
+
+from . import keys
+
+SCAN_COUNT = 1000
+FRAME_HEADER = b"animeippo-frame "
+
+logger = structlog.get_logger()
+
+
+def frame_header(key):
+    """Frames are stored with the version of their key's kind, so a frame of
+    another format is never read."""
+    return FRAME_HEADER + (keys.current_version(key) or "").encode("utf-8") + b"\n"
 
 
 class CacheMode(enum.Enum):
@@ -21,9 +35,6 @@ class RedisCache:
         self.mode = mode
 
     def set_json(self, key, value, ttl=timedelta(days=7)):
-        # We are using query strings as keys, better to hash them for perf
-        key = hashlib.sha256(key.encode("utf-8")).hexdigest()
-
         self.connection.json().set(key, "$", value)
         self.connection.expire(key, ttl)
 
@@ -31,12 +42,28 @@ class RedisCache:
         if self.mode == CacheMode.WRITE_ONLY:
             return None
 
-        key = hashlib.sha256(key.encode("utf-8")).hexdigest()
         return self.connection.json().get(key)
 
+    def set_json_many(self, values, ttl=timedelta(days=7)):
+        pipeline = self.connection.pipeline(transaction=False)
+
+        for key, value in values.items():
+            pipeline.json().set(key, "$", value)
+            pipeline.expire(key, ttl)
+
+        pipeline.execute()
+
+    def get_json_many(self, keys):
+        """Values for all keys in one round trip, None for missing keys."""
+        if self.mode == CacheMode.WRITE_ONLY or not keys:
+            return [None] * len(keys)
+
+        return self.connection.json().mget(keys, ".")
+
     def set_dataframe(self, key, dataframe, ttl=timedelta(days=7)):
         if dataframe is not None:
-            self.connection.set(key, dataframe.write_ipc(None).getvalue())
+            data = frame_header(key) + dataframe.write_ipc(None).getvalue()
+            self.connection.set(key, data)
             self.connection.expire(key, ttl)
 
     def get_dataframe(self, key):
@@ -45,7 +72,66 @@ class RedisCache:
 
         data = self.connection.get(key)
 
-        return pl.read_ipc(data) if data is not None else None
+        if data is None:
+            return None
+
+        header = frame_header(key)
+
+        if not data.startswith(header):
+            logger.info("cache_version_mismatch", key=key)
+            return None
+
+        return pl.read_ipc(data[len(header) :])
+
+    def set_bytes(self, key, value, ttl=timedelta(days=1)):
+        self.connection.set(key, value, ex=ttl)
+
+    def pop_bytes(self, key):
+        """Gets a value and removes it, so it's only ever read once."""
+        if self.mode == CacheMode.WRITE_ONLY:
+            return None
+
+        return self.connection.getdel(key)
+
+    def add_recent(self, key, member, timestamp, max_age):
+        """Adds a member with the time it was last seen, members older than
+        max_age seconds are dropped."""
+        pipeline = self.connection.pipeline(transaction=False)
+        pipeline.zadd(key, {member: timestamp})
+        pipeline.zremrangebyscore(key, "-inf", timestamp - max_age)
+        pipeline.execute()
+
+    def get_recent(self, key, since, count):
+        """Up to count members seen since a timestamp, the most recent first."""
+        if self.mode == CacheMode.WRITE_ONLY:
+            return []
+
+        members = self.connection.zrevrangebyscore(key, "+inf", since, start=0, num=count)
+
+        return [member.decode("utf-8") for member in members]
+
+    def increment(self, key, field, amount=1):
+        """Adds to a counter in a hash of counters."""
+        self.connection.hincrby(key, field, amount)
+
+    def try_lock(self, key, ttl):
+        """Takes a lock that expires after ttl, False if it is already taken."""
+        return bool(self.connection.set(key, 1, nx=True, ex=ttl))
+
+    def scan_keys(self, pattern):
+        """Keys matching a glob pattern, scanned in batches so Redis isn't blocked."""
+        for key in self.connection.scan_iter(match=pattern, count=SCAN_COUNT):
+            yield key.decode("utf-8") if isinstance(key, bytes) else key
+
+    def unlink(self, keys):
+        """Removes keys, freeing their memory in the background. Returns how many
+        existed."""
+        removed = 0
+
+        for batch in itertools.batched(keys, SCAN_COUNT):
+            removed += self.connection.unlink(*batch)
+
+        return removed
 
     def is_available(self):
         try:
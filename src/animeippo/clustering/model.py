@@ -2,11 +2,11 @@ from typing import ClassVar
 
 import numpy as np
 import polars as pl
-import sklearn.cluster as skcluster
-from sklearn.metrics import pairwise_distances
 
 from ..analysis import similarity
 
+PAIR_SCHEMA = {"i": pl.UInt32, "j": pl.UInt32, "tier": pl.Utf8}
+
 
 class AnimeClustering:
     """Agglomerative clustering for anime feature vectors.
@@ -87,6 +87,9 @@ class AnimeClustering:
         return series.sum(axis=1) > 0
 
     def build_distance_matrix(self, series, dataframe, mask):
+        # sklearn takes seconds to import, so it's imported on first use
+        from sklearn.metrics import pairwise_distances  # noqa: PLC0415
+
         dist_matrix = pairwise_distances(series, metric=self.distance_metric)
         if self.franchise_reduction:
             relation_pairs = self.get_relation_pairs(dataframe)
@@ -94,6 +97,8 @@ class AnimeClustering:
         return dist_matrix
 
     def fit_clusters(self, dist_matrix, n_items, mask):
+        import sklearn.cluster as skcluster  # noqa: PLC0415
+
         clusters = np.full(n_items, -1)
         model = skcluster.AgglomerativeClustering(
             n_clusters=self.n_clusters,
@@ -146,97 +151,141 @@ class AnimeClustering:
         clusters[mask] = masked_labels
 
     def get_relation_pairs(self, dataframe):
-        """Build dict of {(i, j): tier} from franchise and relation data.
+        """Build a frame of (i, j, tier) row index pairs from franchise and relation data.
 
         All franchise members get the "related" tier baseline (transitive closure).
         Direct sequel/prequel relations upgrade specific pairs to "direct" tier.
+        Pairs are unique and always ordered so that i < j.
         """
         if "franchise" not in dataframe.columns:
-            return {}
+            return self.empty_pairs()
 
         pairs = self.get_franchise_pairs(dataframe)
 
         if "franchise_relations" in dataframe.columns:
-            self.upgrade_direct_pairs(dataframe, pairs)
+            pairs = self.upgrade_direct_pairs(dataframe, pairs)
 
         return pairs
 
+    def empty_pairs(self):
+        return pl.DataFrame(schema=PAIR_SCHEMA)
+
     def get_franchise_pairs(self, dataframe):
         """Build "related" tier pairs from franchise groups (transitive closure)."""
-        franchise_groups = {}
-        for idx, franchise_list in enumerate(dataframe["franchise"].to_list()):
-            if franchise_list:
-                franchise_groups.setdefault(franchise_list[0], []).append(idx)
-
-        pairs = {}
-        for members in franchise_groups.values():
-            for i, a in enumerate(members):
-                for b in members[i + 1 :]:
-                    pairs[(a, b)] = "related"
+        members = (
+            dataframe.select(pl.col("franchise").list.first())
+            .with_row_index("i")
+            .filter(pl.col("franchise").is_not_null())
+        )
 
-        return pairs
+        return (
+            members.join(members.rename({"i": "j"}), on="franchise")
+            .filter(pl.col("i") < pl.col("j"))
+            .select("i", "j", tier=pl.lit("related"))
+            .cast(PAIR_SCHEMA)
+        )
 
     def upgrade_direct_pairs(self, dataframe, pairs):
         """Upgrade pairs to "direct" tier based on typed relation edges."""
-        id_to_idx = {aid: idx for idx, aid in enumerate(dataframe["id"].to_list())}
-
-        for idx_a, relations in enumerate(dataframe["franchise_relations"].to_list()):
-            if not relations:
-                continue
-            for rel in relations:
-                idx_b = id_to_idx.get(rel["related_id"])
-                if idx_b is not None and idx_a != idx_b:
-                    if rel["relation_type"] in self.DIRECT_SEQUEL_TYPES:
-                        pair = (min(idx_a, idx_b), max(idx_a, idx_b))
-                        pairs[pair] = "direct"
+        relations = dataframe["franchise_relations"]
+        if not isinstance(relations.dtype.inner, pl.Struct):
+            return pairs
+
+        id_to_idx = dataframe.select(pl.col("id").cast(pl.Int64)).with_row_index("b")
+
+        direct = (
+            pl.DataFrame({"franchise_relations": relations})
+            .with_row_index("a")
+            .explode("franchise_relations")
+            .unnest("franchise_relations")
+            .filter(pl.col("relation_type").is_in(list(self.DIRECT_SEQUEL_TYPES)))
+            .join(id_to_idx, left_on=pl.col("related_id").cast(pl.Int64), right_on="id")
+            .filter(pl.col("a") != pl.col("b"))
+            .select(
+                i=pl.min_horizontal("a", "b"),
+                j=pl.max_horizontal("a", "b"),
+                tier=pl.lit("direct"),
+            )
+            .cast(PAIR_SCHEMA)
+        )
+
+        # Direct tier wins over the related baseline for the same pair
+        return (
+            pl.concat([direct, pairs])
+            .unique(subset=["i", "j"], keep="first", maintain_order=True)
+            .sort("i", "j")
+        )
 
     def apply_franchise_reduction(self, dist_matrix, mask, relation_pairs):
         """Reduce distances between related anime using tiered factors."""
-        masked_indices = np.where(mask)[0]
-        original_to_masked = {orig: masked for masked, orig in enumerate(masked_indices)}
+        if len(relation_pairs) == 0:
+            return
+
+        # Map original row indices to positions in the masked matrix, -1 for excluded rows
+        original_to_masked = np.where(mask, np.cumsum(mask) - 1, -1)
 
-        for (orig_i, orig_j), tier in relation_pairs.items():
-            mi = original_to_masked.get(orig_i)
-            mj = original_to_masked.get(orig_j)
+        rows = original_to_masked[relation_pairs["i"].to_numpy()]
+        cols = original_to_masked[relation_pairs["j"].to_numpy()]
+        factors = relation_pairs["tier"].replace_strict(self.relation_tiers).to_numpy()
 
-            if mi is None or mj is None:
-                continue
+        valid = (rows >= 0) & (cols >= 0)
+        rows, cols, factors = rows[valid], cols[valid], factors[valid]
 
-            factor = self.relation_tiers[tier]
-            dist_matrix[mi, mj] *= factor
-            dist_matrix[mj, mi] *= factor
+        # Pairs are unique, so buffered fancy-index assignment is safe
+        dist_matrix[rows, cols] *= factors
+        dist_matrix[cols, rows] *= factors
 
     def predict(self, series, similarities=None):
         """Assign each new item to the cluster with highest average similarity.
 
+        Cluster means are computed in one matrix product between a normalised
+        (clusters x watchlist) label indicator and the (watchlist x candidates)
+        similarity matrix, so no long-format intermediate frames are built.
+
         Returns a DataFrame with 'cluster' and 'similarity' columns.
         """
         if not self.is_fit:
             raise RuntimeError("Cluster is not fitted yet. Please call cluster_by_features first.")
 
         if similarities is None:
-            similarities = similarity.categorical_similarity(
-                self.clustered_series["encoded"],
-                series,
+            labels = self.clustered_series["cluster"].to_numpy()
+            sim_matrix = similarity.similarity(
+                self.clustered_series["encoded"].struct.unnest().fill_null(0).to_numpy(),
+                series.struct.unnest().fill_null(0).to_numpy(),
                 metric=self.distance_metric,
-            ).with_columns(id=self.clustered_series["id"])
+            )
+        else:
+            labels = (
+                similarities["id"]
+                .replace_strict(
+                    self.clustered_series["id"], self.clustered_series["cluster"], default=-1
+                )
+                .to_numpy()
+            )
+            sim_matrix = similarities.select(pl.exclude("id")).to_numpy()
 
-        sim_cols = [c for c in similarities.columns if c != "id"]
-        col_order = pl.Enum(sim_cols)
+        return self.predict_from_matrix(sim_matrix, labels)
 
-        return (
-            similarities.with_columns(pl.col(sim_cols).fill_nan(0.0))
-            .join(self.clustered_series.select("id", "cluster"), on="id")
-            .filter(pl.col("cluster") >= 0)
-            .group_by("cluster", maintain_order=True)
-            .agg(pl.col(sim_cols).mean())
-            .unpivot(index="cluster", variable_name="item", value_name="avg_sim")
-            .sort("avg_sim", descending=True)
-            .group_by("item", maintain_order=True)
-            .agg(
-                pl.col("cluster").first(),
-                pl.col("avg_sim").first().alias("similarity"),
-            )
-            .sort(pl.col("item").cast(col_order))
-            .select("cluster", "similarity")
+    def predict_from_matrix(self, sim_matrix, labels):
+        valid = labels >= 0
+        cluster_ids, inverse, counts = np.unique(
+            labels[valid], return_inverse=True, return_counts=True
+        )
+
+        if len(cluster_ids) == 0:
+            return pl.DataFrame(schema={"cluster": pl.Int64, "similarity": pl.Float64})
+
+        indicator = np.zeros((len(cluster_ids), len(inverse)))
+        indicator[inverse, np.arange(len(inverse))] = 1.0 / counts[inverse]
+
+        valid_sims = np.nan_to_num(sim_matrix[valid], nan=0.0)
+        cluster_means = indicator @ valid_sims
+
+        best = cluster_means.argmax(axis=0)
+
+        return pl.DataFrame(
+            {
+                "cluster": cluster_ids[best].astype(np.int64),
+                "similarity": cluster_means[best, np.arange(cluster_means.shape[1])],
+            }
         )
@@ -0,0 +1,125 @@
+"""Peak memory accounting for requests and the stages of the pipeline.
+
+Stages are marked with `stage(name)` and recorded while tracemalloc is tracing,
+which is off by default since it slows allocation heavy code down noticeably.
+For each stage the tracker records:
+
+- peak: the highest Python heap use above the start of the stage, including
+  NumPy arrays such as the clustering distance matrix
+- arrow: the change in memory held by Arrow's allocator
+- rss: the change in resident memory, which also shows what Polars allocates
+  outside both
+
+Concurrent requests in one worker share the heap, so a stage's peak can include
+allocations of other requests.
+"""
+
+import contextlib
+import contextvars
+import resource
+import tracemalloc
+from pathlib import Path
+
+import pyarrow as pa
+
+MB = 1024 * 1024
+STATM_PATH = Path("/proc/self/statm")
+
+_tracker = contextvars.ContextVar("memory_tracker", default=None)
+# Stages being recorded, across all trackers, so every peak reaches each of them
+_active = []
+
+
+class _Usage:
+    __slots__ = ("peak", "start")
+
+    def __init__(self, start):
+        self.start = start
+        self.peak = 0
+
+
+def enable():
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+
+def resident_memory():
+    """Current resident set size in bytes, 0 where /proc is not available."""
+    try:
+        pages = int(STATM_PATH.read_text().split()[1])
+    except OSError:
+        return 0
+
+    return pages * resource.getpagesize()
+
+
+def max_resident_memory():
+    """Highest resident set size of the process in bytes, ru_maxrss is in kB on Linux."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _fold_peak():
+    """Records the heap peak since the last reset to every active stage."""
+    _, peak = tracemalloc.get_traced_memory()
+
+    for usage in _active:
+        usage.peak = max(usage.peak, peak - usage.start)
+
+    tracemalloc.reset_peak()
+
+
+class MemoryTracker:
+    """Memory use by stage of one request or benchmark run, in bytes."""
+
+    def __init__(self):
+        self.stages = {}
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        if not tracemalloc.is_tracing():
+            yield
+            return
+
+        _fold_peak()
+        usage = _Usage(tracemalloc.get_traced_memory()[0])
+        _active.append(usage)
+        arrow_start = pa.total_allocated_bytes()
+        rss_start = resident_memory()
+
+        try:
+            yield
+        finally:
+            _fold_peak()
+            _active.remove(usage)
+            self.stages[name] = {
+                "peak": usage.peak,
+                "arrow": pa.total_allocated_bytes() - arrow_start,
+                "rss": resident_memory() - rss_start,
+            }
+
+    def summary(self):
+        """Stage memory in megabytes, for logs."""
+        return {
+            name: {key: round(value / MB, 2) for key, value in usage.items()}
+            for name, usage in self.stages.items()
+        }
+
+
+@contextlib.contextmanager
+def tracking(tracker=None):
+    """Records the stages run within the block, and the tasks it starts, to a
+    new tracker, or the given one."""
+    tracker = MemoryTracker() if tracker is None else tracker
+    token = _tracker.set(tracker)
+
+    try:
+        yield tracker
+    finally:
+        _tracker.reset(token)
+
+
+def stage(name):
+    """Records a stage to the current tracker, if any."""
+    tracker = _tracker.get()
+
+    return tracker.stage(name) if tracker is not None else contextlib.nullcontext()
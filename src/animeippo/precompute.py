@@ -0,0 +1,203 @@
+"""Precomputed recommendations for returning users.
+
+Most users come back to the same season every day. Recommend requests are
+recorded in the cache, and off-peak a Precomputer goes through the most recent
+ones within a budget, refreshing each user's lists and rendering the full
+recommendation payload into the response cache. The next request of the user
+is answered from the cache. A payload is served once, later requests are
+computed as usual so that they reflect changes to the user's lists.
+"""
+
+import asyncio
+import json
+import time
+from datetime import UTC, datetime, timedelta
+from typing import NamedTuple
+
+import structlog
+
+from .cache import keys
+from .providers import caching
+from .providers.anilist.connection import RATE_LIMIT_WINDOW
+from .view import views
+
+logger = structlog.get_logger()
+
+ACTIVITY_KEY = keys.make_key(keys.APP, keys.Kind.STATE, "recommend_activity")
+LOCK_KEY = keys.make_key(keys.APP, keys.Kind.STATE, "precompute_lock")
+# Requests older than this are forgotten
+ACTIVITY_WINDOW = timedelta(days=7)
+PAYLOAD_TTL = timedelta(days=1)
+DEFAULT_MAX_USERS = 500
+DEFAULT_MAX_SECONDS = 3600
+# Share of the AniList rate limit left for users while precomputing
+RATE_LIMIT_RESERVE = 0.5
+
+
+class RecommendRequest(NamedTuple):
+    user: str
+    provider: str
+    year: str
+    season: str | None
+
+    def key(self):
+        return json.dumps(list(self))
+
+    @classmethod
+    def from_key(cls, key):
+        return cls(*json.loads(key))
+
+    def payload_key(self):
+        return keys.make_key(
+            self.provider, keys.Kind.RESPONSE, f"{self.year}:{self.season or ''}", user=self.user
+        )
+
+
+class ResponseCache:
+    """Recent recommend requests and their precomputed payloads.
+
+    Does nothing without an available cache, precomputing is an optimisation.
+    """
+
+    def __init__(self, cache):
+        self.cache = cache
+
+    def is_available(self):
+        return self.cache is not None and self.cache.is_available()
+
+    def record(self, request, now=None):
+        if self.is_available():
+            now = now if now is not None else time.time()
+            self.cache.add_recent(ACTIVITY_KEY, request.key(), now, ACTIVITY_WINDOW.total_seconds())
+
+    def recent(self, count, now=None):
+        """Requests seen within the activity window, the most recent first."""
+        if not self.is_available():
+            return []
+
+        now = now if now is not None else time.time()
+        since = now - ACTIVITY_WINDOW.total_seconds()
+
+        return [
+            RecommendRequest.from_key(key)
+            for key in self.cache.get_recent(ACTIVITY_KEY, since, count)
+        ]
+
+    def store(self, request, payload):
+        self.cache.set_bytes(request.payload_key(), payload, PAYLOAD_TTL)
+
+    def take(self, request):
+        """The precomputed payload of a request, if there is one."""
+        if not self.is_available():
+            return None
+
+        return self.cache.pop_bytes(request.payload_key())
+
+    def lock(self, name, ttl):
+        return self.is_available() and self.cache.try_lock(f"{LOCK_KEY}:{name}", ttl)
+
+
+async def recommendation_payload(recommender, request):
+    """The payload of a request, computed from the user's lists as they are now
+    rather than as they were cached, since it's served a day later."""
+    with caching.refreshing_user_data():
+        dataset = await recommender.recommend_seasonal_anime(
+            request.year, request.season, request.user
+        )
+
+    categories = recommender.get_categories(dataset)
+    tags_and_genres = list(set(dataset.all_features) - set(dataset.nsfw_tags))
+
+    return views.recommendations_web_view(dataset.recommendations, categories, tags_and_genres)
+
+
+class Precomputer:
+    """Precomputes payloads for the most recent requests.
+
+    At most max_users requests are precomputed and no new one is started after
+    max_seconds. Requests wait for the AniList rate limit window whenever less
+    than RATE_LIMIT_RESERVE of it is left, so that users are not rate limited.
+    """
+
+    def __init__(
+        self,
+        responses,
+        get_recommender,
+        *,
+        max_users=DEFAULT_MAX_USERS,
+        max_seconds=DEFAULT_MAX_SECONDS,
+    ):
+        self.responses = responses
+        self.get_recommender = get_recommender
+        self.max_users = max_users
+        self.max_seconds = max_seconds
+
+    async def wait_for_rate_limit(self, recommender, deadline):
+        """Waits until enough of the rate limit is left, False if that would
+        take past the deadline."""
+        connection = getattr(recommender.provider, "connection", None)
+
+        if connection is None or connection.has_capacity(RATE_LIMIT_RESERVE):
+            return True
+
+        if time.monotonic() + RATE_LIMIT_WINDOW > deadline:
+            return False
+
+        await connection.wait_for_window()
+
+        return True
+
+    async def run(self):
+        deadline = time.monotonic() + self.max_seconds
+        requests = await asyncio.to_thread(self.responses.recent, self.max_users)
+        summary = {"requests": len(requests), "computed": 0, "failed": 0}
+
+        logger.info("precompute_start", requests=len(requests))
+
+        for request in requests:
+            recommender = self.get_recommender(request.provider)
+
+            if time.monotonic() > deadline or not await self.wait_for_rate_limit(
+                recommender, deadline
+            ):
+                logger.info("precompute_budget_spent", **summary)
+                break
+
+            try:
+                payload = await recommendation_payload(recommender, request)
+            except Exception:
+                logger.exception("precompute_failed", user=request.user)
+                summary["failed"] += 1
+                continue
+
+            await asyncio.to_thread(self.responses.store, request, payload)
+            summary["computed"] += 1
+
+        logger.info("precompute_complete", **summary)
+
+        return summary
+
+
+def seconds_until(hour, now):
+    """Seconds from now to the next time the clock is at the hour, in UTC."""
+    start = now.replace(hour=hour, minute=0, second=0, microsecond=0)
+
+    if start <= now:
+        start += timedelta(days=1)
+
+    return (start - now).total_seconds()
+
+
+async def run_daily(precomputer, hour):
+    """Precomputes every day at an off-peak hour. With many workers, the one that
+    takes the day's lock does the work. A failed day is logged and the next one
+    is tried as usual."""
+    while True:
+        await asyncio.sleep(seconds_until(hour, datetime.now(UTC)))
+        today = datetime.now(UTC).date().isoformat()
+
+        try:
+            if await asyncio.to_thread(precomputer.responses.lock, today, PAYLOAD_TTL):
+                await precomputer.run()
+        except Exception:
+            logger.exception("precompute_day_failed", day=today)
@@ -2,9 +2,11 @@ import copy
 
 import polars as pl
 
+from animeippo import memory
 from animeippo.analysis import encoding, statistics
 from animeippo.clustering import model
 from animeippo.profiling.model import UserProfile
+from animeippo.providers.abstract_provider import QueryProfile
 from animeippo.providers.util import filter_continuation
 from animeippo.recommendation.cluster_naming import get_cluster_stats, name_all_clusters
 
@@ -30,36 +32,47 @@ class ProfileAnalyser:
         encoder = copy.copy(self.encoder)
         clusterer = copy.copy(self.clusterer)
 
-        user_watchlist = await self.provider.get_user_anime_list(user)
-        user_profile = UserProfile(user, user_watchlist)
+        with memory.stage("fetch"):
+            user_watchlist = await self.provider.get_user_anime_list(
+                user, profile=QueryProfile.ANALYSE
+            )
 
-        seasonal = None
-        if year is not None:
-            seasonal = await self.provider.get_seasonal_anime_list(year, season)
+            seasonal = None
+            if year is not None:
+                seasonal = await self.provider.get_seasonal_anime_list(year, season)
 
-        all_features = user_profile.watchlist.explode("features")["features"].unique().drop_nulls()
+        with memory.stage("user_profile"):
+            user_profile = UserProfile(user, user_watchlist)
 
-        encoder.fit(all_features)
-        user_profile.watchlist = user_profile.watchlist.with_columns(
-            encoded=encoder.encode(user_profile.watchlist)
-        )
+        with memory.stage("encode"):
+            all_features = (
+                user_profile.watchlist.explode("features")["features"].unique().drop_nulls()
+            )
 
-        user_profile.watchlist = user_profile.watchlist.with_columns(
-            cluster=clusterer.cluster_by_features(user_profile.watchlist)
-        )
+            encoder.fit(all_features)
+            user_profile.watchlist = user_profile.watchlist.with_columns(
+                encoded=encoder.encode(user_profile.watchlist)
+            )
+
+        with memory.stage("cluster"):
+            user_profile.watchlist = user_profile.watchlist.with_columns(
+                cluster=clusterer.cluster_by_features(user_profile.watchlist)
+            )
 
         return user_profile, seasonal, clusterer
 
     async def analyse(self, user, year=None, season=None):
         profile, seasonal, clusterer = await self.databuilder(user, year, season)
 
-        categories = self.get_cluster_categories(profile)
+        with memory.stage("categories"):
+            categories = self.get_cluster_categories(profile)
 
         result_seasonal = None
         if seasonal is not None:
-            result_seasonal = self.add_seasonal_recommendations(
-                profile, categories, seasonal, clusterer
-            )
+            with memory.stage("seasonal"):
+                result_seasonal = self.add_seasonal_recommendations(
+                    profile, categories, seasonal, clusterer
+                )
 
         return profile, categories, result_seasonal
 
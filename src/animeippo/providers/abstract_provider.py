@@ -1,9 +1,24 @@
 import abc
+from enum import StrEnum
+
+
+class QueryProfile(StrEnum):
+    """Sets of fields requested for user lists, from the fullest to the slimmest."""
+
+    FULL = "full"
+    ANALYSE = "analyse"
+    PROFILE_STATS = "profile_stats"
+
+    def covered_by(self):
+        """Profiles whose data also satisfies this one, this profile first."""
+        profiles = list(QueryProfile)
+
+        return profiles[profiles.index(self) :: -1]
 
 
 class AbstractAnimeProvider(abc.ABC):
     @abc.abstractmethod
-    def get_user_anime_list(self, user_id):
+    def get_user_anime_list(self, user_id, profile=QueryProfile.FULL):
         pass
 
     @abc.abstractmethod
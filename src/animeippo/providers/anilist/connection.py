@@ -1,5 +1,6 @@
 import asyncio
 import functools
+import os
 import types
 from datetime import timedelta
 from http import HTTPStatus
@@ -10,8 +11,9 @@ import structlog
 from .. import caching as animecache
 
 REQUEST_TIMEOUT = 30
-ANI_API_URL = "https://graphql.anilist.co"
+ANI_API_URL = os.environ.get("ANI_API_URL", "https://graphql.anilist.co")
 RATE_LIMIT_WARNING_THRESHOLD = 10
+RATE_LIMIT_WINDOW = 60
 
 logger = structlog.get_logger()
 
@@ -22,6 +24,7 @@ def rate_limited(func):
     @functools.wraps(func)
     async def wrapper(self, *args, **kwargs):
         response, result = await func(self, *args, **kwargs)
+        self.requests += 1
 
         self.rate_remaining = int(
             response.headers.get("X-RateLimit-Remaining", self.rate_remaining)
@@ -40,6 +43,7 @@ def rate_limited(func):
             logger.warning("rate_limited", retry_after=retry_after)
             await asyncio.sleep(retry_after)
             response, result = await func(self, *args, **kwargs)
+            self.requests += 1
 
         if response.status >= HTTPStatus.BAD_REQUEST:
             if response.status == HTTPStatus.NOT_FOUND:
@@ -71,10 +75,26 @@ def rate_limited(func):
 
 
 class AnilistConnection:
+    cache_namespace = "anilist"
+
     def __init__(self, cache=None):
         self.cache = cache
         self.rate_remaining = 90
         self.rate_limit = 90
+        # Requests made by this connection, the rate limit is shared by all
+        self.requests = 0
+
+    def has_capacity(self, reserve):
+        """Whether at least a share of the rate limit is left, background work
+        leaves the reserve to users."""
+        return self.rate_remaining >= self.rate_limit * reserve
+
+    async def wait_for_window(self):
+        """Waits for the rate limit window to pass, the next response tells how
+        much is left."""
+        logger.info("rate_limit_wait", remaining=self.rate_remaining, limit=self.rate_limit)
+        await asyncio.sleep(RATE_LIMIT_WINDOW)
+        self.rate_remaining = self.rate_limit
 
     @animecache.cached_query(ttl=timedelta(days=1))
     async def request_paginated(self, query, parameters):
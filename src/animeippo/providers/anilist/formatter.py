@@ -1,11 +1,16 @@
 import polars as pl
-from fast_json_normalize import fast_json_normalize
 
 from animeippo.providers import util
 from animeippo.providers.anilist.data import GENRE_FEATURE_STRUCTS
 from animeippo.providers.anilist.schema import (
+    ANI_MANGA_RAW_SCHEMA,
     ANI_MANGA_SCHEMA,
+    ANI_MEDIA_RAW_SCHEMA,
+    ANI_MEDIA_SCHEMA,
+    ANI_SEASONAL_RAW_SCHEMA,
     ANI_SEASONAL_SCHEMA,
+    ANI_WATCHLIST_ENTRY_SCHEMA,
+    ANI_WATCHLIST_RAW_SCHEMA,
     ANI_WATCHLIST_SCHEMA,
 )
 from animeippo.providers.columns import (
@@ -17,11 +22,26 @@ from animeippo.providers.mappers import (
     SelectorMapper,
 )
 
+_ANILIST_MAPPINGS = {}
+
 
 def get_anilist_mapping(tag_lookup):
-    """Get ANILIST_MAPPING with tag enrichment based on tag_lookup."""
+    """Get ANILIST_MAPPING with tag enrichment based on tag_lookup.
+
+    Memoised per tag lookup object, so the lookup frame and the compiled
+    mapping plans are only built once.
+    """
+    key = id(tag_lookup)
+
+    if key not in _ANILIST_MAPPINGS:
+        # Keep a reference to tag_lookup so that its id stays valid
+        _ANILIST_MAPPINGS[key] = (tag_lookup, build_anilist_mapping(tag_lookup))
+
+    return _ANILIST_MAPPINGS[key][1]
+
 
-    tag_lookup_df = pl.DataFrame(
+def build_tag_lookup_frame(tag_lookup):
+    return pl.DataFrame(
         [
             {
                 "tag_id": tag_id,
@@ -34,6 +54,10 @@ def get_anilist_mapping(tag_lookup):
         ]
     )
 
+
+def build_anilist_mapping(tag_lookup):
+    tag_lookup_df = build_tag_lookup_frame(tag_lookup)
+
     def enrich_features(df):
         """Build feature_info: tags enriched with metadata + genres as structs."""
         tag_info = (
@@ -77,15 +101,13 @@ def get_anilist_mapping(tag_lookup):
             .to_series()
         )
 
-    ANILIST_MAPPING[Columns.FEATURE_INFO] = QueryMapper(enrich_features)
-
-    return ANILIST_MAPPING
+    return {**ANILIST_MAPPING, Columns.FEATURE_INFO: QueryMapper(enrich_features)}
 
 
 def transform_seasonal_data(data, tag_lookup):
-    # Believe me, with polars 1.39 this is way faster than
-    # original = pl.json_normalize(data["data"]["media"])
-    original = pl.from_pandas(fast_json_normalize(data["data"]["media"]))
+    # Faster than both pl.json_normalize and fast_json_normalize + pl.from_pandas,
+    # see tests/performance/test_json_normalize.py
+    original = util.normalize_json(data["data"]["media"], ANI_SEASONAL_RAW_SCHEMA)
 
     return util.transform_to_animeippo_format(
         original, ANI_SEASONAL_SCHEMA, get_anilist_mapping(tag_lookup)
@@ -93,32 +115,71 @@ def transform_seasonal_data(data, tag_lookup):
 
 
 def transform_watchlist_data(data, tag_lookup):
-    original = fast_json_normalize(data["data"])
+    original = normalize_watchlist_data(data)
+
+    return assemble_watchlist(
+        transform_watchlist_entries(original), transform_media_data(original, tag_lookup)
+    )
+
+
+def normalize_watchlist_data(data):
+    original = util.normalize_json(data["data"], ANI_WATCHLIST_RAW_SCHEMA)
     # Rename entry-level "status" before stripping "media." prefix to avoid
     # collision with media.status (airing status like RELEASING/FINISHED).
-    original.columns = ["userStatus" if x == "status" else x for x in original.columns]
-    original.columns = [x.removeprefix("media.") for x in original.columns]
+    return original.rename(lambda x: "userStatus" if x == "status" else x.removeprefix("media."))
 
-    original = pl.from_pandas(original)
 
-    return util.transform_to_animeippo_format(
-        original, ANI_WATCHLIST_SCHEMA, get_anilist_mapping(tag_lookup)
+def normalize_media_data(data):
+    return util.normalize_json(data["data"]["media"], ANI_MEDIA_RAW_SCHEMA)
+
+
+def transform_watchlist_entries(original):
+    """User's own columns of the watchlist, without the media."""
+    if len(original) == 0:
+        return pl.DataFrame(schema=ANI_WATCHLIST_ENTRY_SCHEMA)
+
+    return util.run_mappers(original, ANILIST_MAPPING, ANI_WATCHLIST_ENTRY_SCHEMA)
+
+
+def transform_media_data(original, tag_lookup):
+    """Media rows of the watchlist. These don't depend on the user or the rest of
+    the list, so they can be shared between users."""
+    if len(original) == 0:
+        return pl.DataFrame(schema=ANI_MEDIA_SCHEMA)
+
+    return util.run_mappers(original, get_anilist_mapping(tag_lookup), ANI_MEDIA_SCHEMA).select(
+        ANI_MEDIA_SCHEMA.keys()
     )
 
 
-def transform_user_manga_list_data(data, tag_lookup):
-    original = fast_json_normalize(data["data"])
-    original.columns = [x.removeprefix("media.") for x in original.columns]
+def assemble_watchlist(entries, media):
+    """Join watchlist entries with their media rows and add the columns that
+    depend on the whole list."""
+    if len(entries) == 0:
+        return pl.DataFrame(schema=ANI_WATCHLIST_SCHEMA)
+
+    df = entries.join(media.unique(Columns.ID), on=Columns.ID, maintain_order="left")
+    df = df.with_columns(
+        util.build_franchise_ids(
+            df[Columns.ID],
+            df[Columns.FRANCHISE_RELATIONS].list.eval(pl.element().struct.field("related_id")),
+        ).alias(Columns.FRANCHISE)
+    ).select(WATCHLIST_COLUMNS)
 
-    original = pl.from_pandas(original)
+    return util.add_feature_columns(df)
+
+
+def transform_user_manga_list_data(data, tag_lookup):
+    original = util.normalize_json(data["data"], ANI_MANGA_RAW_SCHEMA)
+    original = original.rename(lambda x: x.removeprefix("media."))
 
     return util.transform_to_animeippo_format(
         original, ANI_MANGA_SCHEMA, get_anilist_mapping(tag_lookup)
     )
 
 
-def filter_relations(dataframe, meaningful_relations):
-    return dataframe.select(
+def filter_relations(meaningful_relations):
+    return (
         pl.col("relations.edges")
         .list.eval(
             pl.when(pl.element().struct.field("relationType").is_in(meaningful_relations)).then(
@@ -126,19 +187,19 @@ def filter_relations(dataframe, meaningful_relations):
             )
         )
         .list.drop_nulls()
-    ).to_series()
+    )
 
 
-def get_continuation(dataframe):
+def get_continuation():
     meaningful_relations = ["PARENT", "PREQUEL"]
 
-    return filter_relations(dataframe, meaningful_relations)
+    return filter_relations(meaningful_relations)
 
 
-def get_adaptation(field):
+def get_adaptation():
     meaningful_relations = ["ADAPTATION"]
 
-    return filter_relations(field, meaningful_relations)
+    return filter_relations(meaningful_relations)
 
 
 FRANCHISE_RELATION_TYPES = [
@@ -153,13 +214,13 @@ FRANCHISE_RELATION_TYPES = [
 ]
 
 
-def get_franchise_relations(dataframe):
-    return filter_relations(dataframe, FRANCHISE_RELATION_TYPES)
+def get_franchise_relations():
+    return filter_relations(FRANCHISE_RELATION_TYPES)
 
 
-def build_typed_franchise_relations(df):
+def get_typed_franchise_relations():
     """Extract typed relation pairs for tiered distance reduction in clustering."""
-    return df.select(
+    return (
         pl.col("relations.edges")
         .list.eval(
             pl.when(pl.element().struct.field("relationType").is_in(FRANCHISE_RELATION_TYPES)).then(
@@ -170,17 +231,13 @@ def build_typed_franchise_relations(df):
             )
         )
         .list.drop_nulls()
-    ).to_series()
+    )
 
 
-def extract_recommendations(df):
+def get_recommendations():
     """Extract community recommendation links as list of {recommended_id, rating} structs."""
-    col_name = "recommendations.edges"
-    if col_name not in df.columns:
-        return pl.Series([None] * len(df))
-
-    return df.select(
-        pl.col(col_name)
+    return (
+        pl.col("recommendations.edges")
         .list.eval(
             pl.when(
                 pl.element().struct.field("node").struct.field("mediaRecommendation").is_not_null()
@@ -196,11 +253,11 @@ def extract_recommendations(df):
             )
         )
         .list.drop_nulls()
-    ).to_series()
+    )
 
 
 def build_franchise_column(df):
-    relations = get_franchise_relations(df)
+    relations = df.select(get_franchise_relations()).to_series()
     ids = df["id"]
     return util.build_franchise_ids(ids, relations)
 
@@ -259,8 +316,8 @@ ANILIST_MAPPING = {
                                     .otherwise(None)
                                 ),
     Columns.SOURCE:             DefaultMapper("source"),
-    Columns.CONTINUATION_TO:    QueryMapper(get_continuation),
-    Columns.ADAPTATION_OF:      QueryMapper(get_adaptation),
+    Columns.CONTINUATION_TO:    SelectorMapper(get_continuation()),
+    Columns.ADAPTATION_OF:      SelectorMapper(get_adaptation()),
     Columns.STUDIOS:            SelectorMapper(get_studios()),
     Columns.USER_COMPLETE_DATE: SelectorMapper(
                                     pl.date(
@@ -269,8 +326,14 @@ ANILIST_MAPPING = {
                                         pl.col("completedAt.day")
                                     )
                                 ),
+    Columns.UPDATED_AT:         DefaultMapper("updatedAt"),
     Columns.FRANCHISE:          QueryMapper(build_franchise_column),
-    Columns.FRANCHISE_RELATIONS: QueryMapper(build_typed_franchise_relations),
-    Columns.RECOMMENDATIONS:     QueryMapper(extract_recommendations),
+    Columns.FRANCHISE_RELATIONS: SelectorMapper(get_typed_franchise_relations()),
+    Columns.RECOMMENDATIONS:     SelectorMapper(get_recommendations()),
 }
 # fmt: on
+
+# Mapped frames follow the mapping order, feature_info is mapped last
+WATCHLIST_COLUMNS = [
+    key for key in [*ANILIST_MAPPING, Columns.FEATURE_INFO] if key in ANI_WATCHLIST_SCHEMA
+]
@@ -1,26 +1,209 @@
+import asyncio
 import os
+import time
 from datetime import timedelta
 
+import aiohttp
+import polars as pl
+import structlog
+
+from animeippo.cache import keys
 from animeippo.providers.anilist.connection import AnilistConnection
 
-from .. import abstract_provider
+from .. import abstract_provider, util
 from .. import caching as animecache
+from ..abstract_provider import QueryProfile
+from ..columns import Columns
+from ..media_store import MediaStore
 from . import data, formatter
+from .schema import ANI_MEDIA_SCHEMA
 
 USER_DATA_TTL_DAYS = int(os.environ.get("USER_DATA_TTL_DAYS", "1"))
 SEASONAL_DATA_TTL_DAYS = int(os.environ.get("SEASONAL_DATA_TTL_DAYS", "7"))
+MEDIA_DATA_TTL_DAYS = int(os.environ.get("MEDIA_DATA_TTL_DAYS", "7"))
+USER_SYNC_STATE_TTL_DAYS = int(os.environ.get("USER_SYNC_STATE_TTL_DAYS", "30"))
+FULL_SYNC_INTERVAL_DAYS = int(os.environ.get("FULL_SYNC_INTERVAL_DAYS", "7"))
+INCREMENTAL_SYNC = os.environ.get("INCREMENTAL_SYNC", "true").lower() == "true"
+ID_BATCH_SIZE = 50
+DAY = timedelta(days=1).total_seconds()
+
+logger = structlog.get_logger()
+
+# fmt: off
+WATCHLIST_ENTRY_FRAGMENT = """
+fragment WatchlistEntry on MediaList {
+    status
+    score(format:POINT_10)
+    completedAt {
+        year
+        month
+        day
+    }
+    updatedAt
+    media {
+        ...WatchlistMedia
+    }
+}
+"""
+# fmt: on
+
+# fmt: off
+# When each entry on the lists of a full sync was last updated, without media
+ENTRY_UPDATES_QUERY = """
+query ($userName: String) {
+    MediaListCollection(userName: $userName, type: ANIME, forceSingleCompletedList: true) {
+        lists {
+            isCustomList
+            entries {
+                mediaId
+                updatedAt
+            }
+        }
+    }
+}
+"""
+# fmt: on
+
+# fmt: off
+MEDIA_FIELDS = {
+    "id":               "id",
+    "idMal":            "idMal",
+    "title":            "title { romaji }",
+    "status":           "status",
+    "format":           "format",
+    "genres":           "genres",
+    "tags":             "tags { id rank }",
+    "meanScore":        "meanScore",
+    "duration":         "duration",
+    "episodes":         "episodes",
+    "source":           "source",
+    "studios":          "studios { edges { node { name isAnimationStudio } }}",
+    "seasonYear":       "seasonYear",
+    "season":           "season",
+    "coverImage":       "coverImage { large }",
+    "relations":        "relations { edges { relationType, node { id, idMal }}}",
+    "recommendations":  """recommendations(sort: RATING_DESC, perPage: 25) {
+                            edges { node { rating mediaRecommendation { id } } }
+                        }""",
+}
+# fmt: on
+
+# Media fields requested per query profile. Recommendations are most of a list's
+# payload and only used for recommending, the profile statistics only need genres.
+QUERY_PROFILES = {
+    QueryProfile.FULL: list(MEDIA_FIELDS),
+    QueryProfile.ANALYSE: [field for field in MEDIA_FIELDS if field != "recommendations"],
+    QueryProfile.PROFILE_STATS: ["id", "idMal", "title", "genres"],
+}
+
+
+def media_fragment(profile):
+    fields = "\n    ".join(MEDIA_FIELDS[field] for field in QUERY_PROFILES[profile])
+
+    return f"\nfragment WatchlistMedia on Media {{\n    {fields}\n}}\n"
+
+
+def status_list_entries(collection):
+    """Entries of a collection's status lists. Custom lists are left out, their
+    entries are on the status lists too unless the user has hidden them."""
+    return [
+        entry
+        for entries in collection["data"]["MediaListCollection"]["lists"]
+        if not entries.get("isCustomList", False)
+        for entry in entries["entries"]
+    ]
 
 
 class AniListProvider(abstract_provider.AbstractAnimeProvider):
-    def __init__(self, cache=None):
+    cache_namespace = "anilist"
+
+    def __init__(self, cache=None, incremental_sync=INCREMENTAL_SYNC):
         self.cache = cache
+        self.incremental_sync = incremental_sync
         self.connection = AnilistConnection(cache)
+        self.media_stores = {
+            profile: MediaStore(
+                cache,
+                keys.make_key(self.cache_namespace, keys.Kind.MEDIA, profile),
+                timedelta(days=MEDIA_DATA_TTL_DAYS),
+            )
+            for profile in QueryProfile
+        }
 
-    @animecache.cached_dataframe(ttl=timedelta(days=USER_DATA_TTL_DAYS))
-    async def get_user_anime_list(self, user_id):
+    async def get_user_anime_list(self, user_id, profile=QueryProfile.FULL):
         if user_id is None:
             return None
 
+        entries = await self.get_user_anime_entries(user_id, profile)
+        media = await self.get_watchlist_media(entries["id"].to_list(), profile)
+
+        return formatter.assemble_watchlist(entries, media)
+
+    async def get_user_anime_entries(self, user_id, profile=QueryProfile.FULL):
+        """User's watchlist entries without the media, which goes to the media store.
+
+        Entries are cached with their sync times. Once they are older than
+        USER_DATA_TTL_DAYS, or while refreshing user data, only entries updated
+        since the last sync are requested and merged in, unless the delta can't
+        be trusted or a periodic full sync is due. Entries are shared by all query
+        profiles, only their media differs. Users that aren't found are remembered
+        for a while, see caching.Negative.
+        """
+        key = keys.make_key(
+            self.cache_namespace, keys.Kind.USER_LIST, "get_user_anime_entries", user=user_id
+        )
+        cache_available = self.cache is not None and self.cache.is_available()
+        now = time.time()
+
+        entries, state = None, None
+        if cache_available:
+            state, negative = await asyncio.to_thread(
+                self.cache.get_json_many, [key + ":sync", animecache.negative_key(key)]
+            )
+
+            if negative:
+                await animecache.raise_negative(self.cache, negative)
+
+            if state:
+                entries = await asyncio.to_thread(self.cache.get_dataframe, key)
+
+        if entries is not None and not await self.has_stored_media(entries, profile):
+            # Listing the whole collection is cheaper than requesting the media by id
+            entries = None
+
+        if (
+            entries is not None
+            and now - state["synced_at"] < USER_DATA_TTL_DAYS * DAY
+            and animecache.reads_cache(keys.Kind.USER_LIST)
+        ):
+            return entries
+
+        synced = None
+        if (
+            entries is not None
+            and self.incremental_sync
+            and now - state["full_synced_at"] < FULL_SYNC_INTERVAL_DAYS * DAY
+        ):
+            synced = await self.sync_user_anime_entries(user_id, entries, profile)
+
+        if synced is None:
+            synced = await animecache.remember_errors(
+                self.cache if cache_available else None,
+                key,
+                self.fetch_user_anime_entries(user_id, profile),
+            )
+            state = {"full_synced_at": now}
+
+        if cache_available:
+            ttl = timedelta(days=USER_SYNC_STATE_TTL_DAYS)
+            await asyncio.to_thread(self.cache.set_dataframe, key, synced, ttl)
+            await asyncio.to_thread(
+                self.cache.set_json, key + ":sync", {**state, "synced_at": now}, ttl
+            )
+
+        return synced
+
+    async def fetch_user_anime_entries(self, user_id, profile=QueryProfile.FULL):
         anime_list = {"data": []}
 
         # fmt: off
@@ -32,59 +215,160 @@ class AniListProvider(abstract_provider.AbstractAnimeProvider):
                     status
                     isCustomList
                     entries {
-                        status
-                        score(format:POINT_10)
-                        completedAt {
-                            year
-                            month
-                            day
-                        }
-                        media {
-                            id
-                            idMal
-                            title { romaji }
-                            status
-                            format
-                            genres
-                            tags {
-                                id
-                                rank
-                            }
-                            meanScore
-                            duration
-                            episodes
-                            source
-                            studios { edges { node { name isAnimationStudio } }}
-                            seasonYear
-                            season
-                            coverImage { large }
-                            relations { edges { relationType, node { id, idMal }}}
-                            recommendations(sort: RATING_DESC, perPage: 25) {
-                                edges {
-                                    node {
-                                        rating
-                                        mediaRecommendation { id }
-                                    }
-                                }
-                            }
-                        }
+                        ...WatchlistEntry
                     }
                 }
             }
         }
-        """
+        """ + WATCHLIST_ENTRY_FRAGMENT + media_fragment(profile)
         # fmt: on
 
         variables = {"userName": user_id}
 
-        collection = await self.connection.request_collection(query, variables)
+        # Not through the query cache, the entries are cached with their sync state
+        async with aiohttp.ClientSession() as session:
+            collection = await self.connection.request_single(session, query, variables)
+
+        anime_list["data"] = status_list_entries(collection)
+
+        return await self.store_watchlist_media(anime_list, profile)
+
+    async def sync_user_anime_entries(self, user_id, entries, profile=QueryProfile.FULL):
+        """Merge entries added or updated since the last sync into cached entries.
+
+        The update times of the entries on the same lists as a full sync are
+        listed first, without media, and only changed entries are requested with
+        their media. Entries no longer listed are dropped. Returns None when the
+        delta can't be trusted: more entries changed than fit on one page, or
+        the merged entries aren't the listed ones.
+        """
+        # fmt: off
+        query = """
+        query ($userName: String, $mediaIds: [Int], $page: Int) {
+            Page(page: $page, perPage: 50) {
+                mediaList(userName: $userName, type: ANIME, mediaId_in: $mediaIds) {
+                    ...WatchlistEntry
+                }
+            }
+        }
+        """ + WATCHLIST_ENTRY_FRAGMENT + media_fragment(profile)
+        # fmt: on
+
+        known = dict(
+            zip(entries[Columns.ID].to_list(), entries[Columns.UPDATED_AT].to_list(), strict=True)
+        )
+        changed_entries = []
+
+        async with aiohttp.ClientSession() as session:
+            listing = await self.connection.request_single(
+                session, ENTRY_UPDATES_QUERY, {"userName": user_id}
+            )
+            listed = {
+                entry["mediaId"]: entry.get("updatedAt") or 0
+                for entry in status_list_entries(listing)
+            }
+            changed = sorted(
+                media_id
+                for media_id, updated_at in listed.items()
+                if (known.get(media_id) or 0) != updated_at
+            )
+
+            if len(changed) > ID_BATCH_SIZE:
+                logger.info("incremental_sync_fallback", reason="too_many_changes")
+                return None
+
+            if changed:
+                response = await self.connection.request_single(
+                    session, query, {"userName": user_id, "mediaIds": changed, "page": 1}
+                )
+                page = response.get("data", {}).get("Page") or {}
+                changed_entries = page.get("mediaList") or []
+
+        delta = await self.store_watchlist_media({"data": changed_entries}, profile)
+        merged = pl.concat(
+            [
+                delta,
+                entries.filter(
+                    pl.col(Columns.ID).is_in(list(listed))
+                    & ~pl.col(Columns.ID).is_in(delta[Columns.ID].implode())
+                ),
+            ]
+        )
+
+        if sorted(merged[Columns.ID].to_list()) != sorted(listed):
+            logger.info("incremental_sync_fallback", reason="listing_mismatch")
+            return None
+
+        logger.debug("incremental_sync", changed=len(delta), removed=len(entries) - len(merged))
 
-        for coll in collection["data"]["MediaListCollection"]["lists"]:
-            if not coll.get("isCustomList", False):
-                for entry in coll["entries"]:
-                    anime_list["data"].append(entry)
+        return merged
 
-        return formatter.transform_watchlist_data(anime_list, self.get_tag_lookup())
+    async def find_media(self, ids, profile):
+        """Stored media rows by id from the profile's store or a fuller one."""
+        rows = {}
+
+        for covering in profile.covered_by():
+            remaining = [media_id for media_id in ids if media_id not in rows]
+
+            if not remaining:
+                break
+
+            rows.update(await self.media_stores[covering].find(remaining))
+
+        return rows
+
+    async def has_stored_media(self, entries, profile):
+        """Whether the media missing from the stores fits in a single id request."""
+        ids = entries["id"].to_list()
+        stored = await self.find_media(ids, profile)
+
+        return len(ids) - len(stored) <= ID_BATCH_SIZE
+
+    async def store_watchlist_media(self, anime_list, profile=QueryProfile.FULL):
+        """Put the media of a response in the profile's store, replacing rows that
+        are stored already, as the response is fresher. Returns the watchlist
+        entries."""
+        original = formatter.normalize_watchlist_data(anime_list)
+        await self.media_stores[profile].put(
+            formatter.transform_media_data(original, self.get_tag_lookup())
+        )
+
+        return formatter.transform_watchlist_entries(original)
+
+    async def get_watchlist_media(self, ids, profile=QueryProfile.FULL):
+        """Media rows for watchlist entries, requesting the ones that have dropped
+        out of the media stores."""
+        rows = await self.find_media(ids, profile)
+        media = util.frame_from_rows(list(rows.values()), ANI_MEDIA_SCHEMA)
+        missing = sorted(set(ids) - set(rows))
+
+        if missing:
+            media = pl.concat([media, await self.request_media(missing, profile)])
+
+        return media
+
+    async def request_media(self, ids, profile=QueryProfile.FULL):
+        """Requests media by id and puts it in the profile's store."""
+        # fmt: off
+        query = """
+        query ($id_in: [Int], $page: Int) {
+            Page(page: $page, perPage: 50) {
+                pageInfo { hasNextPage currentPage lastPage total perPage }
+                media(id_in: $id_in, type: ANIME) {
+                    ...WatchlistMedia
+                }
+            }
+        }
+        """ + media_fragment(profile)
+        # fmt: on
+
+        response = await self.request_batched(query, ids, "id_in")
+        fetched = formatter.transform_media_data(
+            formatter.normalize_media_data(response), self.get_tag_lookup()
+        )
+        await self.media_stores[profile].put(fetched)
+
+        return fetched
 
     @animecache.cached_dataframe(ttl=timedelta(days=SEASONAL_DATA_TTL_DAYS))
     async def get_seasonal_anime_list(self, year, season):
@@ -169,7 +453,7 @@ class AniListProvider(abstract_provider.AbstractAnimeProvider):
 
         return formatter.transform_seasonal_data(anime_list, self.get_tag_lookup())
 
-    @animecache.cached_dataframe(ttl=timedelta(days=USER_DATA_TTL_DAYS))
+    @animecache.cached_dataframe(ttl=timedelta(days=USER_DATA_TTL_DAYS), kind=keys.Kind.USER_LIST)
     async def get_user_manga_list(self, user_id):
         if user_id is None:
             return None
@@ -210,15 +494,30 @@ class AniListProvider(abstract_provider.AbstractAnimeProvider):
 
         variables = {"userName": user_id}
 
-        collection = await self.connection.request_collection(query, variables)
-
-        for coll in collection["data"]["MediaListCollection"]["lists"]:
-            if not coll.get("isCustomList", False):
-                for entry in coll["entries"]:
-                    manga_list["data"].append(entry)
+        collection = await self.connection.request_collection(query, variables, user=user_id)
+        manga_list["data"] = status_list_entries(collection)
 
         return formatter.transform_user_manga_list_data(manga_list, self.get_tag_lookup())
 
+    async def request_batched(self, query, ids, id_variable):
+        """Batch media requests by id to avoid query size limits.
+
+        Uses request_single instead of request_paginated because AniList
+        returns unreliable pagination data for id list queries.
+        Each batch of ID_BATCH_SIZE ids fits in a single page.
+        """
+        all_media = []
+
+        async with aiohttp.ClientSession() as session:
+            for i in range(0, len(ids), ID_BATCH_SIZE):
+                batch = ids[i : i + ID_BATCH_SIZE]
+                result = await self.connection.request_single(
+                    session, query, {id_variable: batch, "page": 1}
+                )
+                all_media.extend(result.get("data", {}).get("Page", {}).get("media", []))
+
+        return {"data": {"media": all_media}}
+
     def get_related_anime(self, related_id):
         pass
 
@@ -37,6 +37,22 @@ ANI_WATCHLIST_SCHEMA = {
     Columns.RECOMMENDATIONS: pl.List(pl.Struct({"recommended_id": pl.UInt32, "rating": pl.Int32})),
 }
 
+# Watchlists are stored as per-user entries and media rows shared between users,
+# joined on id. Franchises depend on the whole list so they are built after the join.
+ANI_WATCHLIST_ENTRY_SCHEMA = {
+    Columns.ID: pl.UInt32,
+    Columns.USER_STATUS: UserStatus,
+    Columns.SCORE: pl.UInt16,
+    Columns.USER_COMPLETE_DATE: pl.Date,
+    Columns.UPDATED_AT: pl.Int64,
+}
+
+ANI_MEDIA_SCHEMA = {
+    key: dtype
+    for key, dtype in ANI_WATCHLIST_SCHEMA.items()
+    if key == Columns.ID or key not in {*ANI_WATCHLIST_ENTRY_SCHEMA, Columns.FRANCHISE}
+}
+
 ANI_SEASONAL_SCHEMA = {
     Columns.ID: pl.UInt32,
     Columns.ID_MAL: pl.UInt32,
@@ -74,3 +90,110 @@ ANI_MANGA_SCHEMA = {
     Columns.USER_STATUS: UserStatus,
     Columns.USER_COMPLETE_DATE: pl.Date,
 }
+
+# Nested shapes of the GraphQL responses. These are used to build frames straight
+# from the JSON payload, keys that are not declared here are ignored.
+
+AniTitle = pl.Struct({"romaji": pl.Utf8})
+AniDate = pl.Struct({"year": pl.Int64, "month": pl.Int64, "day": pl.Int64})
+AniCoverImage = pl.Struct({"large": pl.Utf8})
+AniTags = pl.List(pl.Struct({"id": pl.Int64, "rank": pl.Int64}))
+AniStudios = pl.Struct(
+    {
+        "edges": pl.List(
+            pl.Struct({"node": pl.Struct({"name": pl.Utf8, "isAnimationStudio": pl.Boolean})})
+        )
+    }
+)
+AniRelations = pl.Struct(
+    {
+        "edges": pl.List(
+            pl.Struct(
+                {
+                    "relationType": pl.Utf8,
+                    "node": pl.Struct({"id": pl.Int64, "idMal": pl.Int64}),
+                }
+            )
+        )
+    }
+)
+AniRecommendations = pl.Struct(
+    {
+        "edges": pl.List(
+            pl.Struct(
+                {
+                    "node": pl.Struct(
+                        {
+                            "rating": pl.Int64,
+                            "mediaRecommendation": pl.Struct({"id": pl.Int64}),
+                        }
+                    )
+                }
+            )
+        )
+    }
+)
+
+ANI_SEASONAL_RAW_SCHEMA = {
+    "id": pl.Int64,
+    "idMal": pl.Int64,
+    "title": AniTitle,
+    "status": pl.Utf8,
+    "format": pl.Utf8,
+    "genres": pl.List(pl.Utf8),
+    "tags": AniTags,
+    "meanScore": pl.Int64,
+    "duration": pl.Int64,
+    "episodes": pl.Int64,
+    "source": pl.Utf8,
+    "studios": AniStudios,
+    "seasonYear": pl.Int64,
+    "season": pl.Utf8,
+    "relations": AniRelations,
+    "popularity": pl.Int64,
+    "coverImage": AniCoverImage,
+}
+
+ANI_MEDIA_RAW_SCHEMA = {
+    "id": pl.Int64,
+    "idMal": pl.Int64,
+    "title": AniTitle,
+    "status": pl.Utf8,
+    "format": pl.Utf8,
+    "genres": pl.List(pl.Utf8),
+    "tags": AniTags,
+    "meanScore": pl.Int64,
+    "duration": pl.Int64,
+    "episodes": pl.Int64,
+    "source": pl.Utf8,
+    "studios": AniStudios,
+    "seasonYear": pl.Int64,
+    "season": pl.Utf8,
+    "coverImage": AniCoverImage,
+    "relations": AniRelations,
+    "recommendations": AniRecommendations,
+}
+
+ANI_WATCHLIST_RAW_SCHEMA = {
+    "status": pl.Utf8,
+    "score": pl.Float64,
+    "completedAt": AniDate,
+    "updatedAt": pl.Int64,
+    "media": pl.Struct(ANI_MEDIA_RAW_SCHEMA),
+}
+
+ANI_MANGA_RAW_SCHEMA = {
+    "status": pl.Utf8,
+    "score": pl.Float64,
+    "completedAt": AniDate,
+    "media": pl.Struct(
+        {
+            "id": pl.Int64,
+            "idMal": pl.Int64,
+            "title": AniTitle,
+            "genres": pl.List(pl.Utf8),
+            "tags": AniTags,
+            "meanScore": pl.Int64,
+        }
+    ),
+}
@@ -1,31 +1,174 @@
 import asyncio
+import contextlib
+import contextvars
+import enum
 import functools
+import os
 import threading
 from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from http import HTTPStatus
 
+import aiohttp
 import structlog
 
+from ..cache import keys
+
 logger = structlog.get_logger()
 
 
+class Negative(enum.StrEnum):
+    NOT_FOUND = "not_found"
+    EMPTY = "empty"
+    ERROR = "error"
+
+
+# Negative entries are short lived, so new users, lists that are filled in and
+# upstreams that recover are seen again soon
+NEGATIVE_TTLS = {
+    Negative.NOT_FOUND: timedelta(seconds=int(os.environ.get("NOT_FOUND_TTL_SECONDS", "600"))),
+    Negative.EMPTY: timedelta(seconds=int(os.environ.get("EMPTY_TTL_SECONDS", "300"))),
+    Negative.ERROR: timedelta(seconds=int(os.environ.get("UPSTREAM_ERROR_TTL_SECONDS", "30"))),
+}
+# Upstream calls saved by negative entries, by kind
+NEGATIVE_HITS_KEY = keys.make_key(keys.APP, keys.Kind.STATE, "negative_cache_hits")
+# Set while users' data is read from upstream instead of the cache
+refreshing_users = contextvars.ContextVar("refreshing_users", default=False)
+
+
+@contextlib.contextmanager
+def refreshing_user_data():
+    """Requests users' data from upstream within the block, and caches it again,
+    so that work done ahead of time sees their latest lists."""
+    token = refreshing_users.set(True)
+
+    try:
+        yield
+    finally:
+        refreshing_users.reset(token)
+
+
+def reads_cache(kind):
+    """Whether data of a kind may be read from the cache now."""
+    return kind not in keys.USER_KINDS or not refreshing_users.get()
+
+
+def negative_key(cachekey):
+    return f"{cachekey}:negative"
+
+
+def negative_kind(error):
+    """Not found or transient, None for errors that shouldn't be cached, like
+    bad requests, which are more likely our mistake."""
+    if error.status == HTTPStatus.NOT_FOUND:
+        return Negative.NOT_FOUND
+
+    if (
+        error.status == HTTPStatus.TOO_MANY_REQUESTS
+        or error.status >= HTTPStatus.INTERNAL_SERVER_ERROR
+    ):
+        return Negative.ERROR
+
+    return None
+
+
+def is_empty(data):
+    """Whether a response has no items anywhere, like a user's empty list."""
+    if isinstance(data, dict):
+        return all(is_empty(value) for value in data.values())
+
+    if isinstance(data, list):
+        return not data
+
+    return data is None
+
+
+async def remember_errors(cache, cachekey, request):
+    """Awaits a request, remembering not found and transient errors in the
+    cache if one is given."""
+    try:
+        return await request
+    except aiohttp.ClientResponseError as error:
+        kind = negative_kind(error)
+
+        if cache is not None and kind is not None:
+            logger.debug("negative_cache_save", kind=kind, status=error.status)
+            entry = {
+                "kind": kind,
+                "status": error.status,
+                "message": error.message,
+                "url": str(error.request_info.real_url),
+            }
+            await asyncio.to_thread(
+                cache.set_json, negative_key(cachekey), entry, NEGATIVE_TTLS[kind]
+            )
+        raise
+
+
+async def count_saved(cache, kind):
+    logger.debug("negative_cache_hit", kind=kind)
+    await asyncio.to_thread(cache.increment, NEGATIVE_HITS_KEY, kind)
+
+
+async def raise_negative(cache, entry):
+    """Raises a remembered error again instead of asking upstream."""
+    await count_saved(cache, entry["kind"])
+
+    raise aiohttp.ClientResponseError(
+        request_info=aiohttp.RequestInfo(
+            url=entry["url"], method="GET", headers={}, real_url=entry["url"]
+        ),
+        history=(),
+        status=entry["status"],
+        message=entry["message"],
+    )
+
+
 def cached_query(ttl):
+    """Caches raw responses by query. Responses for a user's lists are given the
+    user, so they can be invalidated with the user's other data.
+
+    Empty responses are cached for a short while, and so are not found and
+    transient upstream errors, which are raised again until they expire.
+    """
+
     def decorator_query(func):
         @functools.wraps(func)
-        async def wrapper(self, query, parameters):
+        async def wrapper(self, query, parameters, user=None):
             data = None
-            cachekey = "".join(query.split()) + str(parameters)
+            kind = keys.Kind.QUERY if user is None else keys.Kind.USER_QUERY
+            cachekey = keys.make_key(
+                keys.namespace_of(self),
+                kind,
+                keys.digest("".join(query.split()) + str(parameters)),
+                user=user,
+            )
 
             cache_available = self.cache is not None and self.cache.is_available()
 
-            if cache_available:
-                data = await asyncio.to_thread(self.cache.get_json, cachekey)
+            if cache_available and reads_cache(kind):
+                data, negative = await asyncio.to_thread(
+                    self.cache.get_json_many, [cachekey, negative_key(cachekey)]
+                )
+
+                if negative:
+                    await raise_negative(self.cache, negative)
 
             if data:
                 logger.debug("cache_hit", func=func.__name__, params=str(parameters))
+
+                if is_empty(data):
+                    await count_saved(self.cache, Negative.EMPTY)
+
                 return data
             else:
                 logger.debug("cache_miss", func=func.__name__, params=str(parameters))
-                data = await func(self, query, parameters)
+
+                data = await remember_errors(
+                    self.cache if cache_available else None,
+                    cachekey,
+                    func(self, query, parameters),
+                )
 
                 if cache_available:
                     logger.debug("cache_save", func=func.__name__)
@@ -34,7 +177,7 @@ def cached_query(ttl):
                         args=(
                             cachekey,
                             data,
-                            ttl,
+                            NEGATIVE_TTLS[Negative.EMPTY] if is_empty(data) else ttl,
                         ),
                     ).start()
 
@@ -45,26 +188,33 @@ def cached_query(ttl):
     return decorator_query
 
 
-def cached_dataframe(ttl):
+def cached_dataframe(ttl, kind=keys.Kind.SEASONAL):
+    """Caches formatted frames by arguments. For kinds of user data, the first
+    argument is the user. Frames of another format are misses, see keys."""
+
     def decorator_query(func):
         @functools.wraps(func)
         async def wrapper(self, *args):
             data = None
-            cachekey = (
-                func.__name__
-                + " "
-                + ",".join([str(arg) if arg else "" for arg in args])
-                + "_"
-                + self.__class__.__name__
+            user, params = (args[0], args[1:]) if kind in keys.USER_KINDS else (None, args)
+            cachekey = keys.make_key(
+                keys.namespace_of(self),
+                kind,
+                ":".join([func.__name__, *[str(arg) if arg else "" for arg in params]]),
+                user=user,
             )
 
             cache_available = self.cache is not None and self.cache.is_available()
 
-            if cache_available:
+            if cache_available and reads_cache(kind):
                 data = await asyncio.to_thread(self.cache.get_dataframe, cachekey)
 
             if data is not None:
                 logger.debug("cache_hit", func=func.__name__, args=str(args))
+
+                if data.is_empty():
+                    await count_saved(self.cache, Negative.EMPTY)
+
                 return data
             else:
                 logger.debug("cache_miss", func=func.__name__, args=str(args))
@@ -78,7 +228,9 @@ def cached_dataframe(ttl):
                             self.cache.set_dataframe,
                             cachekey,
                             data,
-                            ttl,
+                            NEGATIVE_TTLS[Negative.EMPTY]
+                            if data is not None and data.is_empty()
+                            else ttl,
                         )
 
             return data
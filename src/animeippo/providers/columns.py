@@ -25,6 +25,7 @@ class Columns(StrEnum):
     FEATURE_INFO = "feature_info"
     STUDIOS = "studios"
     USER_COMPLETE_DATE = "user_complete_date"
+    UPDATED_AT = "updated_at"
     SEASON_YEAR = "season_year"
     SEASON = "season"
     RATING = "rating"
@@ -12,6 +12,9 @@ class DefaultMapper:
     def map(self, series):
         return series.get_column(self.name) if self.name in series.columns else pl.lit(self.default)
 
+    def expression(self, columns):
+        return pl.col(self.name) if self.name in columns else pl.lit(self.default)
+
 
 class SelectorMapper:
     def __init__(self, selector):
@@ -23,6 +26,12 @@ class SelectorMapper:
         except pl.exceptions.ColumnNotFoundError:
             return pl.lit(None)
 
+    def expression(self, columns):
+        if set(self.selector.meta.root_names()) <= set(columns):
+            return self.selector
+
+        return pl.lit(None)
+
 
 class QueryMapper:
     def __init__(self, query):
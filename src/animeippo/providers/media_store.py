@@ -0,0 +1,86 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from datetime import timedelta
+
+import structlog
+
+# Rows kept in process by each store, and for how long. Local copies are short
+# lived, so they don't outlast cached rows or clearing the cache.
+LOCAL_STORE_SIZE = int(os.environ.get("MEDIA_LOCAL_STORE_SIZE", "2000"))
+LOCAL_TTL = timedelta(minutes=int(os.environ.get("MEDIA_LOCAL_TTL_MINUTES", "5")))
+
+logger = structlog.get_logger()
+
+
+class MediaStore:
+    """Formatted media rows shared between user lists, keyed by media id.
+
+    Popular titles are on thousands of lists, so rows are stored once per title
+    in the cache instead of inside every user's frame. Recently used rows are
+    also kept in process, which keeps the store working without a cache. The
+    namespace is a key of the media kind, so rows of another format are misses.
+    """
+
+    def __init__(self, cache, namespace, ttl, *, local_size=LOCAL_STORE_SIZE, local_ttl=LOCAL_TTL):
+        self.cache = cache
+        self.namespace = namespace
+        self.ttl = ttl
+        self.local_size = local_size
+        self.local_ttl = min(ttl, local_ttl)
+        self.local = OrderedDict()
+
+    def key(self, media_id):
+        return f"{self.namespace}:{media_id}"
+
+    async def find(self, ids):
+        """Stored rows as a dict by id, ids that are not stored are left out."""
+        now = time.monotonic()
+        rows = {}
+
+        for media_id in ids:
+            expires, row = self.local.get(media_id, (0, None))
+
+            if expires > now:
+                self.local.move_to_end(media_id)
+                rows[media_id] = row
+
+        remote_ids = [media_id for media_id in ids if media_id not in rows]
+
+        if remote_ids and self.cache is not None and self.cache.is_available():
+            stored = await asyncio.to_thread(
+                self.cache.get_json_many, [self.key(media_id) for media_id in remote_ids]
+            )
+            found = {
+                media_id: row
+                for media_id, row in zip(remote_ids, stored, strict=True)
+                if row is not None
+            }
+            self.remember(found)
+            rows.update(found)
+
+        logger.debug("media_store", hits=len(rows), misses=len(ids) - len(rows))
+
+        return rows
+
+    async def put(self, media):
+        rows = dict(zip(media["id"].to_list(), media.to_dicts(), strict=True))
+        self.remember(rows)
+
+        if rows and self.cache is not None and self.cache.is_available():
+            await asyncio.to_thread(
+                self.cache.set_json_many,
+                {self.key(media_id): row for media_id, row in rows.items()},
+                self.ttl,
+            )
+
+    def remember(self, rows):
+        expires = time.monotonic() + self.local_ttl.total_seconds()
+
+        for media_id, row in rows.items():
+            self.local[media_id] = (expires, row)
+            self.local.move_to_end(media_id)
+
+        while len(self.local) > self.local_size:
+            self.local.popitem(last=False)
@@ -1,17 +1,18 @@
 import polars as pl
-from fast_json_normalize import fast_json_normalize
 
 from animeippo.providers.anilist.data import GENRE_FEATURE_STRUCTS, TAG_BY_NAME
 from animeippo.providers.columns import Columns
-from animeippo.providers.mappers import QueryMapper, SingleMapper
+from animeippo.providers.mappers import QueryMapper, SelectorMapper
 
 from ..anilist.formatter import ANILIST_MAPPING
 from ..myanimelist.formatter import MAL_MAPPING
-from ..util import transform_to_animeippo_format
+from ..util import normalize_json, transform_to_animeippo_format
 from .schema import (
     MIXED_ANI_MANGA_SCHEMA,
+    MIXED_ANI_MEDIA_RAW_SCHEMA,
     MIXED_ANI_SEASONAL_SCHEMA,
     MIXED_ANI_WATCHLIST_SCHEMA,
+    MIXED_MAL_LIST_RAW_SCHEMA,
     MIXED_MAL_MANGA_SCHEMA,
     MIXED_MAL_WATCHLIST_SCHEMA,
 )
@@ -66,25 +67,37 @@ def _enrich_mixed_features(df):
     )
 
 
+def get_adaptation():
+    """Adaptations by MAL id, since the mixed provider matches them against MAL manga lists."""
+    return (
+        pl.col("relations.edges")
+        .list.eval(
+            pl.when(
+                (pl.element().struct.field("relationType") == "ADAPTATION")
+                & pl.element().struct.field("node").struct.field("idMal").is_not_null()
+            ).then(pl.element().struct.field("node").struct.field("idMal"))
+        )
+        .list.drop_nulls()
+    )
+
+
 # Mixed provider gets tags pre-enriched with name/category from AniList,
 # unlike the standard AniList path which gets tag IDs and enriches them
 MIXED_ANI_MAPPING = {
     **ANILIST_MAPPING,
+    Columns.ADAPTATION_OF: SelectorMapper(get_adaptation()),
     Columns.FEATURE_INFO: QueryMapper(_enrich_mixed_features),
 }
 
 
 def transform_mal_watchlist_data(data):
-    original = pl.from_pandas(fast_json_normalize(data["data"]))
+    original = normalize_json(data["data"], MIXED_MAL_LIST_RAW_SCHEMA)
 
     return transform_to_animeippo_format(original, MIXED_MAL_WATCHLIST_SCHEMA, MAL_MAPPING)
 
 
 def transform_ani_watchlist_data(data, mal_df):
-    original = fast_json_normalize(data["data"]["media"])
-    original.columns = [x.removeprefix("media.") for x in original.columns]
-
-    original = pl.from_pandas(original)
+    original = normalize_json(data["data"]["media"], MIXED_ANI_MEDIA_RAW_SCHEMA)
 
     df = transform_to_animeippo_format(original, MIXED_ANI_WATCHLIST_SCHEMA, MIXED_ANI_MAPPING)
 
@@ -97,16 +110,13 @@ def transform_ani_watchlist_data(data, mal_df):
 
 
 def transform_mal_manga_data(data):
-    original = pl.from_pandas(fast_json_normalize(data["data"]))
+    original = normalize_json(data["data"], MIXED_MAL_LIST_RAW_SCHEMA)
 
     return transform_to_animeippo_format(original, MIXED_MAL_MANGA_SCHEMA, MAL_MAPPING)
 
 
 def transform_ani_manga_data(data, mal_df):
-    original = fast_json_normalize(data["data"]["media"])
-    original.columns = [x.removeprefix("media.") for x in original.columns]
-
-    original = pl.from_pandas(original)
+    original = normalize_json(data["data"]["media"], MIXED_ANI_MEDIA_RAW_SCHEMA)
 
     df = transform_to_animeippo_format(original, MIXED_ANI_MANGA_SCHEMA, MIXED_ANI_MAPPING)
 
@@ -119,30 +129,6 @@ def transform_ani_manga_data(data, mal_df):
 
 
 def transform_ani_seasonal_data(data):
-    original = pl.from_pandas(fast_json_normalize(data["data"]["media"]))
-
-    ani_df = transform_to_animeippo_format(original, MIXED_ANI_SEASONAL_SCHEMA, MIXED_ANI_MAPPING)
-
-    ani_df = ani_df.with_columns(
-        **{
-            Columns.ADAPTATION_OF: SingleMapper("relations.edges", get_adaptation, dtype=pl.List)
-            .map(original)
-            .cast(pl.List(pl.UInt32)),
-        }
-    )
-
-    return ani_df
-
-
-def get_adaptation(field):
-    relations = []
-
-    for item in field:
-        relationType = item.get("relationType", "")
-        node = item.get("node", {})
-        mal_id = node.get("idMal", None)
-
-        if relationType == "ADAPTATION" and mal_id is not None:
-            relations.append(mal_id)
+    original = normalize_json(data["data"]["media"], MIXED_ANI_MEDIA_RAW_SCHEMA)
 
-    return relations
+    return transform_to_animeippo_format(original, MIXED_ANI_SEASONAL_SCHEMA, MIXED_ANI_MAPPING)
@@ -1,25 +1,42 @@
+import asyncio
 from datetime import timedelta
 
-import aiohttp
+import structlog
 
+from ...cache import keys
 from .. import abstract_provider
 from .. import caching as animecache
+from ..abstract_provider import QueryProfile
 from ..anilist import provider as ani
 from ..myanimelist.connection import MyAnimeListConnection
 from . import formatter
 
-ANILIST_ID_BATCH_SIZE = 50
+MEDIA_STORE_TTL = timedelta(days=7)
+
+logger = structlog.get_logger()
 
 
 class MixedProvider(abstract_provider.AbstractAnimeProvider):
+    cache_namespace = "mixed"
+
     def __init__(self, cache=None):
         self.cache = cache
 
         self.ani_provider = ani.AniListProvider(cache)
         self.mal_connection = MyAnimeListConnection(cache)
 
-    @animecache.cached_dataframe(ttl=timedelta(days=1))
-    async def get_user_anime_list(self, user_id):
+    @property
+    def connection(self):
+        """The AniList connection, seasonal data and media come from AniList."""
+        return self.ani_provider.connection
+
+    async def get_user_anime_list(self, user_id, profile=QueryProfile.FULL):
+        # AniList data for MAL lists is requested without recommendations already,
+        # so every query profile shares the same list
+        return await self.get_user_watchlist(user_id)
+
+    @animecache.cached_dataframe(ttl=timedelta(days=1), kind=keys.Kind.USER_LIST)
+    async def get_user_watchlist(self, user_id):
         if not user_id:
             return None
 
@@ -31,7 +48,7 @@ class MixedProvider(abstract_provider.AbstractAnimeProvider):
 
         parameters = {"nsfw": "true", "fields": ",".join(fields), "limit": "1000"}
 
-        mal_list = await self.mal_connection.request_anime_list(mal_query, parameters)
+        mal_list = await self.mal_connection.request_anime_list(mal_query, parameters, user=user_id)
         mal_df = formatter.transform_mal_watchlist_data(mal_list)
 
         ani_query = """
@@ -65,7 +82,7 @@ class MixedProvider(abstract_provider.AbstractAnimeProvider):
         }
         """
 
-        ani_list = await self.request_anilist_batched(ani_query, mal_df["id"].to_list())
+        ani_list = await self.request_anilist_by_mal_ids(ani_query, mal_df["id"].to_list())
 
         return formatter.transform_ani_watchlist_data(ani_list, mal_df)
 
@@ -152,7 +169,7 @@ class MixedProvider(abstract_provider.AbstractAnimeProvider):
 
         return formatter.transform_ani_seasonal_data(anime_list)
 
-    @animecache.cached_dataframe(ttl=timedelta(days=1))
+    @animecache.cached_dataframe(ttl=timedelta(days=1), kind=keys.Kind.USER_LIST)
     async def get_user_manga_list(self, user_id):
         if user_id is None:
             return None
@@ -165,7 +182,7 @@ class MixedProvider(abstract_provider.AbstractAnimeProvider):
 
         parameters = {"nsfw": "true", "fields": ",".join(fields), "limit": "1000"}
 
-        mal_list = await self.mal_connection.request_anime_list(mal_query, parameters)
+        mal_list = await self.mal_connection.request_anime_list(mal_query, parameters, user=user_id)
         mal_df = formatter.transform_mal_manga_data(mal_list)
 
         ani_query = """
@@ -189,28 +206,53 @@ class MixedProvider(abstract_provider.AbstractAnimeProvider):
         }
         """
 
-        ani_list = await self.request_anilist_batched(ani_query, mal_df["id"].to_list())
+        ani_list = await self.request_anilist_by_mal_ids(ani_query, mal_df["id"].to_list())
 
         return formatter.transform_ani_manga_data(ani_list, mal_df)
 
-    async def request_anilist_batched(self, query, mal_ids):
-        """Batch AniList requests to avoid query size limits.
+    async def request_anilist_by_mal_ids(self, query, mal_ids):
+        """AniList media for MAL ids, stored per MAL id in the cache.
 
-        Uses request_single instead of request_paginated because AniList
-        returns unreliable pagination data for idMal_in queries.
-        Each batch of ANILIST_ID_BATCH_SIZE IDs fits in a single page.
+        The MAL to AniList mapping never changes and the same titles recur
+        across users, so only ids missing from the store are requested from
+        AniList. Ids AniList does not know are stored as empty objects so they
+        are not requested again either.
         """
-        all_media = []
+        query_digest = keys.digest("".join(query.split()))
+        cachekeys = [
+            keys.make_key(self.cache_namespace, keys.Kind.QUERY, f"{query_digest}:{mal_id}")
+            for mal_id in mal_ids
+        ]
+        cache_available = self.cache is not None and self.cache.is_available()
 
-        async with aiohttp.ClientSession() as session:
-            for i in range(0, len(mal_ids), ANILIST_ID_BATCH_SIZE):
-                batch = mal_ids[i : i + ANILIST_ID_BATCH_SIZE]
-                result = await self.ani_provider.connection.request_single(
-                    session, query, {"idMal_in": batch, "page": 1}
+        if cache_available:
+            stored = await asyncio.to_thread(self.cache.get_json_many, cachekeys)
+        else:
+            stored = [None] * len(cachekeys)
+
+        missing = {
+            key: mal_id
+            for key, mal_id, media in zip(cachekeys, mal_ids, stored, strict=True)
+            if media is None
+        }
+        logger.debug("media_store", hits=len(cachekeys) - len(missing), misses=len(missing))
+
+        fetched = []
+        if missing:
+            response = await self.ani_provider.request_batched(
+                query, list(missing.values()), "idMal_in"
+            )
+            fetched = response["data"]["media"]
+
+            if cache_available:
+                by_mal_id = {media["idMal"]: media for media in fetched}
+                await asyncio.to_thread(
+                    self.cache.set_json_many,
+                    {key: by_mal_id.get(mal_id, {}) for key, mal_id in missing.items()},
+                    MEDIA_STORE_TTL,
                 )
-                all_media.extend(result.get("data", {}).get("Page", {}).get("media", []))
 
-        return {"data": {"media": all_media}}
+        return {"data": {"media": [media for media in stored if media] + fetched}}
 
     def get_nsfw_tags(self):
         return self.ani_provider.get_nsfw_tags()
@@ -1,5 +1,6 @@
 import polars as pl
 
+from animeippo.providers.anilist.schema import ANI_SEASONAL_RAW_SCHEMA
 from animeippo.providers.columns import (
     Columns,
     FeatureInfo,
@@ -78,3 +79,19 @@ MIXED_ANI_SEASONAL_SCHEMA = {
         pl.Struct({"related_id": pl.UInt32, "relation_type": pl.Utf8})
     ),
 }
+
+# Nested response shapes, see anilist.schema for details
+
+MIXED_MAL_LIST_RAW_SCHEMA = {
+    "node": pl.Struct({"id": pl.Int64}),
+    "list_status": pl.Struct({"status": pl.Utf8, "score": pl.Int64, "finish_date": pl.Utf8}),
+}
+
+# Mixed media queries get tags pre-enriched with name and category. Watchlist and
+# manga queries request a subset of these fields, the rest come out as nulls.
+MIXED_ANI_MEDIA_RAW_SCHEMA = {
+    **ANI_SEASONAL_RAW_SCHEMA,
+    "tags": pl.List(
+        pl.Struct({"name": pl.Utf8, "rank": pl.Int64, "isAdult": pl.Boolean, "category": pl.Utf8})
+    ),
+}
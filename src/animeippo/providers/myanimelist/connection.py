@@ -8,8 +8,8 @@ import structlog
 
 from .. import caching as animecache
 
-MAL_API_URL = "https://api.myanimelist.net/v2"
-MAL_AUTH_URL = "https://myanimelist.net/v1/oauth2/token"
+MAL_API_URL = os.environ.get("MAL_API_URL", "https://api.myanimelist.net/v2")
+MAL_AUTH_URL = os.environ.get("MAL_AUTH_URL", "https://myanimelist.net/v1/oauth2/token")
 ENV_FILE = "conf/prod.env"
 REQUEST_TIMEOUT = aiohttp.ClientTimeout(total=60)
 MAL_REQUEST_INTERVAL = 1  # seconds between requests
@@ -19,6 +19,8 @@ logger = structlog.get_logger()
 
 
 class MyAnimeListConnection:
+    cache_namespace = "myanimelist"
+
     def __init__(self, cache=None):
         self.cache = cache
         self.access_token = os.environ.get("MAL_API_TOKEN", None)
@@ -1,14 +1,11 @@
-from datetime import datetime
-
-import numpy as np
 import polars as pl
-from fast_json_normalize import fast_json_normalize
 
 from animeippo.providers.columns import (
     Columns,
 )
-from animeippo.providers.mappers import DefaultMapper, MultiMapper, SelectorMapper, SingleMapper
+from animeippo.providers.mappers import DefaultMapper, SelectorMapper
 from animeippo.providers.myanimelist.schema import (
+    MAL_WATCHLIST_RAW_SCHEMA,
     MAL_WATCHLIST_SCHEMA,
 )
 
@@ -16,55 +13,37 @@ from .. import util
 
 
 def transform_watchlist_data(data):
-    original = pl.from_pandas(fast_json_normalize(data["data"]))
+    original = util.normalize_json(data["data"], MAL_WATCHLIST_RAW_SCHEMA)
 
     return util.transform_to_animeippo_format(original, MAL_WATCHLIST_SCHEMA, MAL_MAPPING)
 
 
-def split_id_name_field(field):
-    names = []
-
-    for item in field:
-        names.append(item.get("name", np.nan))
-
-    return names
-
-
-def filter_relations(relation, related_id, meaningful_relations):
-    if relation in meaningful_relations and id is not None:
-        return related_id
+def split_id_name_field(column):
+    return pl.col(column).list.eval(pl.element().struct.field("name")).fill_null([])
 
-    return None
 
-
-def get_continuation(relation, related_id):
+def get_continuation():
     meaningful_relations = ["parent_story", "prequel"]
 
-    return (filter_relations(relation, related_id, meaningful_relations),)
-
+    return pl.when(pl.col("relation_type").is_in(meaningful_relations)).then(pl.col("node.id"))
 
-def get_image_url(field):
-    return field.get("medium", None)
 
+def get_user_complete_date(column):
+    return pl.col(column).str.to_date("%Y-%m-%d", strict=False)
 
-def get_user_complete_date(finish_date):
-    if finish_date is None:
-        return None
-
-    return datetime.strptime(finish_date, "%Y-%m-%d")
 
+STATUS_MAPPING = {
+    "currently_airing": "RELEASING",
+    "finished_airing": "FINISHED",
+    "not_yet_aired": "NOT_YET_RELEASED",
+    "finished": "FINISHED",
+    "currently_publishing": "RELEASING",
+    "not_yet_published": "NOT_YET_RELEASED",
+}
 
-def get_status(status):
-    mapping = {
-        "currently_airing": "RELEASING",
-        "finished_airing": "FINISHED",
-        "not_yet_aired": "NOT_YET_RELEASED",
-        "finished": "FINISHED",
-        "currently_publishing": "RELEASING",
-        "not_yet_published": "NOT_YET_RELEASED",
-    }
 
-    return mapping.get(status, status)
+def get_status(column):
+    return pl.col(column).replace(STATUS_MAPPING)
 
 
 # fmt: off
@@ -94,21 +73,18 @@ MAL_MAPPING = {
                                          "completed": "COMPLETED", "dropped": "DROPPED"},
                                     )
                                 ),
-    Columns.GENRES:             SingleMapper("node.genres", split_id_name_field, [], pl.List),
-    Columns.STUDIOS:            SingleMapper("node.studios", split_id_name_field, [], pl.List),
-    Columns.STATUS:             SingleMapper("node.status", get_status),
+    Columns.GENRES:             SelectorMapper(split_id_name_field("node.genres")),
+    Columns.STUDIOS:            SelectorMapper(split_id_name_field("node.studios")),
+    Columns.STATUS:             SelectorMapper(get_status("node.status")),
     Columns.SCORE:              SelectorMapper(
                                     pl.when(pl.col("list_status.score") > 0)
                                     .then(pl.col("list_status.score"))
                                     .otherwise(None)
                                 ),
-    Columns.USER_COMPLETE_DATE: SingleMapper(
-                                    "list_status.finish_date",
-                                    get_user_complete_date,
-                                    None,
-                                    datetime
+    Columns.USER_COMPLETE_DATE: SelectorMapper(
+                                    get_user_complete_date("list_status.finish_date")
                                 ),
-    Columns.CONTINUATION_TO:    MultiMapper(["relation_type", "node.id"], get_continuation),
+    Columns.CONTINUATION_TO:    SelectorMapper(get_continuation()),
 }
 
 # fmt: on
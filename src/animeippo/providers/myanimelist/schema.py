@@ -24,3 +24,29 @@ MAL_WATCHLIST_SCHEMA = {
     Columns.SEASON_YEAR: pl.UInt16,
     Columns.SEASON: Season,
 }
+
+# Nested shape of the MAL list response, used to build frames straight from JSON
+
+MalIdName = pl.List(pl.Struct({"id": pl.Int64, "name": pl.Utf8}))
+
+MAL_WATCHLIST_RAW_SCHEMA = {
+    "node": pl.Struct(
+        {
+            "id": pl.Int64,
+            "title": pl.Utf8,
+            "main_picture": pl.Struct({"medium": pl.Utf8, "large": pl.Utf8}),
+            "media_type": pl.Utf8,
+            "mean": pl.Float64,
+            "num_list_users": pl.Int64,
+            "average_episode_duration": pl.Int64,
+            "num_episodes": pl.Int64,
+            "rating": pl.Utf8,
+            "source": pl.Utf8,
+            "start_season": pl.Struct({"year": pl.Int64, "season": pl.Utf8}),
+            "genres": MalIdName,
+            "studios": MalIdName,
+            "status": pl.Utf8,
+        }
+    ),
+    "list_status": pl.Struct({"status": pl.Utf8, "score": pl.Int64, "finish_date": pl.Utf8}),
+}
@@ -1,4 +1,6 @@
+import numpy as np
 import polars as pl
+import pyarrow as pa
 
 
 def filter_continuation(seasonal, watchlist_ids):
@@ -19,6 +21,45 @@ def filter_continuation(seasonal, watchlist_ids):
     return seasonal.filter(mask)
 
 
+def normalize_json(records, schema):
+    """Build a flat frame straight from JSON records using a declared nested schema.
+
+    Records are converted to Arrow in one pass instead of going through pandas
+    object columns. Nested objects are flattened to "parent.child" columns like
+    json_normalize does, lists of objects stay as typed list columns.
+    """
+    arrow_type = pa.struct(pl.DataFrame(schema=schema).to_arrow().schema)
+
+    return flatten_structs(pl.from_arrow(pa.array(records, type=arrow_type)).struct.unnest())
+
+
+def flatten_structs(df, separator="."):
+    structs = [name for name, dtype in df.schema.items() if isinstance(dtype, pl.Struct)]
+
+    if not structs:
+        return df
+
+    return flatten_structs(
+        df.with_columns(
+            pl.col(name).name.prefix_fields(name + separator) for name in structs
+        ).unnest(structs),
+        separator,
+    )
+
+
+def frame_from_rows(rows, schema):
+    """Build a frame from row dicts, e.g. formatted rows that were stored as JSON.
+
+    Enums are read as strings and cast afterwards, Arrow can't build dictionary
+    arrays straight from Python values.
+    """
+    plain_schema = {
+        name: pl.Utf8 if isinstance(dtype, pl.Enum) else dtype for name, dtype in schema.items()
+    }
+
+    return normalize_json(rows, plain_schema).cast(schema)
+
+
 def transform_to_animeippo_format(original, schema, mapping):
     if len(original) == 0:
         return pl.DataFrame(schema=schema)
@@ -26,84 +67,133 @@ def transform_to_animeippo_format(original, schema, mapping):
     df = run_mappers(original, mapping, schema)
 
     if "feature_info" in df.columns:
-        df = df.with_columns(
-            features=df["feature_info"]
-            .list.eval(pl.element().struct.field("name"))
-            .cast(pl.List(pl.Categorical)),
-            tags=df["feature_info"]
-            .list.eval(
-                pl.when(pl.element().struct.field("category") != "Genre").then(
-                    pl.element().struct.field("name")
-                )
+        df = add_feature_columns(df)
+
+    return df
+
+
+def add_feature_columns(df):
+    df = df.with_columns(
+        features=df["feature_info"]
+        .list.eval(pl.element().struct.field("name"))
+        .cast(pl.List(pl.Categorical)),
+        tags=df["feature_info"]
+        .list.eval(
+            pl.when(pl.element().struct.field("category") != "Genre").then(
+                pl.element().struct.field("name")
             )
-            .list.drop_nulls(),
         )
-        df = df.with_columns(clustering_ranks=get_clustering_ranks(df).to_series())
+        .list.drop_nulls(),
+    )
 
-    return df
+    return df.with_columns(clustering_ranks=get_clustering_ranks(df))
 
 
-# This here forgets the original schema and dtypes, so optimize this
 def run_mappers(original, mapping, schema):
-    return (
-        pl.LazyFrame()
-        .with_columns(
+    return get_mapping_plan(mapping, schema).run(original)
+
+
+class MappingPlan:
+    """Mapping compiled against a target schema.
+
+    Mappers that can be expressed as Polars expressions are evaluated together
+    in a single lazy query, so shared input columns are only scanned once.
+    The rest (QueryMapper etc.) need the eager frame and run one by one.
+    """
+
+    def __init__(self, mapping, schema):
+        self.mapping = mapping
+        self.schema = schema
+        self.keys = [key for key in mapping if key in schema]
+        self.expression_mappers = {
+            key: mapping[key] for key in self.keys if hasattr(mapping[key], "expression")
+        }
+        self.query_mappers = {
+            key: mapping[key] for key in self.keys if key not in self.expression_mappers
+        }
+
+    def run(self, original):
+        if self.expression_mappers:
+            columns = original.collect_schema().names()
+            # with_columns broadcasts literal defaults to the frame height
+            df = (
+                original.lazy()
+                .with_columns(
+                    mapper.expression(columns).cast(self.schema[key]).alias(key)
+                    for key, mapper in self.expression_mappers.items()
+                )
+                .select(self.expression_mappers.keys())
+                .collect()
+            )
+        else:
+            df = pl.DataFrame()
+
+        return df.with_columns(
             **{
-                key: (mapper.map(original).cast(schema.get(key)))
-                for key, mapper in mapping.items()
-                if key in schema
+                key: mapper.map(original).cast(self.schema[key])
+                for key, mapper in self.query_mappers.items()
             }
-        )
-        .collect()
-    )
+        ).select(self.keys)
 
 
-# UnionFind is used instead of Polars joins for connected components because
-# Polars has no graph primitives — a join-based label propagation approach
-# was benchmarked at 2.2x slower due to repeated DataFrame creation overhead.
-class UnionFind:
-    def __init__(self):
-        self.parent = {}
+_MAPPING_PLANS = {}
 
-    def find(self, x):
-        while self.parent.get(x, x) != x:
-            self.parent[x] = self.parent.get(self.parent[x], self.parent[x])
-            x = self.parent[x]
-        return x
 
-    def union(self, a, b):
-        ra, rb = self.find(a), self.find(b)
-        if ra != rb:
-            self.parent[ra] = rb
+def get_mapping_plan(mapping, schema):
+    """Plans are memoised per mapping and schema object. Both are module-level
+    constants in practice, and the plan holds references to them so the ids
+    stay valid for the lifetime of the cache entry."""
+    key = (id(mapping), id(schema))
+
+    if key not in _MAPPING_PLANS:
+        _MAPPING_PLANS[key] = MappingPlan(mapping, schema)
+
+    return _MAPPING_PLANS[key]
 
 
 def build_franchise_ids(ids, relation_lists):
-    """Build franchise IDs from relation edges using union-find.
+    """Build franchise IDs from relation edges as connected components.
 
     Returns a List[Utf8] Series: ["franchise_<root_id>"] for anime in
-    multi-member franchises, [] for singletons.
+    multi-member franchises, [] for singletons. The root is the smallest
+    member id of the franchise.
     """
-    uf = UnionFind()
-    id_list = ids.to_list()
-    rel_list = relation_lists.to_list()
-
-    for anime_id, relations in zip(id_list, rel_list, strict=True):
-        if relations:
-            for related_id in relations:
-                uf.union(anime_id, related_id)
-
-    root_counts = {}
-    for anime_id in id_list:
-        root = uf.find(anime_id)
-        root_counts[root] = root_counts.get(root, 0) + 1
-
-    return pl.Series(
-        "franchise",
-        [
-            [f"franchise_{uf.find(aid)}"] if root_counts.get(uf.find(aid), 0) > 1 else []
-            for aid in id_list
-        ],
+    # scipy is slow to import, so it's imported on first use
+    from scipy.sparse import coo_matrix  # noqa: PLC0415
+    from scipy.sparse.csgraph import connected_components  # noqa: PLC0415
+
+    ids = ids.cast(pl.Int64).to_numpy()
+    edges = (
+        pl.DataFrame({"id": ids, "related_id": relation_lists.cast(pl.List(pl.Int64))})
+        .explode("related_id")
+        .drop_nulls()
+    )
+
+    # Related ids outside the list are graph nodes too, so they can link members
+    nodes = np.union1d(ids, edges["related_id"].to_numpy())
+    graph = coo_matrix(
+        (
+            np.ones(len(edges), dtype=np.int8),
+            (
+                np.searchsorted(nodes, edges["id"].to_numpy()),
+                np.searchsorted(nodes, edges["related_id"].to_numpy()),
+            ),
+        ),
+        shape=(len(nodes), len(nodes)),
     )
+    component_count, components = connected_components(graph, directed=False)
+
+    labels = components[np.searchsorted(nodes, ids)]
+    sizes = np.bincount(labels, minlength=component_count)
+    roots = np.full(component_count, np.iinfo(np.int64).max)
+    np.minimum.at(roots, labels, ids)
+
+    return pl.DataFrame({"root": roots[labels], "size": sizes[labels]}).select(
+        pl.when(pl.col("size") > 1)
+        .then(pl.concat_list(pl.format("franchise_{}", "root")))
+        .otherwise(pl.lit([], dtype=pl.List(pl.Utf8)))
+        .alias("franchise")
+    )["franchise"]
 
 
 GENRE_MAX_WEIGHT = 200
@@ -119,51 +209,57 @@ TAG_WEIGHTS = {
 }
 
 
+RANK_TYPE = pl.List(pl.Struct({"name": pl.Utf8, "weight": pl.Float64}))
+
+
 def get_clustering_ranks(df):
-    """Build weighted feature vector for clustering from feature_info."""
+    """Build sparse weighted feature vectors for clustering from feature_info.
+
+    Each row gets a list of (name, weight) pairs for its own features only,
+    rather than a wide struct with a field for every feature in the frame.
+    """
     exploded = (
-        df.select("id", "feature_info")
+        df.select(pl.int_range(pl.len(), dtype=pl.UInt32).alias("row"), "feature_info")
         .explode("feature_info")
         .filter(pl.col("feature_info").is_not_null())
         .unnest("feature_info")
     )
 
     is_genre = pl.col("category") == "Genre"
-    result = df.select("id")
 
     # Tags: weight by category
-    tag_ranks = (
-        exploded.filter(~is_genre)
-        .with_columns(
-            weighted_rank=pl.col("rank")
-            * pl.col("category")
-            .replace_strict(TAG_WEIGHTS, default=None)
-            .fill_null(
-                pl.col("category")
-                .str.split("-")
-                .list.first()
-                .replace_strict(TAG_WEIGHTS, default=1.0)
-            )
-        )
-        .pivot(index="id", values="weighted_rank", on="name", aggregate_function="first")
+    tag_ranks = exploded.filter(~is_genre).select(
+        "row",
+        "name",
+        weight=pl.col("rank")
+        * pl.col("category")
+        .replace_strict(TAG_WEIGHTS, default=None)
+        .fill_null(
+            pl.col("category").str.split("-").list.first().replace_strict(TAG_WEIGHTS, default=1.0)
+        ),
     )
-    result = result.join(tag_ranks, on="id", how="left")
 
-    # Genres: weight by inverse document frequency (IDF needs at least one genre)
+    # Genres: weight by inverse document frequency
     genre_data = exploded.filter(is_genre)
-    if len(genre_data) > 0:
-        genre_counts = genre_data.group_by("name").len()
-        idf_raw = (pl.lit(len(df)) / pl.col("len")).log()
-        max_idf = pl.max_horizontal(idf_raw.max(), pl.lit(1.0))
+    idf_raw = (pl.lit(len(df)) / pl.len().over("name")).log()
+    max_idf = pl.max_horizontal(idf_raw.max(), pl.lit(1.0))
 
-        genre_idf = genre_counts.with_columns(
-            idf_weight=(idf_raw / max_idf * GENRE_MAX_WEIGHT).cast(pl.UInt8)
-        )
-        genre_ranks = (
-            genre_data.select("id", "name")
-            .join(genre_idf, on="name")
-            .pivot(index="id", values="idf_weight", on="name", aggregate_function="first")
-        )
-        result = result.join(genre_ranks, on="id", how="left")
+    genre_ranks = genre_data.select(
+        "row",
+        "name",
+        weight=(idf_raw / max_idf * GENRE_MAX_WEIGHT).cast(pl.UInt8),
+    )
+
+    ranks = (
+        pl.concat([tag_ranks, genre_ranks], how="vertical_relaxed")
+        .unique(["row", "name"], keep="first", maintain_order=True)
+        .group_by("row")
+        .agg(pl.struct("name", pl.col("weight").cast(pl.Float64)).alias("clustering_ranks"))
+    )
 
-    return result.fill_null(0).select(pl.struct(pl.exclude("id")))
+    return (
+        df.select(pl.int_range(pl.len(), dtype=pl.UInt32).alias("row"))
+        .join(ranks, on="row", how="left", maintain_order="left")
+        .select(pl.col("clustering_ranks").fill_null([]).cast(RANK_TYPE))
+        .to_series()
+    )
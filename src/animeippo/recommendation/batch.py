@@ -0,0 +1,196 @@
+"""Recommendations for many users against one season.
+
+The season is fetched and formatted once and shared by every user. Results are
+written in parts of a few users each, one row per user, so a batch that stops
+part way resumes from the users that weren't written yet.
+
+Workers share the AniList rate limit with each other and with users of the app.
+Each one starts users within its share of the limit, see RateBudget.
+"""
+
+import os
+import time
+from enum import StrEnum
+from http import HTTPStatus
+from pathlib import Path
+
+import aiohttp
+import polars as pl
+import structlog
+
+from ..providers.anilist.connection import RATE_LIMIT_WINDOW
+
+logger = structlog.get_logger()
+
+DEFAULT_TOP = 50
+DEFAULT_WORKERS = 2
+# Share of the AniList rate limit a batch leaves to users of the app
+RATE_LIMIT_RESERVE = 0.5
+FILE_FORMATS = ("parquet", "ndjson")
+SHOW_SCHEMA = {
+    "id": pl.Int64,
+    "title": pl.Utf8,
+    "cover_image": pl.Utf8,
+    "format": pl.Utf8,
+    "season_year": pl.Int64,
+    "discovery_score": pl.Float64,
+}
+RESULT_SCHEMA = {
+    "user": pl.Utf8,
+    "status": pl.Utf8,
+    "shows": pl.List(pl.Struct(SHOW_SCHEMA)),
+    "categories": pl.List(pl.Struct({"name": pl.Utf8, "items": pl.List(pl.Int64)})),
+}
+
+
+class ResultStatus(StrEnum):
+    OK = "ok"
+    NOT_FOUND = "not_found"
+    ERROR = "error"
+
+
+def top_shows(recommendations, top=DEFAULT_TOP):
+    """The best shows with the fields of SHOW_SCHEMA, missing fields as nulls."""
+    return (
+        recommendations.head(top)
+        .select(
+            (pl.col(name) if name in recommendations.columns else pl.lit(None))
+            .cast(dtype)
+            .alias(name)
+            for name, dtype in SHOW_SCHEMA.items()
+        )
+        .to_dicts()
+    )
+
+
+def result(user, status, shows=None, categories=None):
+    return {"user": user, "status": status, "shows": shows, "categories": categories}
+
+
+async def recommend_user(recommender, season_data, user, top=DEFAULT_TOP):
+    """A result row for a user. Failures are recorded in the row, so that one user
+    doesn't stop the batch."""
+    try:
+        dataset = await recommender.recommend_from_season(season_data, user)
+        categories = recommender.get_categories(dataset)
+    except aiohttp.ClientResponseError as error:
+        if error.status == HTTPStatus.NOT_FOUND:
+            return result(user, ResultStatus.NOT_FOUND)
+
+        logger.exception("batch_user_failed", user=user)
+        return result(user, ResultStatus.ERROR)
+    except RuntimeError:
+        # Raised for users without usable list data
+        return result(user, ResultStatus.NOT_FOUND)
+    except Exception:
+        logger.exception("batch_user_failed", user=user)
+        return result(user, ResultStatus.ERROR)
+
+    return result(user, ResultStatus.OK, top_shows(dataset.recommendations, top), categories)
+
+
+class RateBudget:
+    """A worker's share of the rate limit of a connection.
+
+    A user is started once the worker has made fewer requests than its share of
+    the limit in the current window and the reserve is left to users, otherwise
+    after waiting for the next window.
+    """
+
+    def __init__(self, connection, share):
+        self.connection = connection
+        self.share = share
+        self.start_window()
+
+    def start_window(self):
+        self.window_start = time.monotonic()
+        self.window_requests = self.connection.requests
+
+    def spent(self):
+        return (self.connection.requests - self.window_requests) / self.connection.rate_limit
+
+    async def wait(self):
+        if time.monotonic() - self.window_start >= RATE_LIMIT_WINDOW:
+            self.start_window()
+
+        if self.spent() >= self.share or not self.connection.has_capacity(RATE_LIMIT_RESERVE):
+            await self.connection.wait_for_window()
+            self.start_window()
+
+
+def rate_budget(recommender, workers):
+    """A worker's budget among workers, None if the provider has no rate limit."""
+    connection = getattr(recommender.provider, "connection", None)
+
+    if connection is None:
+        return None
+
+    return RateBudget(connection, (1 - RATE_LIMIT_RESERVE) / max(workers, 1))
+
+
+async def recommend_users(recommender, season_data, users, top=DEFAULT_TOP, budget=None):
+    rows = []
+
+    for user in users:
+        if budget is not None:
+            await budget.wait()
+
+        rows.append(await recommend_user(recommender, season_data, user, top))
+
+    return rows
+
+
+class BatchOutput:
+    """Result parts in a directory.
+
+    A part is written to a temporary file and moved in place, so every user in
+    a part has finished even if the batch was killed while writing it.
+    """
+
+    def __init__(self, directory, file_format="parquet"):
+        if file_format not in FILE_FORMATS:
+            raise ValueError(f"Unknown file format {file_format}, expected one of {FILE_FORMATS}")
+
+        self.directory = Path(directory)
+        self.file_format = file_format
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def parts(self):
+        return sorted(self.directory.glob(f"part-*.{self.file_format}"))
+
+    def read(self):
+        parts = self.parts()
+
+        if not parts:
+            return pl.DataFrame(schema=RESULT_SCHEMA)
+
+        if self.file_format == "parquet":
+            return pl.concat(pl.read_parquet(part) for part in parts)
+
+        return pl.concat(pl.read_ndjson(part, schema=RESULT_SCHEMA) for part in parts)
+
+    def finished_users(self, retry_failed=False):
+        """Users that have a result, apart from failed ones when they are retried."""
+        results = self.read().select("user", "status")
+
+        if retry_failed:
+            results = results.filter(pl.col("status") != ResultStatus.ERROR)
+
+        return set(results["user"].to_list())
+
+    def write(self, rows):
+        parts = self.parts()
+        index = int(parts[-1].stem.removeprefix("part-")) + 1 if parts else 0
+        path = self.directory / f"part-{index:05d}.{self.file_format}"
+        temporary = path.with_name(path.name + ".tmp")
+
+        frame = pl.DataFrame(rows, schema=RESULT_SCHEMA)
+
+        if self.file_format == "parquet":
+            frame.write_parquet(temporary)
+        else:
+            frame.write_ndjson(temporary)
+
+        os.replace(temporary, path)
+
+        return path
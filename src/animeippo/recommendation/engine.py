@@ -3,6 +3,7 @@ import copy
 import polars as pl
 import structlog
 
+from .. import memory
 from .funnel import add_funnel_metadata
 from .scoring import ScorerResult
 
@@ -36,17 +37,20 @@ class AnimeRecommendationEngine:
 
         dataset.fit(encoder, clustering_model)
 
-        recommendations = self.score_anime(dataset)
+        with memory.stage("score"):
+            recommendations = self.score_anime(dataset)
 
-        predictions = clustering_model.predict(
-            dataset.seasonal["encoded"], dataset.get_similarity_matrix(filtered=False)
-        )
+        with memory.stage("predict"):
+            predictions = clustering_model.predict(
+                dataset.seasonal["encoded"], dataset.get_similarity_matrix(filtered=False)
+            )
         recommendations = recommendations.with_columns(
             cluster=predictions["cluster"].cast(pl.UInt32),
             cluster_similarity=predictions["similarity"],
         )
 
-        recommendations = add_funnel_metadata(recommendations)
+        with memory.stage("funnel"):
+            recommendations = add_funnel_metadata(recommendations)
 
         return recommendations.sort("discovery_score", descending=True)
 
@@ -109,7 +113,8 @@ class AnimeRecommendationEngine:
 
     def run_scorer(self, scorer, dataset, n=0):
         try:
-            return scorer.score(dataset)
+            with memory.stage(f"scorer_{scorer.name}"):
+                return scorer.score(dataset)
         except Exception:
             logger.exception("scorer_error", scorer=scorer.name)
             return ScorerResult(
@@ -122,7 +127,16 @@ class AnimeRecommendationEngine:
     def categorize_anime(self, data):
         if self.ranking_orchestrator is None:
             raise RuntimeError("No ranking orchestrator configured for engine.")
-        return self.ranking_orchestrator.render(data)
+
+        with memory.stage("render"):
+            return self.ranking_orchestrator.render(data)
+
+    def iter_categorize_anime(self, data):
+        """Categories one at a time as they are rendered."""
+        if self.ranking_orchestrator is None:
+            raise RuntimeError("No ranking orchestrator configured for engine.")
+
+        return self.ranking_orchestrator.iter_render(data)
 
     def add_scorer(self, scorer):
         self.discovery_scorers.append(scorer)
@@ -75,14 +75,21 @@ def _bucket_intensity(df):
     )
 
 
-def add_funnel_metadata(recommendations):
-    """Add mood and intensity columns to recommendations DataFrame."""
-    all_ids = recommendations.select("id")
-    exploded = _explode_features(recommendations)
+def add_show_metadata(shows):
+    """Add moods and raw intensity score columns, which only depend on each show."""
+    all_ids = shows.select("id")
+    exploded = _explode_features(shows)
 
     moods_df = _compute_moods(exploded, all_ids)
     intensity_df = _compute_intensity(exploded, all_ids)
 
-    result = recommendations.join(moods_df, on="id").join(intensity_df, on="id")
+    return shows.join(moods_df, on="id").join(intensity_df, on="id")
+
+
+def add_funnel_metadata(recommendations):
+    """Add mood and intensity columns to recommendations DataFrame.
+    Moods and intensity scores added to the season beforehand are reused."""
+    if "intensity_score" not in recommendations.columns:
+        recommendations = add_show_metadata(recommendations)
 
-    return _bucket_intensity(result)
+    return _bucket_intensity(recommendations)
@@ -1,5 +1,6 @@
 import polars as pl
 
+from .. import memory
 from ..analysis import similarity
 from ..providers.util import filter_continuation
 from ..recommendation import cluster_naming
@@ -88,24 +89,28 @@ class RecommendationModel:
         )
 
     def fit(self, encoder, clustering_model):
-        self.validate()
+        with memory.stage("prepare"):
+            self.validate()
 
-        self.fill_user_status_data_from_watchlist()
-        self.filter_continuation()
-        self.build_relation_context()
+            self.fill_user_status_data_from_watchlist()
+            self.filter_continuation()
+            self.build_relation_context()
 
-        self.encode(encoder)
+        with memory.stage("encode"):
+            self.encode(encoder)
 
-        self.watchlist = self.watchlist.with_columns(
-            cluster=clustering_model.cluster_by_features(self.watchlist)
-        )
+        with memory.stage("cluster"):
+            self.watchlist = self.watchlist.with_columns(
+                cluster=clustering_model.cluster_by_features(self.watchlist)
+            )
 
-        self.similarity_matrix = similarity.categorical_similarity(
-            self.watchlist["encoded"],
-            self.seasonal["encoded"],
-            clustering_model.distance_metric,
-            self.seasonal["id"].cast(pl.Utf8),
-        ).with_columns(id=self.watchlist["id"])
+        with memory.stage("similarity"):
+            self.similarity_matrix = similarity.categorical_similarity(
+                self.watchlist["encoded"],
+                self.seasonal["encoded"],
+                clustering_model.distance_metric,
+                self.seasonal["id"].cast(pl.Utf8),
+            ).with_columns(id=self.watchlist["id"])
         # Categories could use unfiltered watchlist, but scoring needs to filter it
 
         # Rechunk to maximize performance, not sure if it has any real effect
@@ -35,7 +35,14 @@ class RankingOrchestrator:
         Returns:
             List of {"name": str, "items": [ids]} dicts
         """
-        rendered_categories = []
+        return list(self.iter_render(data))
+
+    def iter_render(self, data):
+        """Render categories one at a time, so each can be sent as soon as it's ready.
+
+        Yields:
+            {"name": str, "items": [ids]} dicts
+        """
         recommendations_df = data.recommendations
 
         layout = self.select_layout(len(recommendations_df))
@@ -77,9 +84,7 @@ class RankingOrchestrator:
                     discourage_max=self.DISCOURAGE_MAX,
                 )
 
-            rendered_categories.append({"name": category.description, "items": item_ids})
-
-        return rendered_categories
+            yield {"name": category.description, "items": item_ids}
 
 
 def _adjust_by_diversity(
@@ -2,6 +2,9 @@ import asyncio
 
 import polars as pl
 
+from .. import memory
+from . import season_artifacts
+
 
 class AnimeRecommender:
     """Recommends new anime to a user if provided,
@@ -41,26 +44,53 @@ class AnimeRecommender:
 
         pl.enable_string_cache()
 
+        with memory.stage("fetch"):
+            if user:
+                season_data, user_data, manga_data = await asyncio.gather(
+                    self.get_prepared_season(year, season),
+                    self.provider.get_user_anime_list(user),
+                    self.provider.get_user_manga_list(user),
+                )
+            else:
+                season_data = await self.provider.get_seasonal_anime_list(year, season)
+
         if user:
-            season_data, user_data, manga_data = await asyncio.gather(
-                self.provider.get_seasonal_anime_list(year, season),
-                self.provider.get_user_anime_list(user),
-                self.provider.get_user_manga_list(user),
-            )
+            with memory.stage("user_profile"):
+                user_profile = self.profile_model_cls(user, user_data, manga_data)
 
-            user_profile = self.profile_model_cls(user, user_data, manga_data)
-        else:
-            season_data = await self.provider.get_seasonal_anime_list(year, season)
+        season_data = await self.add_related_anime(season_data)
+
+        data = self.recommendation_model_cls(user_profile, season_data)
+        data.nsfw_tags = self.provider.get_nsfw_tags()
+
+        return data
 
+    async def add_related_anime(self, season_data):
         if season_data is not None and self.fetch_related_anime:
             indices = season_data["id"].to_list()
             related_anime = [await self.provider.get_related_anime(index) for index in indices]
             season_data = season_data.with_columns(continuation_to=pl.Series(related_anime))
 
-        data = self.recommendation_model_cls(user_profile, season_data)
-        data.nsfw_tags = self.provider.get_nsfw_tags()
+        return season_data
 
-        return data
+    async def get_season(self, year, season):
+        """Fetches a season to share between recommend_from_season calls."""
+        pl.enable_string_cache()
+
+        with memory.stage("fetch"):
+            season_data = await self.get_prepared_season(year, season)
+
+        return await self.add_related_anime(season_data)
+
+    async def get_prepared_season(self, year, season):
+        """The season prepared by preload_cache if there is one, otherwise as the
+        provider returns it."""
+        prepared = await season_artifacts.load(self.provider, year, season)
+
+        if prepared is not None:
+            return prepared
+
+        return await self.provider.get_seasonal_anime_list(year, season)
 
     async def recommend_seasonal_anime(self, year, season, user=None):
         dataset = await self.databuilder(year, season, user)
@@ -72,5 +102,26 @@ class AnimeRecommender:
 
         return dataset
 
+    async def recommend_from_season(self, season_data, user):
+        """Recommends to a user from a season fetched beforehand, so recommending
+        to many users fetches and formats the season once."""
+        with memory.stage("fetch"):
+            user_data, manga_data = await asyncio.gather(
+                self.provider.get_user_anime_list(user),
+                self.provider.get_user_manga_list(user),
+            )
+
+        with memory.stage("user_profile"):
+            user_profile = self.profile_model_cls(user, user_data, manga_data)
+
+        dataset = self.recommendation_model_cls(user_profile, season_data)
+        dataset.nsfw_tags = self.provider.get_nsfw_tags()
+        dataset.recommendations = self.engine.fit_predict(dataset)
+
+        return dataset
+
     def get_categories(self, recommendations):
         return self.engine.categorize_anime(recommendations)
+
+    def iter_categories(self, recommendations):
+        return self.engine.iter_categorize_anime(recommendations)
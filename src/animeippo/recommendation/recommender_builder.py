@@ -121,7 +121,16 @@ def get_default_categorizers(distance_metric="cosine", tag_lookup=None, genres=N
     return {"minimal": minimal, "standard": standard, "full": full}
 
 
-def build_recommender(providername):
+def build_cache():
+    rcache = cache.RedisCache()
+
+    if not rcache.is_available():
+        logger.warning("redis_unavailable")
+
+    return rcache
+
+
+def build_recommender(providername, rcache=None):
     """
     Creates a recommender builder based on a third party data provider name.
 
@@ -130,12 +139,9 @@ def build_recommender(providername):
 
     Current options are "anilist" or "myanimelist".
 
-    Final recommender is created when builder.build() is called.
+    Recommenders can share a cache, otherwise a new one is connected.
     """
-    rcache = cache.RedisCache()
-
-    if not rcache.is_available():
-        logger.warning("redis_unavailable")
+    rcache = rcache if rcache is not None else build_cache()
 
     match providername:
         case "anilist":
@@ -0,0 +1,64 @@
+"""Seasonal data prepared ahead of requests.
+
+Encoding and clustering depend on the features of each user, but part of the
+work on a season does not: expanding the sparse feature ranks to a dense
+struct, and the moods and intensity scores of each show. preload_cache derives
+them nightly and stores the prepared season, which recommendations use in
+place of the provider's seasonal data when it is available.
+"""
+
+import asyncio
+from datetime import timedelta
+
+import polars as pl
+
+from ..analysis import encoding
+from ..cache import keys
+from . import funnel
+
+# Outlasts a nightly preload that fails once
+ARTIFACT_TTL = timedelta(days=2)
+
+
+def artifact_key(provider, year, season):
+    return keys.make_key(
+        keys.namespace_of(provider), keys.Kind.SEASON_ARTIFACTS, f"{year}:{season or ''}"
+    )
+
+
+def prepare(season_data):
+    """The season with the columns that don't depend on the user derived."""
+    ranks = season_data["clustering_ranks"]
+
+    if not isinstance(ranks.dtype, pl.Struct):
+        season_data = season_data.with_columns(encoding.densify(ranks))
+
+    return funnel.add_show_metadata(season_data)
+
+
+def _cache(provider):
+    cache = getattr(provider, "cache", None)
+
+    return cache if cache is not None and cache.is_available() else None
+
+
+async def load(provider, year, season):
+    """The prepared season, or None if it hasn't been stored."""
+    cache = _cache(provider)
+
+    if cache is None:
+        return None
+
+    return await asyncio.to_thread(cache.get_dataframe, artifact_key(provider, year, season))
+
+
+async def store(provider, year, season, season_data):
+    """Prepares and stores a season, returning the prepared season."""
+    prepared = prepare(season_data)
+    cache = _cache(provider)
+
+    if cache is not None:
+        key = artifact_key(provider, year, season)
+        await asyncio.to_thread(cache.set_dataframe, key, prepared, ARTIFACT_TTL)
+
+    return prepared
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""Recommend one season to many users.
+
+The season is fetched once and saved next to the results, then users are sent
+to worker processes in chunks. Each finished chunk is written as a part of the
+results, and running the same command again skips the users already written.
+
+Users are read from a file with one name per line, blank lines and lines
+starting with # are skipped.
+
+Usage:
+    animeippo-batch-recommend USERS --year 2025 [--season winter] --output DIR
+        [--provider anilist] [--format parquet|ndjson] [--workers 2]
+        [--chunk-size 50] [--top 50] [--retry-failed]
+
+Workers 0 runs every chunk in this process. Each worker has its own AniList
+connection and starts users within its share of the rate limit, so more
+workers don't mean more requests.
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import dotenv
+import polars as pl
+import structlog
+
+from animeippo.logging import configure_logging
+from animeippo.recommendation import batch, recommender_builder
+
+DEFAULT_CHUNK_SIZE = 50
+SEASON_FILE = "season.parquet"
+
+logger = structlog.get_logger()
+
+# Per worker process state, set up once by init_worker
+_worker = {}
+
+
+def read_users(path):
+    """User names in file order without duplicates."""
+    users = {}
+
+    for line in Path(path).read_text().splitlines():
+        user = line.strip()
+
+        if user and not user.startswith("#"):
+            users[user] = None
+
+    return list(users)
+
+
+def chunked(users, size):
+    return [users[index : index + size] for index in range(0, len(users), size)]
+
+
+def init_worker(providername, season_path, workers=1):
+    configure_logging()
+    pl.enable_string_cache()
+
+    _worker["recommender"] = recommender_builder.build_recommender(providername)
+    _worker["season"] = pl.read_parquet(season_path)
+    _worker["loop"] = asyncio.new_event_loop()
+    _worker["budget"] = batch.rate_budget(_worker["recommender"], workers)
+
+
+def recommend_chunk(users, top):
+    return _worker["loop"].run_until_complete(
+        batch.recommend_users(
+            _worker["recommender"], _worker["season"], users, top, _worker["budget"]
+        )
+    )
+
+
+def run_in_process(chunks, providername, season_path, top):
+    init_worker(providername, season_path)
+
+    try:
+        for chunk in chunks:
+            yield recommend_chunk(chunk, top)
+    finally:
+        _worker.pop("loop").close()
+
+
+def run_in_pool(chunks, providername, season_path, top, workers):
+    # Workers are spawned rather than forked, Polars' thread pool doesn't survive a fork
+    with ProcessPoolExecutor(
+        workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=init_worker,
+        initargs=(providername, season_path, workers),
+    ) as pool:
+        futures = [pool.submit(recommend_chunk, chunk, top) for chunk in chunks]
+
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Recommend one season to many users")
+    parser.add_argument("users", help="File with one user name per line")
+    parser.add_argument("--year", required=True)
+    parser.add_argument("--season", default=None)
+    parser.add_argument("--output", required=True, help="Directory for the results")
+    parser.add_argument("--provider", choices=("anilist", "mixed"), default="anilist")
+    parser.add_argument("--format", choices=batch.FILE_FORMATS, default="parquet")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=batch.DEFAULT_WORKERS,
+        help="Worker processes, they share the AniList rate limit",
+    )
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--top", type=int, default=batch.DEFAULT_TOP)
+    parser.add_argument(
+        "--retry-failed",
+        action="store_true",
+        help="Run users whose earlier run failed again",
+    )
+
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    output = batch.BatchOutput(args.output, args.format)
+
+    finished = output.finished_users(args.retry_failed)
+    users = [user for user in read_users(args.users) if user not in finished]
+
+    logger.info("batch_start", users=len(users), finished=len(finished))
+
+    if not users:
+        logger.info("batch_complete", parts=len(output.parts()))
+        return 0
+
+    recommender = recommender_builder.build_recommender(args.provider)
+    season_data = asyncio.run(recommender.get_season(args.year, args.season))
+
+    if season_data is None:
+        logger.error("batch_season_not_found", year=args.year, season=args.season)
+        return 1
+
+    season_path = output.directory / SEASON_FILE
+    season_data.write_parquet(season_path)
+
+    chunks = chunked(users, args.chunk_size)
+
+    if args.workers > 0:
+        results = run_in_pool(chunks, args.provider, season_path, args.top, args.workers)
+    else:
+        results = run_in_process(chunks, args.provider, season_path, args.top)
+
+    for rows in results:
+        path = output.write(rows)
+        logger.info("batch_part_written", part=path.name, users=len(rows))
+
+    logger.info("batch_complete", parts=len(output.parts()))
+    return 0
+
+
+def cli():
+    """CLI entry point for the batch recommend script."""
+    dotenv.load_dotenv("conf/prod.env")
+    configure_logging()
+    sys.exit(main())
+
+
+if __name__ == "__main__":
+    cli()
@@ -1,12 +1,90 @@
-"""Clear the Redis cache."""
+#!/usr/bin/env python3
+"""Clear selected entries from the Redis cache.
 
-import redis
+Entries are selected by kind, provider and user, see animeippo.cache.keys.
+--stale only selects entries stored in an outdated schema version of their
+kind, or written by an old formatter, as keys of formatted data carry its
+fingerprint. --legacy selects entries stored before keys were namespaced. Keys
+are scanned and unlinked in batches, so the cache keeps serving while clearing.
+
+Usage:
+    animeippo-clear-cache [--kind seasonal] [--provider anilist] [--user name]
+                          [--stale] [--legacy] [--all] [--dry-run]
+"""
+
+import argparse
+import sys
+
+from animeippo.cache import RedisCache, invalidation, keys
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Clear selected entries from the cache")
+    parser.add_argument(
+        "--kind",
+        action="append",
+        default=[],
+        choices=list(keys.Kind),
+        help="Kind of data to clear, can be given more than once",
+    )
+    parser.add_argument("--provider", help="Only clear data of this provider")
+    parser.add_argument("--user", help="Only clear data of this user")
+    parser.add_argument(
+        "--stale",
+        action="store_true",
+        help="Only clear entries of outdated schema versions or formats",
+    )
+    parser.add_argument(
+        "--legacy", action="store_true", help="Clear entries stored without a namespace"
+    )
+    parser.add_argument("--all", action="store_true", help="Clear every namespaced entry")
+    parser.add_argument(
+        "--dry-run", action="store_true", help="Report what would be cleared without clearing"
+    )
+
+    args = parser.parse_args(argv)
+
+    if not (args.kind or args.provider or args.user or args.stale or args.legacy or args.all):
+        parser.error("select what to clear, or clear every entry with --all")
+
+    return args
+
+
+def select(cache, args):
+    found = set()
+
+    if args.kind or args.provider or args.user or args.stale or args.all:
+        found |= invalidation.matching_keys(
+            cache, args.kind, args.provider, args.user, stale=args.stale
+        )
+
+    if args.legacy:
+        found |= invalidation.legacy_keys(cache)
+
+    return found
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    cache = RedisCache()
+
+    if not cache.is_available():
+        print("Redis is not available")
+        return 1
+
+    removed = invalidation.invalidate(cache, select(cache, args), dry_run=args.dry_run)
+
+    for (provider, kind), count in sorted(removed.items()):
+        print(f"{provider:<12} {kind:<18} {count}")
+
+    verb = "Would remove" if args.dry_run else "Removed"
+    print(f"{verb} {removed.total()} keys")
+
+    return 0
 
 
 def cli():
-    r = redis.Redis(host="redis-stack-server", port=6379)
-    r.flushall()
-    print("Cache cleared")
+    sys.exit(main())
 
 
 if __name__ == "__main__":
@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+"""Local stand-in for the AniList and MyAnimeList APIs.
+
+Replays responses recorded in a fixture directory, so the app can be load and
+latency tested offline and reproducibly. AniList's rate limit window is emulated
+with its headers and 429 responses, and latency can be injected per response.
+In record mode, requests are forwarded to the real APIs and their successful
+responses are saved as fixtures, errors are passed through without saving them.
+MAL token refreshes are refused, so a 401 never reaches the real MAL or
+rewrites the stored tokens.
+
+Point the app at the stand-in with:
+    ANI_API_URL=http://localhost:8700/anilist MAL_API_URL=http://localhost:8700/mal
+    MAL_AUTH_URL=http://localhost:8700/mal-auth
+
+Usage:
+    animeippo-mock-upstream --fixtures DIR [--record] [--port 8700]
+        [--latency MS] [--jitter MS] [--rate-limit PER_MINUTE]
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import time
+from collections import deque
+from http import HTTPStatus
+from pathlib import Path
+from urllib.parse import urlencode
+
+import aiohttp
+import numpy as np
+import structlog
+from aiohttp import web
+
+from animeippo.logging import configure_logging
+
+ANILIST_URL = "https://graphql.anilist.co"
+MAL_URL = "https://api.myanimelist.net/v2"
+DEFAULT_PORT = 8700
+RATE_LIMIT_WINDOW = 60
+RECORDED_HEADERS = ("X-RateLimit-Limit", "X-RateLimit-Remaining", "Retry-After")
+
+logger = structlog.get_logger()
+
+
+def anilist_key(payload):
+    """GraphQL requests are matched by their query, ignoring whitespace, and variables."""
+    query = "".join(payload.get("query", "").split())
+
+    return "anilist " + query + json.dumps(payload.get("variables") or {}, sort_keys=True)
+
+
+def mal_key(path, params):
+    return f"mal /{path}?{urlencode(sorted(params.items()))}"
+
+
+def is_success(status):
+    return HTTPStatus.OK <= status < HTTPStatus.MULTIPLE_CHOICES
+
+
+async def pass_through(key, response):
+    """Upstream errors are returned as they are, their bodies may not be JSON."""
+    logger.warning("mock_not_recording", status=response.status, key=key[:120])
+
+    return web.Response(
+        body=await response.read(),
+        status=response.status,
+        content_type=response.content_type,
+        headers={
+            name: response.headers[name] for name in RECORDED_HEADERS if name in response.headers
+        },
+    )
+
+
+def rewrite_paging(body, base_url, upstream_url):
+    """MAL pages link to the next page by URL, which has to lead back here."""
+    next_url = (body.get("paging") or {}).get("next") if isinstance(body, dict) else None
+
+    if next_url and next_url.startswith(upstream_url):
+        body = {
+            **body,
+            "paging": {**body["paging"], "next": base_url + next_url[len(upstream_url) :]},
+        }
+
+    return body
+
+
+class Fixtures:
+    """Recorded responses, one JSON file per request under a directory per service."""
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self.responses = {}
+
+        for path in sorted(self.directory.glob("*/*.json")):
+            fixture = json.loads(path.read_text())
+            self.responses[fixture["key"]] = fixture
+
+    def get(self, key):
+        return self.responses.get(key)
+
+    def save(self, service, key, status, headers, body):
+        fixture = {
+            "key": key,
+            "status": status,
+            "headers": {name: headers[name] for name in RECORDED_HEADERS if name in headers},
+            "body": body,
+        }
+
+        path = self.directory / service / f"{hashlib.sha256(key.encode()).hexdigest()[:16]}.json"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(fixture, indent=2))
+        self.responses[key] = fixture
+
+        return fixture
+
+
+class RateLimiter:
+    """Sliding one minute window like AniList's, a limit of 0 disables it."""
+
+    def __init__(self, limit, window=RATE_LIMIT_WINDOW):
+        self.limit = limit
+        self.window = window
+        self.requests = deque()
+
+    def acquire(self):
+        """Returns the rate limit headers and whether the request is allowed."""
+        if not self.limit:
+            return {}, True
+
+        now = time.monotonic()
+        while self.requests and now - self.requests[0] >= self.window:
+            self.requests.popleft()
+
+        if len(self.requests) >= self.limit:
+            retry_after = math.ceil(self.window - (now - self.requests[0]))
+            headers = {
+                "X-RateLimit-Limit": str(self.limit),
+                "X-RateLimit-Remaining": "0",
+                "Retry-After": str(retry_after),
+            }
+            return headers, False
+
+        self.requests.append(now)
+        headers = {
+            "X-RateLimit-Limit": str(self.limit),
+            "X-RateLimit-Remaining": str(self.limit - len(self.requests)),
+        }
+
+        return headers, True
+
+
+class MockUpstream:
+    def __init__(  # noqa: PLR0913
+        self,
+        fixtures,
+        *,
+        record=False,
+        latency=0,
+        jitter=0,
+        rate_limit=90,
+        upstreams=None,
+    ):
+        self.fixtures = fixtures
+        self.record = record
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limiter = RateLimiter(rate_limit)
+        self.upstreams = {"anilist": ANILIST_URL, "mal": MAL_URL, **(upstreams or {})}
+        self.rng = np.random.default_rng()
+
+    def app(self):
+        app = web.Application()
+        app.add_routes(
+            [
+                web.post("/anilist", self.anilist),
+                web.get("/mal/{path:.*}", self.mal),
+                web.post("/mal-auth", self.mal_auth),
+            ]
+        )
+
+        return app
+
+    async def anilist(self, request):
+        payload = await request.json()
+        key = anilist_key(payload)
+
+        if self.record:
+            async with aiohttp.ClientSession() as session:
+                async with session.post(self.upstreams["anilist"], json=payload) as response:
+                    if not is_success(response.status):
+                        return await pass_through(key, response)
+
+                    fixture = self.fixtures.save(
+                        "anilist", key, response.status, response.headers, await response.json()
+                    )
+
+            return web.json_response(
+                fixture["body"], status=fixture["status"], headers=fixture["headers"]
+            )
+
+        headers, allowed = self.rate_limiter.acquire()
+
+        if not allowed:
+            logger.info("mock_rate_limited", retry_after=headers["Retry-After"])
+            return web.json_response(
+                {"errors": [{"message": "Too Many Requests.", "status": 429}]},
+                status=429,
+                headers=headers,
+            )
+
+        return await self.replay(key, headers)
+
+    async def mal(self, request):
+        path = request.match_info["path"]
+        key = mal_key(path, request.query)
+        base_url = str(request.url.origin()) + "/mal"
+
+        if self.record:
+            async with aiohttp.ClientSession() as session:
+                async with session.get(
+                    f"{self.upstreams['mal']}/{path}",
+                    params=request.query,
+                    headers={"Authorization": request.headers.get("Authorization", "")},
+                ) as response:
+                    if not is_success(response.status):
+                        return await pass_through(key, response)
+
+                    fixture = self.fixtures.save(
+                        "mal", key, response.status, response.headers, await response.json()
+                    )
+
+            body = rewrite_paging(fixture["body"], base_url, self.upstreams["mal"])
+            return web.json_response(body, status=fixture["status"])
+
+        return await self.replay(key, {}, base_url)
+
+    async def mal_auth(self, request):
+        logger.warning("mock_token_refresh_refused")
+
+        return web.json_response(
+            {"error": "invalid_grant", "message": "Tokens are not refreshed against the mock."},
+            status=HTTPStatus.UNAUTHORIZED,
+        )
+
+    async def replay(self, key, headers, base_url=None):
+        fixture = self.fixtures.get(key)
+
+        if fixture is None:
+            logger.warning("mock_not_recorded", key=key[:120])
+            return web.json_response(
+                {"errors": [{"message": "No recorded response.", "status": 404}]},
+                status=404,
+                headers=headers,
+            )
+
+        if self.latency or self.jitter:
+            delay = max(self.rng.normal(self.latency, self.jitter), 0)
+            await asyncio.sleep(delay / 1000)
+
+        body = fixture["body"]
+        if base_url is not None:
+            body = rewrite_paging(body, base_url, self.upstreams["mal"])
+
+        return web.json_response(
+            body, status=fixture["status"], headers={**fixture["headers"], **headers}
+        )
+
+
+def cli():
+    """CLI entry point for the mock upstream server."""
+    parser = argparse.ArgumentParser(description="Replay or record AniList and MAL responses")
+    parser.add_argument("--fixtures", required=True, help="Directory of recorded responses")
+    parser.add_argument(
+        "--record", action="store_true", help="Forward requests to the real APIs and record them"
+    )
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--latency", type=float, default=0, help="Mean response latency in ms")
+    parser.add_argument("--jitter", type=float, default=0, help="Latency standard deviation in ms")
+    parser.add_argument(
+        "--rate-limit", type=int, default=90, help="AniList requests per minute, 0 disables"
+    )
+    args = parser.parse_args()
+
+    configure_logging()
+
+    fixtures = Fixtures(args.fixtures)
+    logger.info(
+        "mock_upstream_starting",
+        fixtures=len(fixtures.responses),
+        record=args.record,
+        port=args.port,
+    )
+
+    upstream = MockUpstream(
+        fixtures,
+        record=args.record,
+        latency=args.latency,
+        jitter=args.jitter,
+        rate_limit=args.rate_limit,
+    )
+    web.run_app(upstream.app(), port=args.port, print=None)
+
+
+if __name__ == "__main__":
+    cli()
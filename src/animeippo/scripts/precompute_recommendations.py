@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""Precompute recommendations for recently active users.
+
+This script should be run off-peak (via cron), before users return in the
+morning. It goes through recent recommend requests, the most recent first,
+refreshes the users' lists and caches the recommendations, so that their next
+request is answered from the cache. The app can do the same in-process with
+PRECOMPUTE_HOUR.
+
+Usage:
+    animeippo-precompute-recommendations [--max-users 500] [--max-seconds 3600]
+"""
+
+import argparse
+import asyncio
+import sys
+
+import dotenv
+import structlog
+
+from animeippo import precompute
+from animeippo.cache import RedisCache
+from animeippo.logging import configure_logging
+from animeippo.recommendation import recommender_builder
+
+dotenv.load_dotenv("conf/prod.env")
+configure_logging()
+logger = structlog.get_logger()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Precompute recommendations for active users")
+    parser.add_argument("--max-users", type=int, default=precompute.DEFAULT_MAX_USERS)
+    parser.add_argument(
+        "--max-seconds",
+        type=int,
+        default=precompute.DEFAULT_MAX_SECONDS,
+        help="No new user is started after this many seconds",
+    )
+    args = parser.parse_args()
+
+    cache = RedisCache()
+
+    if not cache.is_available():
+        logger.error("redis_unavailable")
+        return 1
+
+    recommenders = {}
+
+    def get_recommender(provider):
+        if provider not in recommenders:
+            recommenders[provider] = recommender_builder.build_recommender(provider, cache)
+
+        return recommenders[provider]
+
+    precomputer = precompute.Precomputer(
+        precompute.ResponseCache(cache),
+        get_recommender,
+        max_users=args.max_users,
+        max_seconds=args.max_seconds,
+    )
+    await precomputer.run()
+
+    return 0
+
+
+def cli():
+    """CLI entry point for the precompute script."""
+    exit_code = asyncio.run(main())
+    sys.exit(exit_code)
+
+
+if __name__ == "__main__":
+    cli()
@@ -1,53 +1,132 @@
 #!/usr/bin/env python3
-"""Pre-load cache with yearly anime and check tag freshness.
+"""Pre-load cache with seasonal anime and check tag freshness.
 
 This script should be run nightly (via cron) to:
-1. Warm the cache with previous, current, and next year anime (full years)
-2. Compare AniList API tags against static data and log new/removed tags
+1. Warm both providers' caches with previous, current, and next year anime,
+   full years and each season, fetched concurrently within the AniList rate limit
+2. Prepare each of them for recommendations, see recommendation.season_artifacts
+3. Compare AniList API tags against static data and log new/removed tags
+
+Items that were done are recorded for the day, so running the script again
+after a partial failure only loads the rest.
 
 Usage:
-    python scripts/preload_cache.py [--skip-static]
+    animeippo-preload-cache [--skip-static] [--concurrency 4] [--fresh]
 """
 
 import argparse
 import asyncio
 import sys
-from datetime import datetime
+import time
+from datetime import date, datetime, timedelta
+from typing import NamedTuple
 
 import aiohttp
 import dotenv
 import structlog
 
-from animeippo.cache import CacheMode, RedisCache
+from animeippo.cache import CacheMode, RedisCache, keys
 from animeippo.logging import configure_logging
 from animeippo.providers.anilist import AniListProvider, data
+from animeippo.providers.mixed.provider import MixedProvider
+from animeippo.recommendation import season_artifacts
 
 dotenv.load_dotenv("conf/prod.env")
 configure_logging()
 logger = structlog.get_logger()
 
+SEASONS = [None, "WINTER", "SPRING", "SUMMER", "FALL"]
+DEFAULT_CONCURRENCY = 4
+# Share of the AniList rate limit left for users while pre-loading
+RATE_LIMIT_RESERVE = 0.25
+PROGRESS_KEY = keys.make_key(keys.APP, keys.Kind.STATE, "preload_progress")
+PROGRESS_TTL = timedelta(days=1)
+
+
+class PreloadItem(NamedTuple):
+    provider: str
+    year: int
+    season: str | None
+
+    def key(self):
+        return f"{self.provider} {self.year} {self.season or 'year'}"
+
 
 async def get_years_to_preload():
     current_year = datetime.now().year
     return [current_year - 1, current_year, current_year + 1]
 
 
-async def preload_year_anime(provider, year):
-    """Pre-load all anime for a full year (no season specified)."""
-    logger.info("preload_year_start", year=year)
-    try:
-        anime_list = await provider.get_seasonal_anime_list(str(year), None)
-    except Exception:
-        logger.exception("preload_year_error", year=year)
-        return 0
+def get_items(providers, years):
+    return [
+        PreloadItem(name, year, season)
+        for name in providers
+        for year in years
+        for season in SEASONS
+    ]
+
+
+class Progress:
+    """Items done today with their timings."""
+
+    def __init__(self, cache, day=None):
+        self.cache = cache
+        self.key = f"{PROGRESS_KEY}:{day or date.today().isoformat()}"
+        self.done = cache.get_json(self.key) or {}
+
+    def is_done(self, item):
+        return item.key() in self.done
+
+    def mark_done(self, item, timings):
+        self.done[item.key()] = timings
+        self.cache.set_json(self.key, self.done, PROGRESS_TTL)
+
+
+async def preload_item(provider, item, limit):
+    """Fetches and prepares one season, returning the seconds each step took."""
+    async with limit:
+        while not provider.connection.has_capacity(RATE_LIMIT_RESERVE):
+            await provider.connection.wait_for_window()
+
+        start = time.perf_counter()
+        season_data = await provider.get_seasonal_anime_list(str(item.year), item.season)
+        fetched = time.perf_counter()
 
-    if anime_list is not None:
-        count = len(anime_list)
-        logger.info("preload_year_done", year=year, count=count)
-        return count
+        if season_data is None:
+            raise RuntimeError(f"No anime for {item.key()}")
 
-    logger.warning("preload_year_empty", year=year)
-    return 0
+        await season_artifacts.store(provider, str(item.year), item.season, season_data)
+
+    timings = {
+        "fetch": round(fetched - start, 3),
+        "prepare": round(time.perf_counter() - fetched, 3),
+        "count": len(season_data),
+    }
+    logger.info("preload_item_done", item=item.key(), **timings)
+
+    return timings
+
+
+async def preload_items(providers, items, progress, concurrency=DEFAULT_CONCURRENCY):
+    """Loads the items not done yet concurrently, returning the keys of failed items."""
+    limit = asyncio.Semaphore(concurrency)
+    pending = [item for item in items if not progress.is_done(item)]
+
+    logger.info("preload_items", total=len(items), pending=len(pending))
+
+    async def run(item):
+        try:
+            timings = await preload_item(providers[item.provider], item, limit)
+        except Exception:
+            logger.exception("preload_item_error", item=item.key())
+            return item.key()
+
+        progress.mark_done(item, timings)
+        return None
+
+    failed = await asyncio.gather(*(run(item) for item in pending))
+
+    return [key for key in failed if key is not None]
 
 
 async def check_tag_freshness(connection):
@@ -96,12 +175,18 @@ async def check_tag_freshness(connection):
 
 async def main():
     """Main pre-loading routine."""
-    parser = argparse.ArgumentParser(description="Pre-load cache with yearly anime data")
+    parser = argparse.ArgumentParser(description="Pre-load cache with seasonal anime data")
     parser.add_argument(
         "--skip-static",
         action="store_true",
         help="Skip fetching genre/tag collections",
     )
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument(
+        "--fresh",
+        action="store_true",
+        help="Load every item again, even ones done earlier today",
+    )
     args = parser.parse_args()
 
     cache = RedisCache(mode=CacheMode.WRITE_ONLY)
@@ -110,25 +195,37 @@ async def main():
         logger.error("redis_unavailable")
         return 1
 
-    provider = AniListProvider(cache=cache)
+    providers = {"anilist": AniListProvider(cache=cache), "mixed": MixedProvider(cache=cache)}
+    # Both providers fetch from AniList, they share its rate limit
+    providers["mixed"].ani_provider.connection = providers["anilist"].connection
+
+    # Progress is read back, unlike the data that is always fetched again
+    progress = Progress(RedisCache())
+    if args.fresh:
+        progress.done = {}
 
     logger.info("preload_start")
     years_to_load = await get_years_to_preload()
     logger.info("preload_years", years=years_to_load)
 
-    total_cached = 0
-    for year in years_to_load:
-        count = await preload_year_anime(provider, year)
-        total_cached += count
+    started = time.perf_counter()
+    items = get_items(providers, years_to_load)
+    failed = await preload_items(providers, items, progress, args.concurrency)
 
-    logger.info("preload_years_done", total=total_cached)
+    logger.info(
+        "preload_items_done",
+        seconds=round(time.perf_counter() - started, 3),
+        done=len(progress.done),
+        failed=failed,
+        timings=progress.done,
+    )
 
     if not args.skip_static:
         logger.info("preload_static_check")
-        await check_tag_freshness(provider.connection)
+        await check_tag_freshness(providers["anilist"].connection)
 
     logger.info("preload_complete")
-    return 0
+    return 1 if failed else 0
 
 
 def cli():
@@ -1,101 +1,158 @@
 import json
 
+import pyarrow as pa
+import pyarrow.parquet as pq
 import structlog
 
 logger = structlog.get_logger()
 
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+ARROW_MEDIA_TYPES = {
+    "arrow": "application/vnd.apache.arrow.stream",
+    "parquet": "application/vnd.apache.parquet",
+}
+RECOMMENDATION_FIELDS = [
+    "id",
+    "title",
+    "cover_image",
+    "genres",
+    "tags",
+    "status",
+    "season_year",
+    "season",
+    "discovery_score",
+    "user_status",
+    "format",
+    "moods",
+    "intensity",
+]
+# Included in debug mode
+SCORER_FIELDS = [
+    "directscore",
+    "featurecorrelationscore",
+    "clusterscore",
+    "collaborativescore",
+    "studiocorrelationscore",
+    "popularityscore",
+    "adaptationscore",
+    "continuationscore",
+]
+PROFILE_FIELDS = [
+    "id",
+    "title",
+    "cover_image",
+    "genres",
+    "user_status",
+    "format",
+    "season",
+    "season_year",
+    "status",
+]
+SEASONAL_FIELDS = [
+    "id",
+    "title",
+    "cover_image",
+    "genres",
+    "status",
+    "season_year",
+    "season",
+    "format",
+]
+
+
+def to_json(value):
+    return json.dumps(value, separators=(",", ":"))
+
+
+def rows_json(dataframe, fields):
+    """The rows as a JSON array, written by Polars straight from Arrow memory.
+
+    Columns are in the order of fields, so the same data always serialises to
+    the same bytes.
+    """
+    return dataframe.select([field for field in fields if field in dataframe.columns]).write_json()
+
+
+def json_object(members):
+    """JSON object from members that are already JSON text."""
+    return "{" + ",".join(f"{to_json(key)}:{value}" for key, value in members.items()) + "}"
+
+
+def recommendation_fields(debug=False):
+    return RECOMMENDATION_FIELDS + SCORER_FIELDS if debug else RECOMMENDATION_FIELDS
+
 
 def recommendations_web_view(dataframe, categories=None, tags_and_genres=None, debug=False):
     tags_and_genres = tags_and_genres or []
 
     if dataframe is None:
-        return json.dumps(
-            {
-                "data": {
-                    "categories": categories,
-                }
-            }
-        )
-
-    # Base fields to always include
-    fields = [
-        "id",
-        "title",
-        "cover_image",
-        "genres",
-        "tags",
-        "status",
-        "season_year",
-        "season",
-        "discovery_score",
-        "user_status",
-        "format",
-        "moods",
-        "intensity",
-    ]
-
-    # In debug mode, include all scorer columns
-    if debug:
-        scorer_fields = [
-            "directscore",
-            "featurecorrelationscore",
-            "clusterscore",
-            "collaborativescore",
-            "studiocorrelationscore",
-            "popularityscore",
-            "adaptationscore",
-            "continuationscore",
-        ]
-        fields.extend(scorer_fields)
-
-    filtered_fields = list(set(dataframe.columns).intersection(fields))
-    df_json = dataframe.select(filtered_fields).to_dicts()
-
-    return json.dumps(
-        {"data": {"shows": df_json, "categories": categories, "tags": sorted(tags_and_genres)}}
+        return to_json({"data": {"categories": categories}})
+
+    data = {
+        "shows": rows_json(dataframe, recommendation_fields(debug)),
+        "categories": to_json(categories),
+        "tags": to_json(sorted(tags_and_genres)),
+    }
+
+    return json_object({"data": json_object(data)})
+
+
+def recommendations_ndjson_view(dataframe, categories, tags_and_genres=None, debug=False):
+    """Newline delimited JSON, the shows and tags first and then each category from
+    the categories iterable as soon as it's rendered."""
+    head = {"tags": to_json(sorted(tags_and_genres or []))}
+
+    if dataframe is not None:
+        head = {"shows": rows_json(dataframe, recommendation_fields(debug)), **head}
+
+    yield json_object(head) + "\n"
+
+    for category in categories:
+        yield to_json({"category": category}) + "\n"
+
+
+def recommendations_arrow_view(
+    dataframe, categories=None, tags_and_genres=None, file_format="arrow", debug=False
+):
+    """The shows as an Arrow IPC stream or a Parquet file, for consumers that load
+    them straight into dataframes. Categories and tags travel as JSON in the
+    schema metadata."""
+    if dataframe is None:
+        table = pa.table({})
+    else:
+        fields = recommendation_fields(debug)
+        table = dataframe.select(
+            [field for field in fields if field in dataframe.columns]
+        ).to_arrow()
+
+    table = table.replace_schema_metadata(
+        {"categories": to_json(categories), "tags": to_json(sorted(tags_and_genres or []))}
     )
+    sink = pa.BufferOutputStream()
 
+    if file_format == "parquet":
+        pq.write_table(table, sink)
+    else:
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
 
-def profile_cluster_web_view(watchlist, categories, seasonal=None):
-    fields = {
-        "id",
-        "title",
-        "cover_image",
-        "genres",
-        "user_status",
-        "format",
-        "season",
-        "season_year",
-        "status",
-    }
-    filtered_fields = list(set(watchlist.columns).intersection(fields))
+    return sink.getvalue().to_pybytes()
 
-    df_json = watchlist.select(filtered_fields).to_dicts()
 
+def profile_cluster_web_view(watchlist, categories, seasonal=None):
     data = {
-        "shows": df_json,
-        "categories": categories,
+        "shows": rows_json(watchlist, PROFILE_FIELDS),
+        "categories": to_json(categories),
     }
 
     if seasonal is not None:
-        seasonal_fields = {
-            "id",
-            "title",
-            "cover_image",
-            "genres",
-            "status",
-            "season_year",
-            "season",
-            "format",
-        }
-        filtered_seasonal = list(set(seasonal.columns).intersection(seasonal_fields))
-        data["seasonal"] = seasonal.select(filtered_seasonal).to_dicts()
+        data["seasonal"] = rows_json(seasonal, SEASONAL_FIELDS)
 
-    return json.dumps({"data": data})
+    return json_object({"data": json_object(data)})
 
 
 def profile_characteristics_web_view(profile):
-    return json.dumps(
+    return to_json(
         {
             "data": {
                 "user": profile.user,
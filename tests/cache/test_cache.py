@@ -1,10 +1,15 @@
+import fnmatch
+import types
 from datetime import timedelta
+from unittest import mock
 
+import aiohttp
 import polars as pl
 import pytest
 import redis
 
 from animeippo import cache
+from animeippo.cache import keys
 from animeippo.providers import caching
 from animeippo.providers.myanimelist.connection import MyAnimeListConnection
 from tests import test_data
@@ -34,31 +39,83 @@ class ResponseStub:
 class RedisJsonStub:
     def __init__(self, *args, **kwargs):
         self.store = None
+        self.documents = {}
 
     def set(self, key, point, value):
         self.store = value
+        self.documents[key] = value
 
     def get(self, key):
         return self.store
 
+    def mget(self, keys, path):
+        return [self.documents.get(key) for key in keys]
+
 
 class RedisStub:
     def __init__(self, *args, **kwargs):
         self.store = RedisJsonStub()
         self.plainstore = {}
+        self.ttls = {}
         self.available = True
 
     def json(self):
         return self.store
 
-    def expire(self, key, ttl):
+    def pipeline(self, transaction=True):
+        return self
+
+    def execute(self):
         pass
 
+    def expire(self, key, ttl):
+        self.ttls[key] = ttl
+
+    def hincrby(self, key, field, amount):
+        counters = self.plainstore.setdefault(key, {})
+        counters[field] = counters.get(field, 0) + amount
+
     def get(self, key):
         return self.plainstore.get(key, None)
 
-    def set(self, key, data):
+    def set(self, key, data, ex=None, nx=False):
+        if nx and key in self.plainstore:
+            return None
+
         self.plainstore[key] = data
+        return True
+
+    def getdel(self, key):
+        return self.plainstore.pop(key, None)
+
+    def zadd(self, key, mapping):
+        self.plainstore.setdefault(key, {}).update(mapping)
+
+    def zremrangebyscore(self, key, low, high):
+        members = self.plainstore.get(key, {})
+        self.plainstore[key] = {
+            member: score for member, score in members.items() if score > float(high)
+        }
+
+    def zrevrangebyscore(self, key, high, low, start, num):
+        members = sorted(self.plainstore.get(key, {}).items(), key=lambda item: -item[1])
+
+        return [member.encode() for member, score in members if score >= low][start:num]
+
+    def scan_iter(self, match, count):
+        for key in [*self.plainstore, *self.store.documents]:
+            if fnmatch.fnmatchcase(key, match):
+                yield key.encode()
+
+    def unlink(self, *keys):
+        removed = [
+            key
+            for key in keys
+            if self.plainstore.pop(key, None) is not None
+            or self.store.documents.pop(key, None) is not None
+        ]
+
+        return len(removed)
 
     def ping(self):
         if self.available:
@@ -81,6 +138,17 @@ def test_items_can_be_added_to_redis_cache(mocker):
     assert r.get_json(key) == item
 
 
+def test_many_items_can_be_added_to_redis_cache(mocker):
+    mocker.patch("redis.Redis", RedisStub)
+
+    r = cache.RedisCache()
+
+    r.set_json_many({"first": {"id": 1}, "second": {}})
+
+    assert r.get_json_many(["first", "missing", "second"]) == [{"id": 1}, None, {}]
+    assert r.get_json_many([]) == []
+
+
 @pytest.mark.asyncio
 async def test_connection_can_fetch_values_from_cache(mocker):
     mocker.patch("redis.Redis", RedisStub)
@@ -88,7 +156,8 @@ async def test_connection_can_fetch_values_from_cache(mocker):
     rcache = cache.RedisCache()
     connection = MyAnimeListConnection(rcache)
 
-    rcache.set_json("fake", test_data.MAL_SEASONAL_LIST)
+    key = keys.make_key("myanimelist", keys.Kind.QUERY, keys.digest("fake{}"))
+    rcache.set_json(key, test_data.MAL_SEASONAL_LIST)
 
     response = ResponseStub({"data": {}})
     mocker.patch("aiohttp.ClientSession.get", return_value=response)
@@ -166,6 +235,41 @@ async def test_cached_dataframe_decorator_stores_and_retrieves(mocker):
     assert second["title"].to_list() == ["A", "B"]
 
 
+@pytest.mark.asyncio
+async def test_user_data_is_requested_again_while_refreshing(mocker):
+    mocker.patch("redis.Redis", RedisStub)
+
+    rcache = cache.RedisCache()
+
+    class FakeProvider:
+        def __init__(self):
+            self.cache = rcache
+            self.calls = []
+
+        @caching.cached_dataframe(ttl=timedelta(days=1), kind=keys.Kind.USER_LIST)
+        async def get_list(self, user):
+            self.calls.append(user)
+            return pl.DataFrame({"id": [len(self.calls)]})
+
+        @caching.cached_dataframe(ttl=timedelta(days=1))
+        async def get_season(self, year):
+            self.calls.append(year)
+            return pl.DataFrame({"id": [len(self.calls)]})
+
+    provider = FakeProvider()
+    await provider.get_list("Tester")
+    await provider.get_season("2025")
+
+    with caching.refreshing_user_data():
+        refreshed = await provider.get_list("Tester")
+        await provider.get_season("2025")
+
+    assert provider.calls == ["Tester", "2025", "Tester"]
+    assert refreshed["id"].to_list() == [3]
+    assert (await provider.get_list("Tester"))["id"].to_list() == [3]
+    assert not caching.refreshing_users.get()
+
+
 def test_write_only_mode_skips_reads(mocker):
     mocker.patch("redis.Redis", RedisStub)
 
@@ -173,6 +277,13 @@ def test_write_only_mode_skips_reads(mocker):
 
     rcache.set_json("test", {"key": "value"})
     assert rcache.get_json("test") is None
+    assert rcache.get_json_many(["test"]) == [None]
+
+    rcache.set_bytes("bytes", b"{}")
+    assert rcache.pop_bytes("bytes") is None
+
+    rcache.add_recent("recent", "member", 100, max_age=50)
+    assert rcache.get_recent("recent", 0, 10) == []
 
     data = pl.DataFrame({"id": [1, 2]})
     rcache.set_dataframe("test_df", data)
@@ -203,3 +314,227 @@ async def test_data_can_be_fetched_even_with_cache_connection_error(mocker):
     result = await connection.request_anime_list("fake_query", {})
 
     assert result["data"][0]["node"]["title"] == "Golden Kamuy 4th Season"
+
+
+def test_bytes_are_read_once(mocker):
+    mocker.patch("redis.Redis", RedisStub)
+
+    rcache = cache.RedisCache()
+    rcache.set_bytes("payload", b"{}")
+
+    assert rcache.pop_bytes("payload") == b"{}"
+    assert rcache.pop_bytes("payload") is None
+
+
+def test_recent_members_are_most_recent_first(mocker):
+    mocker.patch("redis.Redis", RedisStub)
+
+    rcache = cache.RedisCache()
+    rcache.add_recent("recent", "old", 100, max_age=50)
+    rcache.add_recent("recent", "first", 120, max_age=50)
+    rcache.add_recent("recent", "second", 160, max_age=50)
+    rcache.add_recent("recent", "first", 170, max_age=50)
+
+    assert rcache.get_recent("recent", 0, 10) == ["first", "second"]
+    assert rcache.get_recent("recent", 165, 10) == ["first"]
+    assert rcache.get_recent("recent", 0, 1) == ["first"]
+
+
+def test_lock_is_taken_once(mocker):
+    mocker.patch("redis.Redis", RedisStub)
+
+    rcache = cache.RedisCache()
+
+    assert rcache.try_lock("lock", timedelta(days=1))
+    assert not rcache.try_lock("lock", timedelta(days=1))
+
+
+def test_keys_are_scanned_and_unlinked(mocker):
+    mocker.patch("redis.Redis", RedisStub)
+    mocker.patch("animeippo.cache.redis_cache.SCAN_COUNT", 2)
+
+    rcache = cache.RedisCache()
+    rcache.set_bytes("a:1", b"1")
+    rcache.set_bytes("a:2", b"2")
+    rcache.set_json("a:3", {"id": 3})
+    rcache.set_bytes("b:1", b"1")
+
+    found = sorted(rcache.scan_keys("a:*"))
+
+    assert found == ["a:1", "a:2", "a:3"]
+    assert rcache.unlink([*found, "a:4"]) == 3
+    assert list(rcache.scan_keys("*")) == ["b:1"]
+
+
+@pytest.mark.asyncio
+async def test_user_queries_are_keyed_by_user(mocker):
+    mocker.patch("redis.Redis", RedisStub)
+
+    rcache = cache.RedisCache()
+
+    class FakeConnection:
+        cache_namespace = "fake"
+
+        def __init__(self):
+            self.cache = rcache
+
+        @caching.cached_query(ttl=timedelta(days=1))
+        async def request(self, query, parameters):
+            return {"data": [query]}
+
+    get_json_many = mocker.spy(rcache, "get_json_many")
+
+    await FakeConnection().request("query { seasonal }", {})
+    await FakeConnection().request("query { list }", {}, user="Tester")
+    seasonal_key, user_key = [call.args[0][0] for call in get_json_many.call_args_list]
+
+    assert seasonal_key.startswith("animeippo:fake:query:v1:")
+    assert user_key.startswith("animeippo:fake:user_query:v1:Tester:")
+
+
+def test_frames_of_another_version_are_misses(mocker):
+    mocker.patch("redis.Redis", RedisStub)
+
+    rcache = cache.RedisCache()
+    key = keys.make_key("anilist", keys.Kind.SEASONAL, "2025:")
+    data = pl.DataFrame({"id": [1, 2]})
+
+    rcache.set_dataframe(key, data)
+    assert rcache.get_dataframe(key).equals(data)
+
+    mocker.patch.dict(keys.SCHEMA_VERSIONS, {keys.Kind.SEASONAL: 2})
+    assert rcache.get_dataframe(key) is None
+
+    # Frames stored before they had a header
+    rcache.connection.set("legacy", data.write_ipc(None).getvalue())
+    assert rcache.get_dataframe("legacy") is None
+
+
+@pytest.mark.asyncio
+async def test_frames_of_another_format_are_misses(mocker):
+    mocker.patch("redis.Redis", RedisStub)
+
+    rcache = cache.RedisCache()
+
+    class FakeProvider:
+        def __init__(self):
+            self.cache = rcache
+            self.calls = 0
+
+        @caching.cached_dataframe(ttl=timedelta(days=1))
+        async def get_season(self, year):
+            self.calls += 1
+            return pl.DataFrame({"id": [self.calls]})
+
+    provider = FakeProvider()
+
+    with mock.patch.object(keys, "format_fingerprint", return_value="older"):
+        await provider.get_season("2025")
+
+    assert (await provider.get_season("2025"))["id"].to_list() == [2]
+    assert (await provider.get_season("2025"))["id"].to_list() == [2]
+    assert provider.calls == 2
+
+
+class SyncThread:
+    def __init__(self, target, args):
+        self.target = target
+        self.args = args
+
+    def start(self):
+        self.target(*self.args)
+
+
+class FailingConnection:
+    cache_namespace = "fake"
+
+    def __init__(self, rcache, status):
+        self.cache = rcache
+        self.status = status
+        self.calls = 0
+
+    @caching.cached_query(ttl=timedelta(days=1))
+    async def request(self, query, parameters):
+        self.calls += 1
+        raise aiohttp.ClientResponseError(
+            request_info=aiohttp.RequestInfo(
+                url="https://fake", method="GET", headers={}, real_url="https://fake"
+            ),
+            history=(),
+            status=self.status,
+            message="Failed",
+        )
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    ("status", "kind"),
+    [(404, caching.Negative.NOT_FOUND), (503, caching.Negative.ERROR)],
+)
+async def test_not_found_and_transient_errors_are_cached_briefly(mocker, status, kind):
+    mocker.patch("redis.Redis", RedisStub)
+
+    rcache = cache.RedisCache()
+    connection = FailingConnection(rcache, status)
+
+    for _ in range(3):
+        with pytest.raises(aiohttp.ClientResponseError) as error:
+            await connection.request("query", {}, user="missing")
+
+        assert error.value.status == status
+
+    assert connection.calls == 1
+    assert rcache.connection.plainstore[caching.NEGATIVE_HITS_KEY] == {kind: 2}
+    assert caching.NEGATIVE_TTLS[kind] in rcache.connection.ttls.values()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("available", [True, False])
+async def test_other_errors_and_errors_without_cache_are_not_cached(mocker, available):
+    mocker.patch("redis.Redis", RedisStub)
+
+    rcache = cache.RedisCache()
+    rcache.connection.available = available
+    connection = FailingConnection(rcache, 400 if available else 404)
+
+    for _ in range(2):
+        with pytest.raises(aiohttp.ClientResponseError):
+            await connection.request("query", {})
+
+    assert connection.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_empty_results_are_cached_briefly(mocker):
+    mocker.patch("redis.Redis", RedisStub)
+    mocker.patch("animeippo.providers.caching.threading", types.SimpleNamespace(Thread=SyncThread))
+
+    rcache = cache.RedisCache()
+    empty_ttl = caching.NEGATIVE_TTLS[caching.Negative.EMPTY]
+
+    class EmptyProvider:
+        def __init__(self):
+            self.cache = rcache
+
+        @caching.cached_query(ttl=timedelta(days=1))
+        async def request(self, query, parameters):
+            return {"data": {"media": []}}
+
+        @caching.cached_dataframe(ttl=timedelta(days=1))
+        async def get_data(self, key):
+            return pl.DataFrame({"id": []})
+
+    provider = EmptyProvider()
+
+    for _ in range(2):
+        await provider.request("query", {})
+        await provider.get_data("test")
+
+    assert list(rcache.connection.ttls.values()) == [empty_ttl, empty_ttl]
+    assert rcache.connection.plainstore[caching.NEGATIVE_HITS_KEY] == {"empty": 2}
+
+
+def test_responses_without_items_are_empty():
+    assert caching.is_empty({"data": {"lists": [], "user": None}})
+    assert not caching.is_empty({"data": [{"id": 1}]})
+    assert not caching.is_empty({"data": {"lists": [], "name": "Completed"}})
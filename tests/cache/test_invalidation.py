@@ -0,0 +1,199 @@
+import types
+
+import polars as pl
+import pytest
+
+from animeippo.cache import invalidation, keys
+from animeippo.cache.redis_cache import RedisCache
+from animeippo.providers import mappers, util
+from animeippo.providers.anilist import formatter as anilist_formatter
+from animeippo.providers.anilist import schema
+from animeippo.providers.mixed import formatter as mixed_formatter
+from animeippo.recommendation import funnel
+from tests.cache.test_cache import RedisStub
+
+
+@pytest.fixture
+def rcache(mocker):
+    mocker.patch("redis.Redis", RedisStub)
+
+    rcache = RedisCache()
+    stored = [
+        keys.make_key("anilist", keys.Kind.SEASONAL, "get_seasonal_anime_list:2025:WINTER"),
+        keys.make_key("mixed", keys.Kind.SEASONAL, "get_seasonal_anime_list:2025:WINTER"),
+        keys.make_key("anilist", keys.Kind.USER_LIST, "get_user_manga_list", user="Tester"),
+        keys.make_key("myanimelist", keys.Kind.USER_QUERY, "abc", user="tester"),
+        keys.make_key("mixed", keys.Kind.USER_LIST, "get_user_watchlist", user="Other"),
+        "animeippo:anilist:seasonal:v0:get_seasonal_anime_list:2024:",
+        "get_seasonal_anime_list 2025,WINTER_AniListProvider",
+    ]
+
+    for key in stored:
+        rcache.set_bytes(key, b"data")
+
+    return rcache
+
+
+def test_keys_are_namespaced_and_versioned():
+    key = keys.make_key("anilist", keys.Kind.USER_LIST, "entries", user="Tester")
+
+    assert key == f"animeippo:anilist:user_list:v{keys.version('user_list')}:Tester:entries"
+    assert keys.parse_key(key) == ("anilist", "user_list", keys.version("user_list"))
+    assert keys.is_current(key)
+    assert not keys.is_current("animeippo:anilist:user_list:v0:Tester:entries")
+    assert not keys.is_current("animeippo:anilist:unknown:v1:id")
+    assert keys.parse_key("get_user_manga_list Tester_AniListProvider") is None
+    assert not keys.is_current("get_user_manga_list Tester_AniListProvider")
+
+
+def test_user_patterns_ignore_case_and_escape_globs():
+    assert keys.glob_user("Ab_1*") == "[aA][bB]_1\\*"
+    assert keys.patterns(user="x") == [f"animeippo:*:{kind}:v*:[xX]:*" for kind in keys.USER_KINDS]
+    assert keys.patterns([keys.Kind.SEASONAL], user="x") == []
+
+
+def test_seasonal_data_is_invalidated(rcache):
+    found = invalidation.matching_keys(rcache, [keys.Kind.SEASONAL])
+    removed = invalidation.invalidate(rcache, found)
+
+    assert removed == {("anilist", "seasonal"): 2, ("mixed", "seasonal"): 1}
+    assert len(list(rcache.scan_keys("*"))) == 4
+
+
+def test_user_data_is_invalidated_for_every_provider(rcache):
+    found = invalidation.matching_keys(rcache, user="TESTER")
+
+    assert invalidation.invalidate(rcache, found) == {
+        ("anilist", "user_list"): 1,
+        ("myanimelist", "user_query"): 1,
+    }
+    assert invalidation.matching_keys(rcache, provider="mixed", user="other") == {
+        keys.make_key("mixed", keys.Kind.USER_LIST, "get_user_watchlist", user="Other")
+    }
+
+
+def test_stale_and_legacy_keys_are_found_without_removing_on_dry_run(rcache):
+    stale = invalidation.matching_keys(rcache, stale=True)
+    legacy = invalidation.legacy_keys(rcache)
+
+    assert invalidation.invalidate(rcache, stale | legacy, dry_run=True) == {
+        ("anilist", "seasonal"): 1,
+        ("legacy", "legacy"): 1,
+    }
+    assert len(list(rcache.scan_keys("*"))) == 7
+
+
+def test_formatted_keys_are_versioned_by_their_definitions(mocker):
+    assert keys.version(keys.Kind.QUERY) == "1"
+    assert keys.version(keys.Kind.SEASONAL).startswith("1.")
+    assert keys.version(keys.Kind.SEASON_ARTIFACTS) != keys.version(keys.Kind.SEASONAL)
+
+    seasonal_key = keys.make_key("anilist", keys.Kind.SEASONAL, "2025:")
+    assert keys.parse_key(seasonal_key)[2] == keys.version(keys.Kind.SEASONAL)
+
+    mocker.patch.dict(keys.SCHEMA_VERSIONS, {keys.Kind.SEASONAL: 2})
+
+    assert not keys.is_current(seasonal_key)
+    assert keys.current_version("animeippo:anilist:unknown:v1:id") is None
+
+
+def _edited(code, name):
+    """The code with a constant added to the body of the function called name,
+    which may be nested in it."""
+    if code.co_name == name:
+        return code.replace(co_consts=(*code.co_consts, "edited"))
+
+    return code.replace(
+        co_consts=tuple(
+            _edited(const, name) if isinstance(const, types.CodeType) else const
+            for const in code.co_consts
+        )
+    )
+
+
+@pytest.fixture
+def fingerprint():
+    keys.format_fingerprint.cache_clear()
+    original = keys.format_fingerprint(keys.Kind.SEASONAL)
+    keys.format_fingerprint.cache_clear()
+
+    yield original
+
+    keys.format_fingerprint.cache_clear()
+
+
+@pytest.mark.parametrize(
+    ("module", "function", "nested"),
+    [
+        (anilist_formatter, "build_franchise_column", "build_franchise_column"),
+        (anilist_formatter, "build_anilist_mapping", "enrich_features"),
+        (mixed_formatter, "_enrich_mixed_features", "_enrich_mixed_features"),
+        (util, "get_clustering_ranks", "get_clustering_ranks"),
+        (util, "add_feature_columns", "add_feature_columns"),
+        (mappers, "QueryMapper", "map"),
+    ],
+)
+def test_fingerprint_changes_with_function_bodies(
+    monkeypatch, fingerprint, module, function, nested
+):
+    func = getattr(module, function)
+    func = func.map if isinstance(func, type) else func
+    monkeypatch.setattr(func, "__code__", _edited(func.__code__, nested))
+
+    assert keys.format_fingerprint(keys.Kind.SEASONAL) != fingerprint
+
+
+@pytest.mark.parametrize(
+    "edit",
+    [
+        lambda monkeypatch: monkeypatch.setitem(util.TAG_WEIGHTS, "Theme", 2.0),
+        lambda monkeypatch: monkeypatch.setattr(util, "GENRE_MAX_WEIGHT", 100),
+        lambda monkeypatch: monkeypatch.setattr(
+            anilist_formatter,
+            "FRANCHISE_RELATION_TYPES",
+            [
+                *anilist_formatter.FRANCHISE_RELATION_TYPES[:3],
+                "OTHER",
+                *anilist_formatter.FRANCHISE_RELATION_TYPES[4:],
+            ],
+        ),
+        lambda monkeypatch: monkeypatch.setitem(schema.ANI_MEDIA_SCHEMA, "title", pl.Int64),
+    ],
+)
+def test_fingerprint_changes_with_constants(monkeypatch, fingerprint, edit):
+    edit(monkeypatch)
+
+    assert keys.format_fingerprint(keys.Kind.SEASONAL) != fingerprint
+
+
+def test_fingerprint_covers_whole_expressions():
+    relations = ["SEQUEL", "PREQUEL", "PARENT", "SIDE_STORY", "SPIN_OFF", "SUMMARY"]
+    edited = [*relations[:3], "OTHER", *relations[4:]]
+
+    def describe(types):
+        return keys.describe(mappers.SelectorMapper(pl.col("relation").is_in(types)), set())
+
+    assert describe(relations) == describe(list(relations))
+    assert describe(edited) != describe(relations)
+    # Sets are described in order, their iteration order varies between processes
+    assert keys.describe(frozenset(relations), set()) == keys.describe(
+        frozenset(reversed(relations)), set()
+    )
+
+
+def test_fingerprint_ignores_memos(fingerprint):
+    anilist_formatter.get_anilist_mapping({})
+
+    assert keys.format_fingerprint(keys.Kind.SEASONAL) == fingerprint
+
+
+def test_season_artifacts_fingerprint_follows_the_funnel(monkeypatch):
+    keys.format_fingerprint.cache_clear()
+    original = keys.format_fingerprint(keys.Kind.SEASON_ARTIFACTS)
+    keys.format_fingerprint.cache_clear()
+    monkeypatch.setattr(funnel, "MOOD_THRESHOLD", 2.0)
+
+    try:
+        assert keys.format_fingerprint(keys.Kind.SEASON_ARTIFACTS) != original
+    finally:
+        keys.format_fingerprint.cache_clear()
@@ -27,3 +27,12 @@ def test_categorical_uses_columns_if_given():
     )
 
     assert similarity.columns == ["1a", "2b"]
+
+
+def test_categorical_similarity_keeps_default_columns():
+    original = pl.Series([{"a": 1, "b": 0}, {"a": 0, "b": 1}])
+
+    similarity = animeippo.analysis.similarity.categorical_similarity(original, original)
+
+    assert similarity.shape == (2, 2)
+    assert similarity.columns == ["column_0", "column_1"]
@@ -1,3 +1,4 @@
+import numpy as np
 import polars as pl
 import pytest
 
@@ -122,7 +123,7 @@ def test_franchise_pairs_without_typed_relations():
     )
 
     pairs = ml.get_relation_pairs(series)
-    assert pairs == {(0, 1): "related"}
+    assert pairs.rows() == [(0, 1, "related")]
 
 
 def test_franchise_pairs_with_external_relations():
@@ -143,7 +144,69 @@ def test_franchise_pairs_with_external_relations():
 
     pairs = ml.get_relation_pairs(series)
     # Franchise gives a "related" pair, but typed relations point outside so no "direct" upgrade
-    assert pairs == {(0, 1): "related"}
+    assert pairs.rows() == [(0, 1, "related")]
+
+
+def test_franchise_pairs_upgrade_direct_relations():
+    ml = model.AnimeClustering(distance_metric="cosine", franchise_reduction=True)
+
+    series = pl.DataFrame(
+        {
+            "id": [100, 200, 300, 400],
+            "encoded": [{"a": 10, "b": 5}] * 4,
+            "franchise": [["franchise_1"], ["franchise_1"], ["franchise_1"], []],
+            "franchise_relations": [
+                [{"related_id": 200, "relation_type": "SEQUEL"}],
+                [
+                    {"related_id": 100, "relation_type": "PREQUEL"},
+                    {"related_id": 300, "relation_type": "SIDE_STORY"},
+                ],
+                [{"related_id": 100, "relation_type": "SUMMARY"}],
+                [],
+            ],
+        }
+    )
+
+    pairs = ml.get_relation_pairs(series)
+
+    assert pairs.rows() == [(0, 1, "direct"), (0, 2, "direct"), (1, 2, "related")]
+
+
+def test_franchise_pairs_without_any_relations():
+    ml = model.AnimeClustering(distance_metric="cosine", franchise_reduction=True)
+
+    series = pl.DataFrame(
+        {
+            "id": [100, 200],
+            "encoded": [{"a": 10, "b": 5}, {"a": 10, "b": 5}],
+            "franchise": [["franchise_1"], ["franchise_1"]],
+            "franchise_relations": [[], []],
+        }
+    )
+
+    pairs = ml.get_relation_pairs(series)
+    assert pairs.rows() == [(0, 1, "related")]
+
+    assert len(ml.get_relation_pairs(series.drop("franchise"))) == 0
+
+
+def test_apply_franchise_reduction_scales_both_triangles():
+    ml = model.AnimeClustering(direct_factor=0.5, related_factor=0.75)
+
+    dist_matrix = np.ones((3, 3))
+    mask = np.array([True, False, True, True])
+    pairs = pl.DataFrame(
+        {"i": [0, 0, 2], "j": [2, 1, 3], "tier": ["direct", "related", "related"]},
+        schema=model.PAIR_SCHEMA,
+    )
+
+    ml.apply_franchise_reduction(dist_matrix, mask, pairs)
+
+    expected = np.array([[1.0, 0.5, 1.0], [0.5, 1.0, 0.75], [1.0, 0.75, 1.0]])
+    np.testing.assert_array_equal(dist_matrix, expected)
+
+    ml.apply_franchise_reduction(dist_matrix, mask, ml.empty_pairs())
+    np.testing.assert_array_equal(dist_matrix, expected)
 
 
 def test_clustering_without_franchise_column():
@@ -281,3 +344,35 @@ def test_predict_preserves_order_beyond_ten_items():
         assert predicted["cluster"][i] == cluster_c, (
             f"Item {i}: expected cluster C ({cluster_c}), got {predicted['cluster'][i]}"
         )
+
+
+def test_predict_with_precomputed_similarities_averages_per_cluster():
+    ml = model.AnimeClustering()
+    ml.is_fit = True
+    ml.clustered_series = pl.DataFrame({"id": [1, 2, 3, 4], "cluster": [0, 0, 1, -1]})
+
+    similarities = pl.DataFrame(
+        {
+            "10": [0.9, 0.1, 0.6, 1.0],
+            "20": [0.2, float("nan"), 0.8, 1.0],
+            "id": [1, 2, 3, 4],
+        }
+    )
+
+    predicted = ml.predict(None, similarities)
+
+    # Item 10: cluster 0 mean 0.5 < cluster 1 mean 0.6, unclustered id 4 is ignored
+    # Item 20: cluster 0 mean 0.1 (NaN counts as zero) < cluster 1 mean 0.8
+    assert predicted["cluster"].to_list() == [1, 1]
+    assert predicted["similarity"].to_list() == pytest.approx([0.6, 0.8])
+
+
+def test_predict_without_valid_clusters_returns_empty_frame():
+    ml = model.AnimeClustering()
+    ml.is_fit = True
+    ml.clustered_series = pl.DataFrame({"id": [1], "cluster": [-1]})
+
+    predicted = ml.predict(None, pl.DataFrame({"10": [0.5], "id": [1]}))
+
+    assert predicted.columns == ["cluster", "similarity"]
+    assert len(predicted) == 0
@@ -1,6 +1,23 @@
 import pytest
 
 
+def pytest_addoption(parser):
+    parser.addoption("--timing", action="store_true", help="Run the wall-clock timing comparisons")
+
+
+def pytest_collection_modifyitems(config, items):
+    """Timing comparisons depend on the machine and its load, so they only run
+    when asked for. The checks that the compared versions agree always run."""
+    if config.getoption("--timing"):
+        return
+
+    skip = pytest.mark.skip(reason="timing comparison, run with --timing")
+
+    for item in items:
+        if "timing" in item.keywords:
+            item.add_marker(skip)
+
+
 class MockRedisCache:
     """Mock Redis cache that always reports as unavailable during tests.
     This ensures consistent test coverage regardless of whether Redis is running."""
@@ -14,6 +31,12 @@ class MockRedisCache:
     def get_json(self, key):
         return None
 
+    def set_json_many(self, values, ttl=None):
+        pass
+
+    def get_json_many(self, keys):
+        return [None] * len(keys)
+
     def set_dataframe(self, key, dataframe, ttl=None):
         pass
 
@@ -0,0 +1,324 @@
+"""End-to-end recommendation benchmark on synthetic users and catalogues.
+
+Times every stage of recommending a season to a synthetic user, from formatting
+the raw payloads to serialising the view, for watchlists of 100 to 10k titles
+and catalogues of 50 to 2,000 titles. One more run per scenario is traced with
+tracemalloc for the heap peak of every stage, which is slower so it is not
+timed. Polars buffers are not on the Python heap, the app's request logs show them
+as resident memory. The stages are the ones the engine marks with memory.stage,
+so the benchmark runs the same code as requests, and the total is the wall time
+of the whole run. The time to import the app is measured too. Timings and peaks
+are compared to a JSON baseline so regressions show up as numbers:
+
+    python -m tests.performance.benchmark                      # compare to baseline
+    python -m tests.performance.benchmark --scenarios 1000x200 # only some scenarios
+    python -m tests.performance.benchmark --skip-memory        # only timings
+    python -m tests.performance.benchmark --skip-startup       # without app startup
+    python -m tests.performance.benchmark --update             # record a new baseline
+
+See: tests/performance/synthetic.py, tests/performance/baseline.json
+"""
+
+import argparse
+import contextlib
+import json
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+import polars as pl
+
+from animeippo import memory
+from animeippo.analysis import encoding
+from animeippo.clustering import model
+from animeippo.profiling.model import UserProfile
+from animeippo.providers.anilist import data, formatter
+from animeippo.recommendation import engine, recommender_builder
+from animeippo.recommendation.model import RecommendationModel
+from animeippo.recommendation.ranking import RankingOrchestrator
+from animeippo.view import views
+from tests.performance.synthetic import build_payloads
+
+# Watchlist size x seasonal catalogue size
+SCENARIOS = {
+    "100x50": (100, 50),
+    "1000x200": (1000, 200),
+    "5000x1000": (5000, 1000),
+    "10000x2000": (10000, 2000),
+}
+BASELINE_PATH = Path(__file__).with_name("baseline.json")
+REGRESSION_RATIO = 1.25
+# Slowdowns smaller than this are noise and never count as regressions
+NOISE_FLOOR = 0.005
+# Heap peak growth in megabytes that never counts as a regression
+MEMORY_NOISE_FLOOR = 1.0
+REPEATS = 3
+ROOT = Path(__file__).parents[2]
+# Libraries that importing the app must leave for the first request
+HEAVY_MODULES = ["sklearn", "scipy", "pandas"]
+STARTUP_STAGE = "import_app"
+STARTUP = """
+import json, sys, time
+start = time.perf_counter()
+import app
+print(json.dumps({{
+    "seconds": time.perf_counter() - start,
+    "heavy": [name for name in {heavy} if name in sys.modules],
+    "providers": list(app.recommenders),
+}}))
+"""
+
+
+def build_engine():
+    return engine.AnimeRecommendationEngine(
+        model.AnimeClustering(**recommender_builder.CLUSTERING_DEFAULTS),
+        encoding.WeightedCategoricalEncoder(),
+        discovery_scorers=recommender_builder.get_discovery_scorers(),
+        engagement_scorers=recommender_builder.get_engagement_scorers(),
+        ranking_orchestrator=RankingOrchestrator(
+            recommender_builder.get_default_categorizers(
+                distance_metric=recommender_builder.CLUSTERING_DEFAULTS["distance_metric"],
+                tag_lookup=data.ALL_TAGS,
+                genres=data.ALL_GENRES,
+            )
+        ),
+    )
+
+
+class StageTimer(memory.MemoryTracker):
+    """Times the stages the pipeline marks with memory.stage, and records their
+    memory while tracemalloc is tracing. Stages nest, so scorers are timed within
+    the score stage."""
+
+    def __init__(self):
+        super().__init__()
+        self.timings = {}
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+
+        try:
+            with super().stage(name):
+                yield
+        finally:
+            self.timings[name] = time.perf_counter() - start
+
+
+def run_scenario(watchlist_size, seasonal_size):
+    """One recommendation run, as a StageTimer with the timings in seconds and,
+    while tracemalloc is tracing, the memory use of every stage."""
+    watchlist_raw, mangalist_raw, seasonal_raw = build_payloads(watchlist_size, seasonal_size)
+    pl.enable_string_cache()
+    tracker = StageTimer()
+
+    with memory.tracking(tracker), tracker.stage("total"):
+        run_pipeline(watchlist_raw, mangalist_raw, seasonal_raw)
+
+    return tracker
+
+
+def run_pipeline(watchlist_raw, mangalist_raw, seasonal_raw):
+    """Recommends a season the way the app does. The stages between formatting
+    and the view are marked by the engine and the model themselves."""
+    with memory.stage("format_watchlist"):
+        watchlist = formatter.transform_watchlist_data(watchlist_raw, data.ALL_TAGS)
+
+    with memory.stage("format_mangalist"):
+        mangalist = formatter.transform_user_manga_list_data(mangalist_raw, data.ALL_TAGS)
+
+    with memory.stage("format_seasonal"):
+        seasonal = formatter.transform_seasonal_data(seasonal_raw, data.ALL_TAGS)
+
+    with memory.stage("user_profile"):
+        profile = UserProfile("benchmark", watchlist, mangalist)
+
+    recommendation_engine = build_engine()
+    dataset = RecommendationModel(profile, seasonal)
+    dataset.nsfw_tags = data.NSFW_TAGS
+
+    dataset.recommendations = recommendation_engine.fit_predict(dataset)
+    categories = recommendation_engine.categorize_anime(dataset)
+
+    with memory.stage("view"):
+        views.recommendations_web_view(
+            dataset.recommendations,
+            categories,
+            list(set(dataset.all_features) - set(dataset.nsfw_tags)),
+        )
+
+
+def run(scenarios, repeats=REPEATS):
+    """Best timings of a few runs per scenario."""
+    results = {}
+
+    for name in scenarios:
+        runs = [run_scenario(*SCENARIOS[name]).timings for _ in range(repeats)]
+        results[name] = {stage: min(run[stage] for run in runs) for stage in runs[0]}
+
+    return results
+
+
+def measure(scenarios):
+    """Heap peaks in megabytes by stage, from one traced run per scenario."""
+    results = {}
+    memory.enable()
+
+    try:
+        for name in scenarios:
+            tracker = run_scenario(*SCENARIOS[name])
+            results[name] = {
+                stage: usage["peak"] / memory.MB for stage, usage in tracker.stages.items()
+            }
+    finally:
+        tracemalloc.stop()
+
+    return results
+
+
+def start_app():
+    """Imports the app in a fresh interpreter, returning how long it took, the
+    heavy libraries it imported and the providers it built."""
+    script = STARTUP.format(heavy=HEAVY_MODULES)
+    result = subprocess.run(  # noqa: S603
+        [sys.executable, "-c", script], cwd=ROOT, capture_output=True, text=True, check=True
+    )
+
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+def measure_startup(repeats=REPEATS):
+    """Best time in seconds to import the app."""
+    return {STARTUP_STAGE: min(start_app()["seconds"] for _ in range(repeats))}
+
+
+def best_time(func, iterations=REPEATS):
+    """Best time in seconds of a few calls, after one to warm up."""
+    func()
+    times = []
+
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+
+    return min(times)
+
+
+def compare(results, baseline, ratio=REGRESSION_RATIO, *, section="scenarios", floor=NOISE_FLOOR):
+    """Stages slower, or with higher peaks, than the baseline by more than the ratio,
+    as (scenario, stage, baseline, current) tuples."""
+    regressions = []
+
+    for name, values in results.items():
+        for stage, current in values.items():
+            previous = baseline.get(section, {}).get(name, {}).get(stage)
+
+            if previous is not None and current - previous > floor and current > previous * ratio:
+                regressions.append((name, stage, previous, current))
+
+    return regressions
+
+
+def load_baseline(path=BASELINE_PATH):
+    return json.loads(path.read_text()) if path.exists() else {}
+
+
+def save_baseline(results, memory_results, startup, path=BASELINE_PATH):
+    baseline = load_baseline(path)
+    baseline["machine"] = {
+        "python": platform.python_version(),
+        "polars": pl.__version__,
+        "platform": platform.platform(),
+        "processor": platform.machine(),
+    }
+    baseline["scenarios"] = {
+        **baseline.get("scenarios", {}),
+        **{
+            name: {stage: round(seconds, 5) for stage, seconds in timings.items()}
+            for name, timings in results.items()
+        },
+    }
+    baseline["memory"] = {
+        **baseline.get("memory", {}),
+        **{
+            name: {stage: round(megabytes, 2) for stage, megabytes in peaks.items()}
+            for name, peaks in memory_results.items()
+        },
+    }
+
+    if startup:
+        baseline["startup"] = {
+            "app": {stage: round(seconds, 5) for stage, seconds in startup.items()}
+        }
+
+    path.write_text(json.dumps(baseline, indent=2) + "\n")
+
+
+def report(results, memory_results, startup, baseline):
+    for stage, seconds in startup.items():
+        base = baseline.get("startup", {}).get("app", {}).get(stage)
+        base_text = f"{base * 1000:.1f}ms" if base is not None else "-"
+        print(f"\n{stage}: {seconds * 1000:.1f}ms, baseline {base_text}")
+
+    for name, timings in results.items():
+        previous = baseline.get("scenarios", {}).get(name, {})
+        peaks = memory_results.get(name, {})
+        previous_peaks = baseline.get("memory", {}).get(name, {})
+        print(f"\n{name}")
+        print(
+            f"  {'stage':<36}{'ms':>10}{'baseline':>10}{'ratio':>8}{'peak MB':>10}{'baseline':>10}"
+        )
+
+        for stage, current in timings.items():
+            base = previous.get(stage)
+            ratio = f"{current / base:.2f}" if base else "-"
+            base_text = f"{base * 1000:.1f}" if base is not None else "-"
+            peak = f"{peaks[stage]:.1f}" if stage in peaks else "-"
+            base_peak = f"{previous_peaks[stage]:.1f}" if stage in previous_peaks else "-"
+            print(
+                f"  {stage:<36}{current * 1000:>10.1f}{base_text:>10}{ratio:>8}"
+                f"{peak:>10}{base_peak:>10}"
+            )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the recommendation pipeline")
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--repeats", type=int, default=REPEATS)
+    parser.add_argument("--skip-memory", action="store_true", help="Skip the traced memory run")
+    parser.add_argument("--skip-startup", action="store_true", help="Skip timing app startup")
+    parser.add_argument("--update", action="store_true", help="Record results as the baseline")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    args = parser.parse_args(argv)
+
+    results = run(args.scenarios, args.repeats)
+    memory_results = {} if args.skip_memory else measure(args.scenarios)
+    startup = {} if args.skip_startup else measure_startup(args.repeats)
+    baseline = load_baseline(args.baseline)
+    report(results, memory_results, startup, baseline)
+
+    if args.update:
+        save_baseline(results, memory_results, startup, args.baseline)
+        return 0
+
+    regressions = compare(results, baseline) + compare(
+        {"app": startup}, baseline, section="startup"
+    )
+    for name, stage, previous, current in regressions:
+        print(f"REGRESSION {name} {stage}: {previous * 1000:.1f}ms -> {current * 1000:.1f}ms")
+
+    memory_regressions = compare(
+        memory_results, baseline, section="memory", floor=MEMORY_NOISE_FLOOR
+    )
+    for name, stage, previous, current in memory_regressions:
+        print(f"REGRESSION {name} {stage}: {previous:.1f}MB -> {current:.1f}MB peak")
+
+    return 1 if regressions or memory_regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
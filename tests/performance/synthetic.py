@@ -0,0 +1,232 @@
+"""Synthetic AniList payloads for benchmarking at scale.
+
+Watchlists, manga lists and seasonal catalogues are generated in AniList's raw
+response format, so benchmarks include formatting. Tags are drawn from
+data.ALL_TAGS with a long-tailed popularity like real tag usage, titles are
+grouped into franchises linked by relations, and part of a catalogue continues
+or adapts titles the user has seen or read.
+"""
+
+import itertools
+
+import numpy as np
+
+from animeippo.providers.anilist import data
+
+MANGA_ID_OFFSET = 1_000_000
+SEASONAL_ID_OFFSET = 500_000
+STUDIO_COUNT = 80
+
+USER_STATUSES = {
+    "COMPLETED": 0.58,
+    "PLANNING": 0.16,
+    "CURRENT": 0.08,
+    "DROPPED": 0.08,
+    "PAUSED": 0.07,
+    "REPEATING": 0.03,
+}
+FORMATS = {"TV": 0.6, "MOVIE": 0.12, "ONA": 0.1, "OVA": 0.08, "SPECIAL": 0.06, "TV_SHORT": 0.04}
+SOURCES = {
+    "MANGA": 0.35,
+    "ORIGINAL": 0.2,
+    "LIGHT_NOVEL": 0.18,
+    "WEB_NOVEL": 0.07,
+    "VIDEO_GAME": 0.06,
+    "VISUAL_NOVEL": 0.05,
+    "NOVEL": 0.05,
+    "OTHER": 0.04,
+}
+SEASONS = ["WINTER", "SPRING", "SUMMER", "FALL"]
+
+
+def _long_tail(rng, size, exponent=0.9):
+    weights = 1 / np.arange(1, size + 1) ** exponent
+    return rng.permutation(weights / weights.sum())
+
+
+def _date(year, month, day):
+    return {"year": year, "month": month, "day": day}
+
+
+class PayloadGenerator:
+    def __init__(self, seed=0):
+        self.rng = np.random.default_rng(seed)
+        self.tag_ids = np.array(
+            [tag_id for tag_id, tag in data.ALL_TAGS.items() if not tag["isAdult"]]
+        )
+        self.tag_weights = _long_tail(self.rng, len(self.tag_ids))
+        self.genres = np.array([genre for genre in data.ALL_GENRES if genre != "Hentai"])
+        self.genre_weights = _long_tail(self.rng, len(self.genres), exponent=0.6)
+        self.studio_weights = _long_tail(self.rng, STUDIO_COUNT)
+
+    def pick(self, options):
+        return str(self.rng.choice(list(options), p=list(options.values())))
+
+    def tags(self):
+        count = int(self.rng.integers(3, 25))
+        ids = self.rng.choice(self.tag_ids, count, replace=False, p=self.tag_weights)
+        ranks = np.sort(self.rng.integers(10, 100, count))[::-1]
+
+        return [
+            {"id": int(tag_id), "rank": int(rank)} for tag_id, rank in zip(ids, ranks, strict=True)
+        ]
+
+    def genre_list(self):
+        count = int(self.rng.integers(1, 6))
+        return self.rng.choice(self.genres, count, replace=False, p=self.genre_weights).tolist()
+
+    def media(self, media_id, relations=(), recommended_ids=(), status="FINISHED", year=None):
+        studio = int(self.rng.choice(STUDIO_COUNT, p=self.studio_weights))
+        year = year or int(self.rng.integers(1995, 2026))
+
+        return {
+            "id": media_id,
+            "idMal": media_id + 7 if self.rng.random() < 0.9 else None,
+            "title": {"romaji": f"Synthetic Title {media_id}"},
+            "status": status,
+            "format": self.pick(FORMATS),
+            "genres": self.genre_list(),
+            "tags": self.tags(),
+            "meanScore": int(np.clip(self.rng.normal(70, 8), 30, 95)),
+            "duration": int(self.rng.choice([24, 24, 24, 12, 100])),
+            "episodes": int(self.rng.choice([12, 12, 13, 24, 1, 26])),
+            "source": self.pick(SOURCES),
+            "studios": {
+                "edges": [{"node": {"name": f"Studio {studio}", "isAnimationStudio": True}}]
+            },
+            "seasonYear": year,
+            "season": str(self.rng.choice(SEASONS)),
+            "coverImage": {"large": f"https://img.example/{media_id}.jpg"},
+            "popularity": int(self.rng.lognormal(9, 1.5)),
+            "relations": {
+                "edges": [
+                    {"relationType": relation, "node": {"id": related_id, "idMal": None}}
+                    for relation, related_id in relations
+                ]
+            },
+            "recommendations": {
+                "edges": [
+                    {"node": {"rating": int(rating), "mediaRecommendation": {"id": int(rec_id)}}}
+                    for rec_id, rating in zip(
+                        recommended_ids,
+                        np.sort(self.rng.integers(1, 300, len(recommended_ids)))[::-1],
+                        strict=True,
+                    )
+                ]
+            },
+        }
+
+    def franchise_relations(self, ids, share=0.35):
+        """Groups consecutive ids into franchises linked with prequels and sequels."""
+        relations = {media_id: [] for media_id in ids}
+        index = 0
+
+        while index < len(ids):
+            size = int(self.rng.integers(2, 6)) if self.rng.random() < share else 1
+            members = ids[index : index + size]
+
+            for previous, following in itertools.pairwise(members):
+                relations[following].append(("PREQUEL", previous))
+                relations[previous].append(("SEQUEL", following))
+
+            index += size
+
+        return relations
+
+    def watchlist(self, size, seasonal_ids=(), manga_ids=()):
+        ids = list(range(1, size + 1))
+        relations = self.franchise_relations(ids)
+        recommendation_pool = np.concatenate([np.arange(1, size * 4), np.array(seasonal_ids, int)])
+        entries = []
+
+        for media_id in ids:
+            status = self.pick(USER_STATUSES)
+            scored = status != "PLANNING" and self.rng.random() < 0.8
+            related = list(relations[media_id])
+
+            if len(manga_ids) and self.rng.random() < 0.2:
+                related.append(("ADAPTATION", int(self.rng.choice(manga_ids))))
+
+            entries.append(
+                {
+                    "status": status,
+                    "score": int(np.clip(self.rng.normal(7, 1.5), 1, 10)) if scored else 0,
+                    "completedAt": _date(
+                        int(self.rng.integers(2005, 2026)),
+                        int(self.rng.integers(1, 13)),
+                        int(self.rng.integers(1, 29)),
+                    )
+                    if status == "COMPLETED"
+                    else _date(None, None, None),
+                    "updatedAt": int(1_600_000_000 + media_id * 600),
+                    "media": self.media(
+                        media_id,
+                        relations=related,
+                        recommended_ids=self.rng.choice(
+                            recommendation_pool, int(self.rng.integers(0, 26)), replace=False
+                        ).tolist(),
+                    ),
+                }
+            )
+
+        return {"data": entries}
+
+    def mangalist(self, size):
+        entries = []
+
+        for media_id in range(MANGA_ID_OFFSET, MANGA_ID_OFFSET + size):
+            media = self.media(media_id)
+            status = self.pick(USER_STATUSES)
+
+            entries.append(
+                {
+                    "status": status,
+                    "score": int(np.clip(self.rng.normal(7, 1.5), 1, 10)),
+                    "completedAt": _date(None, None, None),
+                    "media": {
+                        key: media[key]
+                        for key in ["id", "idMal", "title", "genres", "tags", "meanScore"]
+                    },
+                }
+            )
+
+        return {"data": entries}
+
+    def seasonal(self, size, watchlist_ids=(), manga_ids=(), year=2025):
+        """A season's catalogue, part of which continues watched titles or adapts
+        read manga."""
+        ids = list(range(SEASONAL_ID_OFFSET, SEASONAL_ID_OFFSET + size))
+        relations = self.franchise_relations(ids, share=0.1)
+        statuses = {"RELEASING": 0.45, "NOT_YET_RELEASED": 0.35, "FINISHED": 0.2}
+        media = []
+
+        for media_id in ids:
+            related = list(relations[media_id])
+            roll = self.rng.random()
+
+            if len(watchlist_ids) and roll < 0.12:
+                related.append(("PREQUEL", int(self.rng.choice(watchlist_ids))))
+            elif len(manga_ids) and roll < 0.27:
+                related.append(("ADAPTATION", int(self.rng.choice(manga_ids))))
+
+            item = self.media(media_id, relations=related, status=self.pick(statuses), year=year)
+            del item["recommendations"]
+            media.append(item)
+
+        return {"data": {"media": media}}
+
+
+def build_payloads(watchlist_size, seasonal_size, seed=0):
+    """Raw watchlist, manga list and seasonal payloads for one synthetic user."""
+    generator = PayloadGenerator(seed)
+
+    watchlist_ids = list(range(1, watchlist_size + 1))
+    seasonal_ids = list(range(SEASONAL_ID_OFFSET, SEASONAL_ID_OFFSET + seasonal_size))
+    manga_size = max(watchlist_size // 4, 10)
+    manga_ids = list(range(MANGA_ID_OFFSET, MANGA_ID_OFFSET + manga_size))
+
+    return (
+        generator.watchlist(watchlist_size, seasonal_ids, manga_ids),
+        generator.mangalist(manga_size),
+        generator.seasonal(seasonal_size, watchlist_ids, manga_ids),
+    )
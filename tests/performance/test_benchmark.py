@@ -0,0 +1,56 @@
+from animeippo.recommendation import recommender_builder
+from tests.performance import benchmark
+
+
+def test_benchmark_times_every_stage():
+    timings = benchmark.run_scenario(*benchmark.SCENARIOS["100x50"]).timings
+
+    scorers = [
+        *recommender_builder.get_discovery_scorers(),
+        *recommender_builder.get_engagement_scorers(),
+    ]
+
+    assert {f"scorer_{scorer.name}" for scorer in scorers} <= timings.keys()
+    assert {"format_watchlist", "encode", "cluster", "score", "funnel", "render", "view"} <= (
+        timings.keys()
+    )
+    assert all(seconds > 0 for seconds in timings.values())
+    # Scorers are timed within the score stage, which the total isn't a sum of
+    assert timings["score"] >= sum(timings[f"scorer_{scorer.name}"] for scorer in scorers)
+    assert timings["total"] < sum(timings.values())
+
+
+def test_benchmark_measures_heap_peak_of_every_stage():
+    peaks = benchmark.measure(["100x50"])["100x50"]
+    timings = benchmark.run_scenario(*benchmark.SCENARIOS["100x50"]).timings
+
+    assert peaks.keys() == timings.keys()
+    assert peaks["total"] >= peaks["cluster"] > 0
+
+
+def test_baseline_covers_every_scenario_and_stage():
+    baseline = benchmark.load_baseline()
+    stages = benchmark.run_scenario(*benchmark.SCENARIOS["100x50"]).timings.keys()
+
+    assert baseline["scenarios"].keys() == benchmark.SCENARIOS.keys()
+    assert baseline["memory"].keys() == benchmark.SCENARIOS.keys()
+    assert all(timings.keys() == stages for timings in baseline["scenarios"].values())
+    assert all(peaks.keys() == stages for peaks in baseline["memory"].values())
+
+
+def test_only_clear_slowdowns_are_regressions():
+    baseline = {"scenarios": {"100x50": {"encode": 0.1, "view": 0.001, "render": 0.1}}}
+    results = {"100x50": {"encode": 0.2, "view": 0.004, "render": 0.11}}
+
+    assert benchmark.compare(results, baseline) == [("100x50", "encode", 0.1, 0.2)]
+
+
+def test_only_clear_heap_growth_is_a_regression():
+    baseline = {"memory": {"10000x2000": {"cluster": 1000.0, "view": 0.5, "predict": 400.0}}}
+    results = {"10000x2000": {"cluster": 1400.0, "view": 1.2, "predict": 420.0}}
+
+    regressions = benchmark.compare(
+        results, baseline, section="memory", floor=benchmark.MEMORY_NOISE_FLOOR
+    )
+
+    assert regressions == [("10000x2000", "cluster", 1000.0, 1400.0)]
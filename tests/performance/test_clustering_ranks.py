@@ -0,0 +1,138 @@
+"""Performance comparison: wide pivoted clustering ranks vs sparse clustering ranks.
+
+get_clustering_ranks used to pivot tags and genres into a struct with a field for
+every feature in the frame, so each row carried hundreds of mostly-zero fields into
+the cache. It now stores only each row's own (name, weight) pairs, and the encoder
+densifies them against the fitted classes. This rebuilds the pivot version and checks
+that the sparse one encodes to the same vectors, faster and with much smaller ranks.
+
+See: src/animeippo/providers/util.py, src/animeippo/analysis/encoding.py
+"""
+
+import numpy as np
+import polars as pl
+import pytest
+from polars.testing import assert_series_equal
+
+from animeippo.analysis.encoding import WeightedCategoricalEncoder
+from animeippo.providers import util
+from tests.performance.benchmark import best_time
+
+ITERATIONS = 5
+FEATURE_COUNT = 400
+GENRE_COUNT = 20
+CATEGORIES = ["Theme-Action", "Cast-Main Cast", "Setting-Scene", "Technical", "Demographic"]
+FEATURE_INFO_TYPE = pl.List(pl.Struct({"name": pl.Utf8, "rank": pl.UInt8, "category": pl.Utf8}))
+
+
+def _build_large_frame(size=5000):
+    rng = np.random.default_rng(0)
+    rows = []
+
+    for i in range(size):
+        features = {}
+        for index in rng.choice(FEATURE_COUNT, rng.integers(1, 16), replace=False).tolist():
+            is_genre = index < GENRE_COUNT
+            features[f"feature {index}"] = {
+                "name": f"feature {index}",
+                "rank": None if is_genre else int(rng.integers(1, 101)),
+                "category": "Genre" if is_genre else CATEGORIES[index % len(CATEGORIES)],
+            }
+        rows.append({"id": i, "feature_info": list(features.values())})
+
+    return pl.DataFrame(rows, schema={"id": pl.UInt32, "feature_info": FEATURE_INFO_TYPE})
+
+
+def _pivoted_clustering_ranks(df):
+    exploded = df.select("id", "feature_info").explode("feature_info").unnest("feature_info")
+    is_genre = pl.col("category") == "Genre"
+
+    tag_ranks = (
+        exploded.filter(~is_genre)
+        .with_columns(
+            weighted_rank=pl.col("rank")
+            * pl.col("category")
+            .replace_strict(util.TAG_WEIGHTS, default=None)
+            .fill_null(
+                pl.col("category")
+                .str.split("-")
+                .list.first()
+                .replace_strict(util.TAG_WEIGHTS, default=1.0)
+            )
+        )
+        .pivot(index="id", values="weighted_rank", on="name", aggregate_function="first")
+    )
+
+    genre_data = exploded.filter(is_genre)
+    idf_raw = (pl.lit(len(df)) / pl.col("len")).log()
+    genre_idf = (
+        genre_data.group_by("name")
+        .len()
+        .with_columns(
+            idf_weight=(
+                idf_raw / pl.max_horizontal(idf_raw.max(), pl.lit(1.0)) * util.GENRE_MAX_WEIGHT
+            ).cast(pl.UInt8)
+        )
+    )
+    genre_ranks = (
+        genre_data.select("id", "name")
+        .join(genre_idf, on="name")
+        .pivot(index="id", values="idf_weight", on="name", aggregate_function="first")
+    )
+
+    return (
+        df.select("id")
+        .join(tag_ranks, on="id", how="left")
+        .join(genre_ranks, on="id", how="left")
+        .fill_null(0)
+        .select(pl.struct(pl.exclude("id")).alias("clustering_ranks"))
+        .to_series()
+    )
+
+
+LARGE_FRAME = _build_large_frame()
+
+
+def _encoder():
+    encoder = WeightedCategoricalEncoder()
+    encoder.fit([f"feature {index}" for index in range(FEATURE_COUNT)])
+
+    return encoder
+
+
+def _via_pivot(encoder):
+    return encoder.encode(
+        LARGE_FRAME.with_columns(clustering_ranks=_pivoted_clustering_ranks(LARGE_FRAME))
+    )
+
+
+def _via_sparse(encoder):
+    return encoder.encode(
+        LARGE_FRAME.with_columns(clustering_ranks=util.get_clustering_ranks(LARGE_FRAME))
+    )
+
+
+def test_sparse_clustering_ranks_encode_like_pivot_and_are_smaller():
+    encoder = _encoder()
+
+    assert_series_equal(_via_sparse(encoder), _via_pivot(encoder))
+
+    pivot_size = _pivoted_clustering_ranks(LARGE_FRAME).estimated_size()
+    sparse_size = util.get_clustering_ranks(LARGE_FRAME).estimated_size()
+
+    assert sparse_size * 10 < pivot_size, (
+        f"Sparse ranks ({sparse_size} bytes) are not much smaller than "
+        f"pivoted ranks ({pivot_size} bytes)."
+    )
+
+
+@pytest.mark.timing
+def test_sparse_clustering_ranks_faster_than_pivot():
+    encoder = _encoder()
+
+    pivot_time = best_time(lambda: _via_pivot(encoder), ITERATIONS)
+    sparse_time = best_time(lambda: _via_sparse(encoder), ITERATIONS)
+
+    assert sparse_time < pivot_time, (
+        f"Sparse ranks ({sparse_time:.3f}s) are slower than pivoted ranks ({pivot_time:.3f}s)."
+    )
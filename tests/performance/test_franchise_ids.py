@@ -0,0 +1,106 @@
+"""Performance comparison: pure-Python union-find vs scipy connected components.
+
+build_franchise_ids runs on every watchlist and seasonal transform. It used to
+union every relation edge in a Python loop. It now builds a sparse adjacency
+matrix and labels franchises with scipy.sparse.csgraph.connected_components.
+This rebuilds the union-find version and checks that both find the same
+franchises on a 5k-entry watchlist with dense relation graphs.
+
+See: src/animeippo/providers/util.py
+"""
+
+import numpy as np
+import polars as pl
+import pytest
+
+from animeippo.providers import util
+from tests.performance.benchmark import best_time
+
+ITERATIONS = 10
+FRANCHISE_SIZE = 40
+
+
+class UnionFind:
+    def __init__(self):
+        self.parent = {}
+
+    def find(self, x):
+        while self.parent.get(x, x) != x:
+            self.parent[x] = self.parent.get(self.parent[x], self.parent[x])
+            x = self.parent[x]
+        return x
+
+    def union(self, a, b):
+        ra, rb = self.find(a), self.find(b)
+        if ra != rb:
+            self.parent[ra] = rb
+
+
+def _union_find_franchise_ids(ids, relation_lists):
+    uf = UnionFind()
+    id_list = ids.to_list()
+
+    for anime_id, relations in zip(id_list, relation_lists.to_list(), strict=True):
+        for related_id in relations or []:
+            uf.union(anime_id, related_id)
+
+    root_counts = {}
+    for anime_id in id_list:
+        root = uf.find(anime_id)
+        root_counts[root] = root_counts.get(root, 0) + 1
+
+    return pl.Series(
+        "franchise",
+        [
+            [f"franchise_{uf.find(aid)}"] if root_counts.get(uf.find(aid), 0) > 1 else []
+            for aid in id_list
+        ],
+    )
+
+
+def _build_dense_relations(size=5000):
+    """Every entry relates to ~15 entries of its own franchise, and to titles
+    outside the watchlist."""
+    rng = np.random.default_rng(0)
+    relations = []
+
+    for i in range(size):
+        start = i - i % FRANCHISE_SIZE
+        members = rng.choice(FRANCHISE_SIZE, 15, replace=False) + start
+        external = rng.integers(100_000, 200_000, 5)
+        relations.append([int(x) for x in np.concatenate([members[members < size], external])])
+
+    return pl.Series("id", range(size), dtype=pl.UInt32), pl.Series("rels", relations)
+
+
+IDS, RELATIONS = _build_dense_relations()
+
+
+def _groups(franchises):
+    """Franchise labels differ between the two, so compare the partitions."""
+    return franchises.to_frame().with_row_index().group_by("franchise").agg("index")["index"]
+
+
+def _via_union_find():
+    return _union_find_franchise_ids(IDS, RELATIONS)
+
+
+def _via_connected_components():
+    return util.build_franchise_ids(IDS, RELATIONS)
+
+
+def test_connected_components_find_union_find_franchises():
+    assert sorted(_groups(_via_connected_components()).to_list()) == sorted(
+        _groups(_via_union_find()).to_list()
+    )
+
+
+@pytest.mark.timing
+def test_connected_components_faster_than_union_find():
+    union_find_time = best_time(_via_union_find, ITERATIONS)
+    components_time = best_time(_via_connected_components, ITERATIONS)
+
+    assert components_time < union_find_time, (
+        f"Connected components ({components_time:.3f}s) are slower than "
+        f"union-find ({union_find_time:.3f}s)."
+    )
@@ -1,39 +1,34 @@
-"""Performance comparison: fast_json_normalize vs pl.json_normalize.
+"""Performance comparison: fast_json_normalize vs pl.json_normalize vs util.normalize_json.
 
 As of Polars 1.39, fast_json_normalize (via pandas) is still significantly faster
 than Polars' native json_normalize for nested AniList API data. This test will fail
 if Polars closes the gap, signaling that we can drop the pandas dependency for this.
 
+The formatters use util.normalize_json, which builds Arrow arrays straight from the
+payload with a declared nested schema and beats both.
+
 See: src/animeippo/providers/anilist/formatter.py
 """
 
-import time
-
 import polars as pl
+import pytest
 from fast_json_normalize import fast_json_normalize
 
+from animeippo.providers import util
+from animeippo.providers.anilist.schema import ANI_SEASONAL_RAW_SCHEMA, ANI_WATCHLIST_RAW_SCHEMA
 from tests import test_data
+from tests.performance.benchmark import best_time
 
 # Use the raw AniList media list format — multiply to get a realistic size
 SAMPLE_DATA = test_data.ANI_SEASONAL_LIST["data"]["Page"]["media"]
 # Repeat to simulate a full season (~200 items)
 LARGE_SAMPLE = SAMPLE_DATA * 100
+WATCHLIST_SAMPLE = (
+    test_data.ANI_USER_LIST["data"]["MediaListCollection"]["lists"][1]["entries"] * 100
+)
 ITERATIONS = 20
 
 
-def _benchmark(func, iterations=ITERATIONS):
-    # Warmup
-    func()
-
-    times = []
-    for _ in range(iterations):
-        start = time.perf_counter()
-        func()
-        times.append(time.perf_counter() - start)
-
-    return min(times)
-
-
 def test_fast_json_normalize_faster_than_polars_native():
     """fast_json_normalize should be faster than pl.json_normalize.
 
@@ -47,8 +42,8 @@ def test_fast_json_normalize_faster_than_polars_native():
     def via_polars():
         return pl.json_normalize(LARGE_SAMPLE)
 
-    fast_time = _benchmark(via_fast_json)
-    polars_time = _benchmark(via_polars)
+    fast_time = best_time(via_fast_json, ITERATIONS)
+    polars_time = best_time(via_polars, ITERATIONS)
 
     # Both should produce the same number of rows
     fast_result = via_fast_json()
@@ -60,3 +55,43 @@ def test_fast_json_normalize_faster_than_polars_native():
         f"fast_json_normalize ({fast_time:.3f}s). "
         "Consider switching to native Polars and removing the pandas dependency."
     )
+
+
+def _via_fast_json(sample):
+    return pl.from_pandas(fast_json_normalize(sample))
+
+
+def test_normalize_json_matches_fast_json_normalize():
+    seasonal = util.normalize_json(LARGE_SAMPLE, ANI_SEASONAL_RAW_SCHEMA)
+    watchlist = util.normalize_json(WATCHLIST_SAMPLE, ANI_WATCHLIST_RAW_SCHEMA)
+
+    assert len(seasonal) == len(_via_fast_json(LARGE_SAMPLE))
+    assert seasonal["relations.edges"].dtype != pl.Object
+    assert len(watchlist) == len(_via_fast_json(WATCHLIST_SAMPLE))
+
+
+@pytest.mark.timing
+def test_normalize_json_faster_than_fast_json_normalize():
+    """Direct JSON-to-Arrow ingestion should beat the pandas round-trip."""
+    fast_time = best_time(lambda: _via_fast_json(LARGE_SAMPLE), ITERATIONS)
+    arrow_time = best_time(
+        lambda: util.normalize_json(LARGE_SAMPLE, ANI_SEASONAL_RAW_SCHEMA), ITERATIONS
+    )
+
+    assert arrow_time < fast_time, (
+        f"util.normalize_json ({arrow_time:.3f}s) is slower than "
+        f"fast_json_normalize ({fast_time:.3f}s)."
+    )
+
+
+@pytest.mark.timing
+def test_normalize_json_faster_than_fast_json_normalize_for_watchlists():
+    fast_time = best_time(lambda: _via_fast_json(WATCHLIST_SAMPLE), ITERATIONS)
+    arrow_time = best_time(
+        lambda: util.normalize_json(WATCHLIST_SAMPLE, ANI_WATCHLIST_RAW_SCHEMA), ITERATIONS
+    )
+
+    assert arrow_time < fast_time, (
+        f"util.normalize_json ({arrow_time:.3f}s) is slower than "
+        f"fast_json_normalize ({fast_time:.3f}s)."
+    )
@@ -0,0 +1,104 @@
+"""Performance comparison: full watchlist payloads vs query profile payloads.
+
+User lists used to be requested with every media field for every endpoint,
+including 25 recommendations per title, although only /recommend uses them and
+/profile only needs genres. This projects a large AniList payload to each query
+profile's fields and checks that the lighter payloads are several times smaller
+and faster to format.
+
+See: src/animeippo/providers/anilist/provider.py
+"""
+
+import copy
+import json
+
+import pytest
+
+from animeippo.providers.abstract_provider import QueryProfile
+from animeippo.providers.anilist import data, formatter
+from animeippo.providers.anilist.provider import QUERY_PROFILES
+from tests import test_data
+from tests.performance.benchmark import best_time
+
+ITERATIONS = 5
+
+
+def _build_large_payload(size=1000):
+    template = test_data.ANI_USER_LIST["data"]["MediaListCollection"]["lists"][1]["entries"]
+    entries = []
+
+    for i in range(size):
+        entry = copy.deepcopy(template[i % len(template)])
+        entry["media"]["id"] = i
+        entry["media"]["coverImage"] = {"large": f"https://img.anili.st/media/{i}.jpg"}
+        entry["media"]["recommendations"] = {
+            "edges": [
+                {"node": {"rating": 25 - j, "mediaRecommendation": {"id": size + i * 25 + j}}}
+                for j in range(25)
+            ]
+        }
+        entries.append(entry)
+
+    return entries
+
+
+def _project(entries, profile):
+    fields = QUERY_PROFILES[profile]
+
+    return [
+        {
+            **entry,
+            "media": {key: value for key, value in entry["media"].items() if key in fields},
+        }
+        for entry in entries
+    ]
+
+
+LARGE_PAYLOAD = _build_large_payload()
+
+
+def _format(payload):
+    text = json.dumps({"data": payload})
+
+    def run():
+        original = formatter.normalize_watchlist_data(json.loads(text))
+        return formatter.transform_media_data(original, data.ALL_TAGS)
+
+    return len(text), run
+
+
+def test_slim_query_profiles_shrink_payload():
+    full_size, via_full = _format(_project(LARGE_PAYLOAD, QueryProfile.FULL))
+    analyse_size, _ = _format(_project(LARGE_PAYLOAD, QueryProfile.ANALYSE))
+    stats_size, via_stats = _format(_project(LARGE_PAYLOAD, QueryProfile.PROFILE_STATS))
+
+    assert len(via_stats()) == len(via_full())
+
+    assert analyse_size * 2 < full_size, (
+        f"Analyse payload ({analyse_size} bytes) is not much smaller than "
+        f"the full payload ({full_size} bytes)."
+    )
+    assert stats_size * 5 < full_size, (
+        f"Profile stats payload ({stats_size} bytes) is not much smaller than "
+        f"the full payload ({full_size} bytes)."
+    )
+
+
+@pytest.mark.timing
+def test_slim_query_profiles_format_faster():
+    _, via_full = _format(_project(LARGE_PAYLOAD, QueryProfile.FULL))
+    _, via_analyse = _format(_project(LARGE_PAYLOAD, QueryProfile.ANALYSE))
+    _, via_stats = _format(_project(LARGE_PAYLOAD, QueryProfile.PROFILE_STATS))
+
+    full_time = best_time(via_full, ITERATIONS)
+    analyse_time = best_time(via_analyse, ITERATIONS)
+    stats_time = best_time(via_stats, ITERATIONS)
+
+    assert analyse_time < full_time, (
+        f"Analyse payload ({analyse_time:.3f}s) formats slower than "
+        f"the full payload ({full_time:.3f}s)."
+    )
+    assert stats_time < analyse_time, (
+        f"Profile stats payload ({stats_time:.3f}s) formats slower than "
+        f"the analyse payload ({analyse_time:.3f}s)."
+    )
@@ -0,0 +1,76 @@
+"""Performance comparison: seasons prepared by preload_cache vs raw seasons.
+
+Every recommendation request expanded the season's sparse feature ranks to a
+dense struct and computed the moods and intensity scores of every show,
+although neither depends on the user. preload_cache now prepares them once per
+season. This recommends 1,000 synthetic shows both ways, checks that the
+recommendations are the same, and that the per request steps that use the
+season are faster with a prepared one.
+
+See: src/animeippo/recommendation/season_artifacts.py
+"""
+
+import polars as pl
+import pytest
+from polars.testing import assert_frame_equal
+
+from animeippo.analysis import encoding
+from animeippo.profiling.model import UserProfile
+from animeippo.providers.anilist import data, formatter
+from animeippo.recommendation import season_artifacts
+from animeippo.recommendation.funnel import add_funnel_metadata
+from animeippo.recommendation.model import RecommendationModel
+from tests.performance.benchmark import best_time, build_engine, build_payloads
+
+ITERATIONS = 5
+WATCHLIST = 200
+SHOWS = 1000
+
+
+def _build():
+    pl.enable_string_cache()
+    watchlist_raw, mangalist_raw, seasonal_raw = build_payloads(WATCHLIST, SHOWS)
+
+    profile = UserProfile(
+        "benchmark",
+        formatter.transform_watchlist_data(watchlist_raw, data.ALL_TAGS),
+        formatter.transform_user_manga_list_data(mangalist_raw, data.ALL_TAGS),
+    )
+    seasonal = formatter.transform_seasonal_data(seasonal_raw, data.ALL_TAGS)
+
+    return profile, seasonal
+
+
+PROFILE, SEASONAL = _build()
+PREPARED = season_artifacts.prepare(SEASONAL)
+
+
+def _recommend(seasonal):
+    dataset = RecommendationModel(PROFILE, seasonal)
+    dataset.nsfw_tags = data.NSFW_TAGS
+
+    return build_engine().fit_predict(dataset)
+
+
+def _season_steps(seasonal):
+    """The steps of a request that work on the whole season."""
+    dataset = RecommendationModel(PROFILE, seasonal)
+    dataset.encode(encoding.WeightedCategoricalEncoder())
+
+    return add_funnel_metadata(dataset.seasonal)
+
+
+def test_prepared_season_gives_same_recommendations():
+    fields = ["id", "discovery_score", "cluster", "moods", "intensity"]
+
+    assert_frame_equal(_recommend(PREPARED).select(fields), _recommend(SEASONAL).select(fields))
+
+
+@pytest.mark.timing
+def test_prepared_season_faster_per_request():
+    prepared_time = best_time(lambda: _season_steps(PREPARED), ITERATIONS)
+    raw_time = best_time(lambda: _season_steps(SEASONAL), ITERATIONS)
+
+    assert prepared_time < raw_time, (
+        f"Prepared season ({prepared_time:.3f}s) is not faster than raw ({raw_time:.3f}s)."
+    )
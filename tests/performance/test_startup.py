@@ -0,0 +1,36 @@
+"""Performance check: lazy app startup.
+
+The app used to import sklearn and scipy through the analysis, clustering and
+provider modules, and connected to Redis and built both recommenders while it
+was imported. Autoscaled containers paid for all of it before serving their
+first request. This imports the app in fresh interpreters and checks that the
+heavy libraries and providers are left for the first request, and that
+startup isn't slower than the time recorded in the benchmark baseline, so any
+import app.py gains shows up.
+
+See: app.py, src/animeippo/clustering/model.py, tests/performance/baseline.json
+"""
+
+import pytest
+
+from tests.performance import benchmark
+
+
+def test_app_starts_without_heavy_imports_or_providers():
+    startup = benchmark.start_app()
+
+    assert startup["heavy"] == []
+    assert startup["providers"] == []
+
+
+def test_baseline_records_startup():
+    assert benchmark.load_baseline()["startup"]["app"].keys() == {benchmark.STARTUP_STAGE}
+
+
+@pytest.mark.timing
+def test_startup_within_baseline():
+    startup = benchmark.measure_startup()
+
+    assert (
+        benchmark.compare({"app": startup}, benchmark.load_baseline(), section="startup") == []
+    ), f"Importing the app ({startup[benchmark.STARTUP_STAGE]:.3f}s) is slower than its baseline."
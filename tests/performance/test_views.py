@@ -0,0 +1,120 @@
+"""Performance comparison: Python dict views vs Arrow-native JSON views.
+
+Views used to turn every show into a Python dict with to_dicts() and encode
+them with json.dumps, selecting columns through a set so their order changed
+between processes. This renders 1,000 synthetic shows both ways and checks that
+writing the rows with Polars from Arrow memory gives the same data, in a stable
+column order, faster. Consumers loading shows into dataframes can also skip JSON
+altogether with the Arrow stream and Parquet views.
+
+See: src/animeippo/view/views.py
+"""
+
+import json
+
+import polars as pl
+import pytest
+
+from animeippo.providers.anilist import data, formatter
+from animeippo.view import views
+from tests.performance.benchmark import best_time
+from tests.performance.synthetic import PayloadGenerator
+
+ITERATIONS = 5
+SHOWS = 1000
+RECOMMENDATION_FIELDS = [
+    "id",
+    "title",
+    "cover_image",
+    "genres",
+    "tags",
+    "status",
+    "season_year",
+    "season",
+    "discovery_score",
+    "user_status",
+    "format",
+]
+
+
+def _build_recommendations(size=SHOWS):
+    pl.enable_string_cache()
+    seasonal = formatter.transform_seasonal_data(PayloadGenerator().seasonal(size), data.ALL_TAGS)
+
+    return seasonal.with_columns(
+        discovery_score=pl.Series(PayloadGenerator().rng.random(size)),
+        user_status=pl.lit(None, pl.Utf8),
+    )
+
+
+RECOMMENDATIONS = _build_recommendations()
+CATEGORIES = [{"name": "Top Picks", "items": list(range(20))}]
+
+
+def _dicts_view(dataframe, categories, tags_and_genres):
+    filtered_fields = list(set(dataframe.columns).intersection(RECOMMENDATION_FIELDS))
+    df_json = dataframe.select(filtered_fields).to_dicts()
+
+    return json.dumps(
+        {"data": {"shows": df_json, "categories": categories, "tags": sorted(tags_and_genres)}}
+    )
+
+
+def test_arrow_view_matches_dict_view_in_stable_order():
+    tags = ["Action", "Drama"]
+    arrow = json.loads(views.recommendations_web_view(RECOMMENDATIONS, CATEGORIES, tags))
+    dicts = json.loads(_dicts_view(RECOMMENDATIONS, CATEGORIES, tags))
+
+    assert arrow == dicts
+    assert list(arrow["data"]["shows"][0]) == [
+        field for field in RECOMMENDATION_FIELDS if field in RECOMMENDATIONS.columns
+    ]
+    assert views.recommendations_web_view(RECOMMENDATIONS, CATEGORIES, tags) == (
+        views.recommendations_web_view(RECOMMENDATIONS, CATEGORIES, tags)
+    )
+
+
+@pytest.mark.timing
+def test_arrow_view_faster_than_dict_view():
+    tags = list(data.ALL_GENRES)
+
+    arrow_time = best_time(
+        lambda: views.recommendations_web_view(RECOMMENDATIONS, CATEGORIES, tags), ITERATIONS
+    )
+    dicts_time = best_time(lambda: _dicts_view(RECOMMENDATIONS, CATEGORIES, tags), ITERATIONS)
+
+    assert arrow_time < dicts_time, (
+        f"Arrow view ({arrow_time:.3f}s) is not faster than dict view ({dicts_time:.3f}s)."
+    )
+
+
+def _via_json():
+    return pl.DataFrame(
+        json.loads(views.recommendations_web_view(RECOMMENDATIONS, CATEGORIES))["data"]["shows"]
+    )
+
+
+def _via_arrow():
+    return pl.read_ipc_stream(views.recommendations_arrow_view(RECOMMENDATIONS, CATEGORIES))
+
+
+def _via_parquet():
+    return pl.read_parquet(
+        views.recommendations_arrow_view(RECOMMENDATIONS, CATEGORIES, file_format="parquet")
+    )
+
+
+def test_arrow_round_trip_matches_json():
+    assert _via_arrow()["title"].to_list() == _via_json()["title"].to_list()
+    assert _via_parquet()["genres"].to_list() == _via_json()["genres"].to_list()
+
+
+@pytest.mark.timing
+def test_arrow_round_trip_faster_than_json():
+    """Consumers that load the shows into a dataframe skip JSON on both ends."""
+    json_time = best_time(_via_json, ITERATIONS)
+    arrow_time = best_time(_via_arrow, ITERATIONS)
+
+    assert arrow_time < json_time, (
+        f"Arrow round trip ({arrow_time:.3f}s) is not faster than JSON ({json_time:.3f}s)."
+    )
@@ -2,6 +2,7 @@ import polars as pl
 
 from animeippo.providers.anilist import data as anilist_data
 from animeippo.providers.anilist.provider import formatter
+from animeippo.providers.mappers import SelectorMapper
 from tests import test_data
 
 
@@ -19,6 +20,29 @@ def test_dataframe_can_be_constructed_from_ani():
     assert len(data) == 2
 
 
+def test_empty_watchlist_can_be_constructed():
+    data = formatter.transform_watchlist_data({"data": []}, anilist_data.ALL_TAGS)
+
+    assert len(data) == 0
+    assert "user_status" in data.columns
+
+
+def test_watchlist_is_assembled_from_entries_and_media():
+    original = formatter.normalize_watchlist_data(
+        {"data": test_data.ANI_USER_LIST["data"]["MediaListCollection"]["lists"][1]["entries"]}
+    )
+
+    entries = formatter.transform_watchlist_entries(original)
+    media = formatter.transform_media_data(original, anilist_data.ALL_TAGS)
+
+    data = formatter.assemble_watchlist(entries, media.reverse())
+
+    assert entries.columns == ["id", "user_status", "score", "user_complete_date", "updated_at"]
+    assert "user_status" not in media.columns
+    assert data["id"].to_list() == entries["id"].to_list()
+    assert data["title"].to_list() == ["Dr. STRONK: OLD WORLD", "Argo Roxy"]
+
+
 def test_franchise_column_is_built_from_relations():
     animelist = {
         "data": test_data.ANI_USER_LIST["data"]["MediaListCollection"]["lists"][1]["entries"]
@@ -35,14 +59,25 @@ def test_franchise_column_is_built_from_relations():
     assert franchises[0] == franchises[1]
 
 
-def test_extract_recommendations_without_column():
+def test_recommendations_without_column():
     df = pl.DataFrame({"id": [1, 2]})
-    result = formatter.extract_recommendations(df)
+    mapper = SelectorMapper(formatter.get_recommendations())
+    result = df.with_columns(recommendations=mapper.expression(df.columns))["recommendations"]
 
     assert len(result) == 2
     assert result[0] is None
 
 
+def test_anilist_mapping_is_memoised_per_tag_lookup():
+    tag_lookup = anilist_data.ALL_TAGS
+
+    mapping = formatter.get_anilist_mapping(tag_lookup)
+
+    assert formatter.get_anilist_mapping(tag_lookup) is mapping
+    assert formatter.get_anilist_mapping({}) is not mapping
+    assert "feature_info" not in formatter.ANILIST_MAPPING
+
+
 def test_get_staff_extracts_directors():
     original = pl.DataFrame(
         {
@@ -1,8 +1,16 @@
+import copy
+from unittest import mock
+
 import aiohttp
+import polars as pl
 import pytest
+from polars.testing import assert_frame_equal
 
 import animeippo.providers.anilist.connection
-from animeippo.providers import anilist
+from animeippo.cache import keys
+from animeippo.providers import anilist, caching
+from animeippo.providers.abstract_provider import QueryProfile
+from animeippo.providers.anilist.connection import RATE_LIMIT_WINDOW
 from tests import test_data
 
 
@@ -52,6 +60,422 @@ async def test_ani_user_anime_list_can_be_fetched(mocker):
     assert "Dr. STRONK: OLD WORLD" in animelist["title"]
 
 
+class SyncCacheStub:
+    def __init__(self):
+        self.documents = {}
+        self.frames = {}
+
+    def is_available(self):
+        return True
+
+    def get_json(self, key):
+        return self.documents.get(key)
+
+    def set_json(self, key, value, ttl=None):
+        self.documents[key] = value
+
+    def get_json_many(self, keys):
+        return [self.documents.get(key) for key in keys]
+
+    def set_json_many(self, values, ttl=None):
+        self.documents.update(values)
+
+    def get_dataframe(self, key):
+        return self.frames.get(key)
+
+    def set_dataframe(self, key, dataframe, ttl=None):
+        self.frames[key] = dataframe
+
+    def increment(self, key, field, amount=1):
+        self.documents[key] = self.documents.get(key, 0) + amount
+
+
+def _watchlist_entries():
+    entries = copy.deepcopy(
+        test_data.ANI_USER_LIST["data"]["MediaListCollection"]["lists"][1]["entries"]
+    )
+    for updated_at, entry in zip([100, 200], entries, strict=True):
+        entry["updatedAt"] = updated_at
+
+    return entries
+
+
+def _collection(entries):
+    return {"data": {"MediaListCollection": {"lists": [{"entries": entries}]}}}
+
+
+def _delta_page(entries):
+    return {"data": {"Page": {"mediaList": entries}}}
+
+
+def _listing(entries, custom=()):
+    def updates(listed):
+        return [
+            {"mediaId": entry["media"]["id"], "updatedAt": entry["updatedAt"]} for entry in listed
+        ]
+
+    return {
+        "data": {
+            "MediaListCollection": {
+                "lists": [
+                    {"isCustomList": False, "entries": updates(entries)},
+                    {"isCustomList": True, "entries": updates(custom)},
+                ]
+            }
+        }
+    }
+
+
+def _other_entry():
+    entry = copy.deepcopy(_watchlist_entries()[0])
+    entry["media"]["id"] = 999999
+    entry["updatedAt"] = 300
+
+    return entry
+
+
+def _age_sync_state(cache, days, full_sync_days=None):
+    for key, state in cache.documents.items():
+        if key.endswith(":sync"):
+            state["synced_at"] -= days * 86400
+            state["full_synced_at"] -= (full_sync_days or days) * 86400
+
+
+@pytest.mark.asyncio
+async def test_ani_user_anime_entries_are_synced_incrementally(mocker):
+    cache = SyncCacheStub()
+    provider = anilist.AniListProvider(cache, incremental_sync=True)
+
+    entries = _watchlist_entries()
+    changed = copy.deepcopy(entries[1])
+    changed["score"] = 3
+    changed["updatedAt"] = 300
+
+    request_single = mocker.patch.object(
+        provider.connection,
+        "request_single",
+        side_effect=[
+            _collection(entries),
+            _listing([entries[0], changed]),
+            _delta_page([changed]),
+        ],
+    )
+
+    first = await provider.get_user_anime_entries("Janiskeisari")
+    _age_sync_state(cache, days=2)
+    second = await provider.get_user_anime_entries("Janiskeisari")
+
+    listing_query = request_single.call_args_list[1].args[1]
+    assert "WatchlistMedia" not in listing_query
+    assert request_single.call_args.args[2]["mediaIds"] == [changed["media"]["id"]]
+    assert sorted(second["id"].to_list()) == sorted(first["id"].to_list())
+    assert second.filter(pl.col("id") == entries[1]["media"]["id"])["score"].to_list() == [3]
+    assert second["updated_at"].max() == 300
+
+
+@pytest.mark.asyncio
+async def test_ani_user_anime_entries_only_on_custom_lists_are_not_counted(mocker):
+    cache = SyncCacheStub()
+    provider = anilist.AniListProvider(cache, incremental_sync=True)
+    entries = _watchlist_entries()
+
+    # Hidden from the status lists, so it's only on a custom list
+    request_single = mocker.patch.object(
+        provider.connection,
+        "request_single",
+        side_effect=[_collection(entries), _listing(entries, custom=[_other_entry()])],
+    )
+
+    first = await provider.get_user_anime_entries("Janiskeisari")
+    _age_sync_state(cache, days=2)
+    second = await provider.get_user_anime_entries("Janiskeisari")
+
+    assert request_single.call_count == 2
+    assert_frame_equal(second, first)
+
+
+@pytest.mark.asyncio
+async def test_ani_user_anime_entries_sync_deleted_and_added_entries(mocker):
+    cache = SyncCacheStub()
+    provider = anilist.AniListProvider(cache, incremental_sync=True)
+    entries = _watchlist_entries()
+    added = _other_entry()
+
+    request_single = mocker.patch.object(
+        provider.connection,
+        "request_single",
+        side_effect=[
+            _collection(entries),
+            _listing([entries[0], added]),
+            _delta_page([added]),
+        ],
+    )
+
+    await provider.get_user_anime_entries("Janiskeisari")
+    _age_sync_state(cache, days=2)
+    synced = await provider.get_user_anime_entries("Janiskeisari")
+
+    assert request_single.call_count == 3
+    assert sorted(synced["id"].to_list()) == sorted([entries[0]["media"]["id"], 999999])
+
+
+@pytest.mark.asyncio
+async def test_missing_user_is_not_requested_again(mocker):
+    provider = anilist.AniListProvider(SyncCacheStub())
+    not_found = aiohttp.ClientResponseError(
+        request_info=aiohttp.RequestInfo(
+            url="https://fake", method="POST", headers={}, real_url="https://fake"
+        ),
+        history=(),
+        status=404,
+        message="Not Found.",
+    )
+
+    request_single = mocker.patch.object(
+        provider.connection, "request_single", side_effect=not_found
+    )
+
+    for _ in range(2):
+        with pytest.raises(aiohttp.ClientResponseError) as error:
+            await provider.get_user_anime_entries("Missing")
+
+        assert error.value.status == 404
+
+    assert request_single.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_ani_user_anime_entries_are_not_requested_when_fresh(mocker):
+    provider = anilist.AniListProvider(SyncCacheStub())
+
+    request_single = mocker.patch.object(
+        provider.connection, "request_single", return_value=_collection(_watchlist_entries())
+    )
+
+    first = await provider.get_user_anime_entries("Janiskeisari")
+    second = await provider.get_user_anime_entries("Janiskeisari")
+
+    assert request_single.call_count == 1
+    assert_frame_equal(first, second)
+
+
+@pytest.mark.asyncio
+async def test_ani_user_anime_entries_are_synced_while_refreshing(mocker):
+    provider = anilist.AniListProvider(SyncCacheStub(), incremental_sync=True)
+    entries = _watchlist_entries()
+
+    request_single = mocker.patch.object(
+        provider.connection,
+        "request_single",
+        side_effect=[_collection(entries), _listing(entries)],
+    )
+
+    await provider.get_user_anime_entries("Janiskeisari")
+
+    with caching.refreshing_user_data():
+        await provider.get_user_anime_entries("Janiskeisari")
+
+    assert request_single.call_count == 2
+    assert "mediaId" in request_single.call_args.args[1]
+
+
+@pytest.mark.asyncio
+async def test_ani_user_anime_entries_of_another_format_are_listed_again(mocker):
+    cache = SyncCacheStub()
+    provider = anilist.AniListProvider(cache)
+    entries = _watchlist_entries()
+
+    request_single = mocker.patch.object(
+        provider.connection, "request_single", return_value=_collection(entries)
+    )
+
+    with mock.patch.object(keys, "format_fingerprint", return_value="older"):
+        first = await provider.get_user_anime_entries("Janiskeisari")
+
+    listed = await provider.get_user_anime_entries("Janiskeisari")
+
+    assert_frame_equal(listed, first)
+    assert request_single.call_count == 2
+    assert len(cache.frames) == 2
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    ("batch_size", "delta_page"),
+    [
+        # The changed entry isn't returned
+        (50, _delta_page([])),
+        (0, None),
+    ],
+)
+async def test_ani_user_anime_entries_fall_back_to_full_sync_for_untrusted_delta(
+    mocker, batch_size, delta_page
+):
+    cache = SyncCacheStub()
+    provider = anilist.AniListProvider(cache, incremental_sync=True)
+    entries = _watchlist_entries()
+    collection = _collection(entries)
+    listing = _listing([entries[0], _other_entry()])
+    responses = [collection, listing, delta_page, collection]
+
+    mocker.patch("animeippo.providers.anilist.provider.ID_BATCH_SIZE", batch_size)
+    request_single = mocker.patch.object(
+        provider.connection,
+        "request_single",
+        side_effect=[response for response in responses if response is not None],
+    )
+
+    await provider.get_user_anime_entries("Janiskeisari")
+    _age_sync_state(cache, days=2)
+    synced = await provider.get_user_anime_entries("Janiskeisari")
+
+    assert "WatchlistEntry" in request_single.call_args.args[1]
+    assert "MediaListCollection" in request_single.call_args.args[1]
+    assert len(synced) == 2
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(("incremental_sync", "full_sync_days"), [(False, None), (True, 30)])
+async def test_ani_user_anime_entries_are_fully_synced(mocker, incremental_sync, full_sync_days):
+    cache = SyncCacheStub()
+    provider = anilist.AniListProvider(cache, incremental_sync=incremental_sync)
+
+    request_single = mocker.patch.object(
+        provider.connection, "request_single", return_value=_collection(_watchlist_entries())
+    )
+
+    await provider.get_user_anime_entries("Janiskeisari")
+    _age_sync_state(cache, days=2, full_sync_days=full_sync_days)
+    await provider.get_user_anime_entries("Janiskeisari")
+
+    assert request_single.call_count == 2
+    assert "WatchlistEntry" in request_single.call_args.args[1]
+
+
+@pytest.mark.asyncio
+async def test_ani_user_anime_list_requests_only_profile_fields(mocker):
+    request_single = mocker.patch(
+        "animeippo.providers.anilist.connection.AnilistConnection.request_single",
+        return_value=_collection(_watchlist_entries()),
+    )
+
+    analysed = await anilist.AniListProvider().get_user_anime_list(
+        "Janiskeisari", QueryProfile.ANALYSE
+    )
+    analyse_query = request_single.call_args.args[1]
+    stats = await anilist.AniListProvider().get_user_anime_list(
+        "Janiskeisari", QueryProfile.PROFILE_STATS
+    )
+    stats_query = request_single.call_args.args[1]
+
+    assert "recommendations" not in analyse_query
+    assert "tags" in analyse_query
+    assert "tags" not in stats_query
+    assert "genres" in stats_query
+    assert stats["genres"].to_list() == analysed["genres"].to_list()
+    assert stats["user_status"].to_list() == analysed["user_status"].to_list()
+
+
+@pytest.mark.asyncio
+async def test_ani_user_anime_list_slimmer_profile_is_served_from_fuller_media(mocker):
+    provider = anilist.AniListProvider(SyncCacheStub())
+
+    request_single = mocker.patch.object(
+        provider.connection, "request_single", return_value=_collection(_watchlist_entries())
+    )
+
+    full = await provider.get_user_anime_list("Janiskeisari")
+    stats = await provider.get_user_anime_list("Janiskeisari", QueryProfile.PROFILE_STATS)
+
+    assert request_single.call_count == 1
+    assert_frame_equal(stats, full)
+
+
+@pytest.mark.asyncio
+async def test_ani_user_anime_list_fuller_profile_requests_media_by_id(mocker):
+    provider = anilist.AniListProvider(SyncCacheStub())
+    entries = _watchlist_entries()
+
+    request_single = mocker.patch.object(
+        provider.connection,
+        "request_single",
+        side_effect=[
+            _collection(entries),
+            {"data": {"Page": {"media": [entry["media"] for entry in entries]}}},
+        ],
+    )
+
+    await provider.get_user_anime_list("Janiskeisari", QueryProfile.PROFILE_STATS)
+    full = await provider.get_user_anime_list("Janiskeisari")
+
+    assert "recommendations" in request_single.call_args.args[1]
+    assert request_single.call_args.args[2]["id_in"] == sorted(full["id"].to_list())
+    assert full["tags"].list.len().min() > 0
+
+
+@pytest.mark.asyncio
+async def test_ani_user_anime_list_is_listed_again_when_media_is_mostly_missing(mocker):
+    mocker.patch("animeippo.providers.anilist.provider.ID_BATCH_SIZE", 1)
+    provider = anilist.AniListProvider(SyncCacheStub())
+
+    request_single = mocker.patch.object(
+        provider.connection, "request_single", return_value=_collection(_watchlist_entries())
+    )
+
+    await provider.get_user_anime_list("Janiskeisari", QueryProfile.PROFILE_STATS)
+    await provider.get_user_anime_list("Janiskeisari")
+
+    assert request_single.call_count == 2
+    assert "MediaListCollection" in request_single.call_args.args[1]
+    assert "recommendations" in request_single.call_args.args[1]
+
+
+@pytest.mark.asyncio
+async def test_ani_user_anime_list_stores_media_of_every_response(mocker):
+    provider = anilist.AniListProvider()
+    entries = _watchlist_entries()
+    renamed = copy.deepcopy(entries)
+    renamed[0]["media"]["title"]["romaji"] = "Renamed"
+
+    mocker.patch.object(
+        provider.connection,
+        "request_single",
+        side_effect=[_collection(entries), _collection(renamed)],
+    )
+
+    await provider.get_user_anime_entries("Janiskeisari")
+    await provider.get_user_anime_entries("Janiskeisari")
+    rows = await provider.find_media([renamed[0]["media"]["id"]], QueryProfile.FULL)
+
+    assert [row["title"] for row in rows.values()] == ["Renamed"]
+
+
+@pytest.mark.asyncio
+async def test_ani_user_anime_list_requests_media_missing_from_store(mocker):
+    provider = anilist.AniListProvider()
+
+    response = ResponseStub(test_data.ANI_USER_LIST)
+    mocker.patch("aiohttp.ClientSession.post", return_value=response)
+
+    first = await provider.get_user_anime_list("Janiskeisari")
+    entries = await provider.get_user_anime_entries("Janiskeisari")
+
+    provider.media_stores[QueryProfile.FULL].local.clear()
+    media = [
+        entry["media"]
+        for entry in test_data.ANI_USER_LIST["data"]["MediaListCollection"]["lists"][1]["entries"]
+    ]
+    request_single = mocker.patch.object(
+        provider.connection, "request_single", return_value={"data": {"Page": {"media": media}}}
+    )
+    mocker.patch.object(provider, "get_user_anime_entries", return_value=entries)
+
+    second = await provider.get_user_anime_list("Janiskeisari")
+
+    assert request_single.call_args.args[2]["id_in"] == sorted(entries["id"].to_list())
+    assert_frame_equal(second, first, check_row_order=False)
+
+
 @pytest.mark.asyncio
 async def test_ani_seasonal_anime_list_can_be_fetched(mocker):
     provider = anilist.AniListProvider()
@@ -284,6 +708,21 @@ async def test_rate_limit_warning_logged_when_remaining_low(mocker):
     assert connection.rate_limit == 90
 
 
+@pytest.mark.asyncio
+async def test_background_work_waits_for_rate_limit_window(mocker):
+    sleep = mocker.patch("asyncio.sleep", return_value=None)
+    connection = animeippo.providers.anilist.AnilistConnection()
+    connection.rate_remaining = 40
+
+    assert not connection.has_capacity(0.5)
+    assert connection.has_capacity(0.4)
+
+    await connection.wait_for_window()
+
+    sleep.assert_called_once_with(RATE_LIMIT_WINDOW)
+    assert connection.has_capacity(1.0)
+
+
 @pytest.mark.asyncio
 async def test_rate_limit_retries_on_429(mocker):
     rate_limited_stub = ResponseStub({"data": None})
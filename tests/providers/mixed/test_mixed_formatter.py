@@ -1,7 +1,22 @@
+import polars as pl
+
 from animeippo.providers.mixed import formatter
 
 
 def test_get_adaptation():
-    assert formatter.get_adaptation([{"relationType": "ADAPTATION", "node": {"idMal": [31]}}]) == [
-        [31]
-    ]
+    original = pl.DataFrame(
+        {
+            "relations.edges": [
+                [
+                    {"relationType": "ADAPTATION", "node": {"id": 1, "idMal": 31}},
+                    {"relationType": "ADAPTATION", "node": {"id": 2, "idMal": None}},
+                    {"relationType": "PREQUEL", "node": {"id": 3, "idMal": 33}},
+                ],
+                [],
+            ]
+        }
+    )
+
+    actual = original.select(formatter.get_adaptation()).to_series()
+
+    assert actual.to_list() == [[31], []]
@@ -1,3 +1,5 @@
+import copy
+
 import pytest
 
 from animeippo.providers import mixed
@@ -24,6 +26,26 @@ class ResponseStub:
         pass
 
 
+class MediaStoreCacheStub:
+    def __init__(self):
+        self.documents = {}
+
+    def is_available(self):
+        return True
+
+    def get_dataframe(self, key):
+        return None
+
+    def set_dataframe(self, key, dataframe, ttl=None):
+        pass
+
+    def get_json_many(self, keys):
+        return [self.documents.get(key) for key in keys]
+
+    def set_json_many(self, values, ttl=None):
+        self.documents.update(values)
+
+
 @pytest.mark.asyncio
 async def test_mixed_provider_user_anime_can_be_fetched(mocker):
     provider = mixed.MixedProvider()
@@ -46,6 +68,12 @@ async def test_mixed_provider_user_anime_can_be_fetched(mocker):
     del provider.ani_provider.connection
 
 
+def test_mixed_provider_shares_anilist_rate_limit():
+    provider = mixed.MixedProvider()
+
+    assert provider.connection is provider.ani_provider.connection
+
+
 @pytest.mark.asyncio
 async def test_mixed_provider_returns_None_with_empty_parameters():
     provider = mixed.MixedProvider()
@@ -116,6 +144,31 @@ async def test_mixed_provider_user_manga_can_be_fetched(mocker):
     assert 9 in user_manga["score"].to_list()
 
 
+@pytest.mark.asyncio
+async def test_mixed_provider_only_requests_unknown_mal_ids_from_anilist(mocker):
+    provider = mixed.MixedProvider(MediaStoreCacheStub())
+
+    mal_list = copy.deepcopy(test_data.MIXED_USER_LIST_MAL)
+    unknown = copy.deepcopy(mal_list["data"][0])
+    unknown["node"]["id"] = 999999
+    mal_list["data"].append(unknown)
+
+    request_single = mocker.patch.object(
+        provider.ani_provider.connection,
+        "request_single",
+        return_value=test_data.MIXED_USER_LIST_ANI,
+    )
+    mocker.patch.object(provider.mal_connection, "request_anime_list", return_value=mal_list)
+
+    first = await provider.get_user_anime_list(1)
+    second = await provider.get_user_anime_list(1)
+
+    assert request_single.call_count == 1
+    assert request_single.call_args.args[2]["idMal_in"] == [30, 270, 999999]
+    assert sorted(second["title"].to_list()) == sorted(first["title"].to_list())
+    assert len(second) == 2
+
+
 def test_mixed_provider_related_anime_returns_none():
     provider = mixed.MixedProvider()
 
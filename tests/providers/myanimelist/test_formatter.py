@@ -1,3 +1,6 @@
+import copy
+import datetime
+
 import polars as pl
 
 from animeippo.providers.myanimelist import formatter
@@ -27,50 +30,58 @@ def test_dataframe_can_be_constructed_from_incomplete_data():
     assert "Hellsingfårs" in data["title"].to_list()
 
 
-def test_mal_genres_can_be_split():
-    original = [
-        {"id": 1, "name": "Action"},
-        {"id": 50, "name": "Adult Cast"},
-        {"id": 58, "name": "Gore"},
-        {"id": 14, "name": "Horror"},
-        {"id": 42, "name": "Seinen"},
-        {"id": 37, "name": "Supernatural"},
-        {"id": 32, "name": "Vampire"},
-    ]
-
-    actual = formatter.split_id_name_field(original)
+def test_missing_genres_and_studios_are_empty():
+    animelist = copy.deepcopy(test_data.MAL_USER_LIST)
 
-    expected = ["Action", "Adult Cast", "Gore", "Horror", "Seinen", "Supernatural", "Vampire"]
+    del animelist["data"][0]["node"]["genres"]
+    del animelist["data"][0]["node"]["studios"]
 
-    assert actual == expected
+    data = formatter.transform_watchlist_data(animelist)
 
+    assert data["genres"][0].to_list() == []
+    assert data["studios"][0].to_list() == []
 
-def test_get_continuation():
-    relation = "prequel"
-    cid = 123
 
-    assert formatter.get_continuation(relation, cid) == (123,)
+def test_mal_genres_can_be_split():
+    original = pl.DataFrame(
+        {
+            "node.genres": [
+                [
+                    {"id": 1, "name": "Action"},
+                    {"id": 50, "name": "Adult Cast"},
+                    {"id": 58, "name": "Gore"},
+                ],
+                None,
+            ]
+        }
+    )
 
-    relation = "irrelevant"
+    actual = original.select(formatter.split_id_name_field("node.genres")).to_series()
 
-    assert formatter.get_continuation(relation, cid) == (None,)
+    assert actual.to_list() == [["Action", "Adult Cast", "Gore"], []]
 
 
-def test_get_image_url():
-    field = {"medium": "test"}
+def test_get_continuation():
+    original = pl.DataFrame(
+        {"relation_type": ["prequel", "irrelevant", None], "node.id": [123, 456, 789]}
+    )
 
-    assert formatter.get_image_url(field) == "test"
+    actual = original.select(formatter.get_continuation()).to_series()
 
-    assert formatter.get_image_url({}) is None
+    assert actual.to_list() == [123, None, None]
 
 
 def test_get_user_complete_date():
-    assert formatter.get_user_complete_date("2020-03-12") is not None
+    original = pl.DataFrame({"finish_date": ["2020-03-12", None, "2020-03"]})
 
-    assert formatter.get_user_complete_date(None) is None
+    actual = original.select(formatter.get_user_complete_date("finish_date")).to_series()
+
+    assert actual.to_list() == [datetime.date(2020, 3, 12), None, None]
 
 
 def test_get_status():
-    assert formatter.get_status("currently_airing") == "RELEASING"
+    original = pl.DataFrame({"status": ["currently_airing", "invalid", None]})
+
+    actual = original.select(formatter.get_status("status")).to_series()
 
-    assert formatter.get_status("invalid") == "invalid"
+    assert actual.to_list() == ["RELEASING", "invalid", None]
@@ -80,3 +80,33 @@ def test_multi_mapper_default_works():
     actual = pl.DataFrame().with_columns(test=mapper.map(original))
 
     assert actual["test"].to_list() == [0, 4, 5]
+
+
+def test_query_mapper_returns_null_for_missing_columns():
+    mapper = animeippo.providers.mappers.QueryMapper(lambda df: df["missing"])
+
+    original = pl.DataFrame({"test": [1, 2, 3]})
+    actual = pl.DataFrame({"existing": [1, 2, 3]}).with_columns(test=mapper.map(original))
+
+    assert actual["test"].to_list() == [None, None, None]
+
+
+def test_selector_mapper():
+    mapper = animeippo.providers.mappers.SelectorMapper(pl.col("test") * 2)
+
+    original = pl.DataFrame({"test": [1, 2, 3]})
+
+    assert mapper.map(original).to_list() == [2, 4, 6]
+    assert original.select(mapper.expression(original.columns))["test"].to_list() == [2, 4, 6]
+
+
+def test_selector_mapper_returns_null_for_missing_columns():
+    mapper = animeippo.providers.mappers.SelectorMapper(pl.col("missing") * 2)
+
+    original = pl.DataFrame({"test": [1, 2, 3]})
+    actual = original.with_columns(
+        mapped=mapper.map(original), expressed=mapper.expression(original.columns)
+    )
+
+    assert actual["mapped"].to_list() == [None, None, None]
+    assert actual["expressed"].to_list() == [None, None, None]
@@ -0,0 +1,109 @@
+from datetime import timedelta
+from unittest import mock
+
+import pytest
+from polars.testing import assert_frame_equal
+
+from animeippo.cache import keys
+from animeippo.providers import media_store, util
+from animeippo.providers.anilist import data, formatter
+from animeippo.providers.anilist.schema import ANI_MEDIA_SCHEMA
+from animeippo.providers.media_store import MediaStore
+from tests import test_data
+
+
+class CacheStub:
+    def __init__(self):
+        self.documents = {}
+
+    def is_available(self):
+        return True
+
+    def get_json_many(self, keys):
+        return [self.documents.get(key) for key in keys]
+
+    def set_json_many(self, values, ttl=None):
+        self.documents.update(values)
+
+
+def _media():
+    entries = test_data.ANI_USER_LIST["data"]["MediaListCollection"]["lists"][1]["entries"]
+    original = formatter.normalize_watchlist_data({"data": entries})
+
+    return formatter.transform_media_data(original, data.ALL_TAGS)
+
+
+@pytest.mark.asyncio
+async def test_media_rows_can_be_stored_and_retrieved():
+    store = MediaStore(None, "test", timedelta(days=1))
+    media = _media()
+
+    await store.put(media)
+    rows = await store.find([*media["id"].to_list(), 999999])
+    actual = util.frame_from_rows(list(rows.values()), ANI_MEDIA_SCHEMA)
+
+    assert_frame_equal(actual, media)
+
+
+@pytest.mark.asyncio
+async def test_media_rows_are_shared_through_cache():
+    cache = CacheStub()
+    media = _media()
+
+    await MediaStore(cache, "test", timedelta(days=1)).put(media)
+    store = MediaStore(cache, "test", timedelta(days=1))
+
+    rows = await store.find(media["id"].to_list())
+    actual = util.frame_from_rows(list(rows.values()), ANI_MEDIA_SCHEMA)
+
+    assert_frame_equal(actual, media)
+    assert list(store.local) == media["id"].to_list()
+    assert all(key.startswith("test:") for key in cache.documents)
+
+
+@pytest.mark.asyncio
+async def test_local_media_rows_expire_and_are_evicted():
+    media = _media()
+
+    expired = MediaStore(None, "test", timedelta(0))
+    await expired.put(media)
+
+    small = MediaStore(None, "test", timedelta(days=1), local_size=1)
+    await small.put(media)
+
+    assert await expired.find(media["id"].to_list()) == {}
+    assert list(await small.find(media["id"].to_list())) == media["id"].to_list()[-1:]
+
+
+@pytest.mark.asyncio
+async def test_media_rows_of_another_format_are_misses():
+    cache = CacheStub()
+    media = _media()
+
+    with mock.patch.object(keys, "format_fingerprint", return_value="older"):
+        namespace = keys.make_key("anilist", keys.Kind.MEDIA, "full")
+        await MediaStore(cache, namespace, timedelta(days=1)).put(media)
+
+    store = MediaStore(cache, keys.make_key("anilist", keys.Kind.MEDIA, "full"), timedelta(days=1))
+
+    assert await store.find(media["id"].to_list()) == {}
+
+
+@pytest.mark.asyncio
+async def test_local_media_rows_are_kept_briefly(mocker):
+    cache = CacheStub()
+    media = _media()
+    ids = media["id"].to_list()
+    monotonic = mocker.patch.object(media_store.time, "monotonic", return_value=0)
+
+    await MediaStore(cache, "test", timedelta(days=7)).put(media)
+    store = MediaStore(cache, "test", timedelta(days=7), local_ttl=timedelta(minutes=5))
+    await store.find(ids)
+    cache.documents.clear()
+
+    monotonic.return_value = 4 * 60
+    assert list(await store.find(ids)) == ids
+
+    # Local copies don't outlast a cleared cache by long
+    monotonic.return_value = 6 * 60
+    assert await store.find(ids) == {}
@@ -1,6 +1,6 @@
 import polars as pl
 
-from animeippo.providers import util
+from animeippo.providers import mappers, util
 
 
 class StubMapper:
@@ -72,6 +72,16 @@ def test_build_franchise_ids_external_relations_dont_form_franchise():
     assert len(result[1]) == 0
 
 
+def test_build_franchise_ids_links_through_external_relations():
+    """Anime sharing a relation outside the watchlist are the same franchise."""
+    ids = pl.Series("id", [7, 3, 5], dtype=pl.UInt32)
+    relations = pl.Series("rels", [[99], [99], None])
+
+    result = util.build_franchise_ids(ids, relations)
+
+    assert result.to_list() == [["franchise_3"], ["franchise_3"], []]
+
+
 def test_clustering_ranks_with_only_genres():
     df = pl.DataFrame(
         {
@@ -90,7 +100,7 @@ def test_clustering_ranks_with_only_genres():
         }
     )
     result = util.get_clustering_ranks(df)
-    assert len(result) == 1
+    assert result.to_list() == [[{"name": "Action", "weight": 0.0}]]
 
 
 def test_clustering_ranks_with_only_tags():
@@ -111,7 +121,30 @@ def test_clustering_ranks_with_only_tags():
         }
     )
     result = util.get_clustering_ranks(df)
-    assert len(result) == 1
+    assert result.to_list() == [[{"name": "Gore", "weight": 127.5}]]
+
+
+def test_clustering_ranks_are_sparse():
+    df = pl.DataFrame(
+        {
+            "id": [1, 2, 3],
+            "feature_info": [
+                [
+                    {"name": "Action", "rank": None, "category": "Genre"},
+                    {"name": "Gore", "rank": 60, "category": "Cast-Main Cast"},
+                ],
+                [{"name": "Drama", "rank": None, "category": "Genre"}],
+                [],
+            ],
+        }
+    )
+    result = util.get_clustering_ranks(df)
+
+    assert result.to_list() == [
+        [{"name": "Gore", "weight": 90.0}, {"name": "Action", "weight": 200.0}],
+        [{"name": "Drama", "weight": 200.0}],
+        [],
+    ]
 
 
 def test_transformation_does_not_fail_with_empty_data():
@@ -123,3 +156,46 @@ def test_transformation_does_not_fail_with_empty_data():
     data = util.transform_to_animeippo_format(pl.DataFrame({"data": {"test": "test"}}), {}, {})
     assert type(data) is pl.DataFrame
     assert len(data) == 0
+
+
+def test_normalize_json_flattens_nested_objects():
+    schema = {
+        "id": pl.Int64,
+        "title": pl.Struct({"romaji": pl.Utf8}),
+        "studios": pl.Struct({"edges": pl.List(pl.Struct({"name": pl.Utf8}))}),
+    }
+    records = [
+        {"id": 1, "title": {"romaji": "A"}, "studios": {"edges": [{"name": "S"}]}, "x": 1},
+        {"id": 2},
+    ]
+
+    result = util.normalize_json(records, schema)
+
+    assert result.columns == ["id", "title.romaji", "studios.edges"]
+    assert result["title.romaji"].to_list() == ["A", None]
+    assert result["studios.edges"].to_list() == [[{"name": "S"}], None]
+
+
+def test_normalize_json_with_empty_records():
+    result = util.normalize_json([], {"id": pl.Int64, "title": pl.Struct({"romaji": pl.Utf8})})
+
+    assert result.columns == ["id", "title.romaji"]
+    assert len(result) == 0
+
+
+def test_mapping_plan_evaluates_expressions_and_queries_in_mapping_order():
+    mapping = {
+        "doubled": mappers.SelectorMapper(pl.col("a") * 2),
+        "queried": mappers.QueryMapper(lambda df: df["a"] + 1),
+        "missing": mappers.DefaultMapper("not_there", 5),
+        "skipped": mappers.DefaultMapper("a"),
+    }
+    schema = {"queried": pl.Int64, "doubled": pl.Int64, "missing": pl.UInt8}
+
+    plan = util.get_mapping_plan(mapping, schema)
+    actual = plan.run(pl.DataFrame({"a": [1, 2]}))
+
+    assert util.get_mapping_plan(mapping, schema) is plan
+    assert actual.columns == ["doubled", "queried", "missing"]
+    assert actual.rows() == [(2, 2, 5), (4, 3, 5)]
+    assert actual.schema["missing"] == pl.UInt8
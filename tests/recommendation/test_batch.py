@@ -0,0 +1,157 @@
+import aiohttp
+import polars as pl
+import pytest
+
+from animeippo.profiling.model import UserProfile
+from animeippo.providers.anilist import connection as connection_module
+from animeippo.recommendation import batch, recommender
+from animeippo.recommendation.model import RecommendationModel
+from tests.recommendation.test_engine import ProviderStub
+
+
+class EngineStub:
+    def fit_predict(self, dataset):
+        return dataset.seasonal.with_columns(discovery_score=pl.col("popularity") / 10)
+
+    def categorize_anime(self, dataset):
+        return [{"name": "Top Picks", "items": dataset.recommendations["id"].to_list()}]
+
+
+class FailingProviderStub(ProviderStub):
+    def __init__(self, errors):
+        super().__init__()
+        self.errors = errors
+
+    async def get_user_anime_list(self, user, *args, **kwargs):
+        if user in self.errors:
+            raise self.errors[user]
+
+        return await super().get_user_anime_list()
+
+
+def _recommender(provider):
+    return recommender.AnimeRecommender(
+        provider=provider,
+        engine=EngineStub(),
+        recommendation_model_cls=RecommendationModel,
+        profile_model_cls=UserProfile,
+    )
+
+
+def _response_error(status):
+    return aiohttp.ClientResponseError(None, (), status=status)
+
+
+@pytest.mark.asyncio
+async def test_users_get_a_result_row_each():
+    provider = FailingProviderStub(
+        {
+            "missing": _response_error(404),
+            "throttled": _response_error(429),
+            "empty": RuntimeError("No list data"),
+            "broken": ValueError("Bad data"),
+        }
+    )
+    rec = _recommender(provider)
+    season_data = await rec.get_season("2013", "winter")
+
+    users = ["Janiskeisari", "missing", "throttled", "empty", "broken"]
+    rows = await batch.recommend_users(rec, season_data, users, top=1)
+
+    assert [row["user"] for row in rows] == users
+    assert [row["status"] for row in rows] == ["ok", "not_found", "error", "not_found", "error"]
+
+    shows = rows[0]["shows"]
+    assert len(shows) == 1
+    assert shows[0].keys() == batch.SHOW_SCHEMA.keys()
+    assert shows[0]["id"] == season_data.item(0, "id")
+    assert rows[0]["categories"] == [{"name": "Top Picks", "items": season_data["id"].to_list()}]
+    assert rows[1]["shows"] is None
+
+
+@pytest.mark.asyncio
+async def test_users_are_started_within_the_workers_share_of_the_rate_limit(mocker):
+    sleep = mocker.patch.object(connection_module.asyncio, "sleep", mocker.AsyncMock())
+    monotonic = mocker.patch.object(batch.time, "monotonic", return_value=0)
+    connection = connection_module.AnilistConnection()
+    provider = ProviderStub()
+    provider.connection = connection
+    rec = _recommender(provider)
+    season_data = await rec.get_season("2013", "winter")
+
+    # Two workers may each spend a quarter of the limit per window
+    budget = batch.rate_budget(rec, workers=2)
+    connection.requests = 22
+    await budget.wait()
+    sleep.assert_not_awaited()
+
+    connection.requests = 23
+    await batch.recommend_users(rec, season_data, ["Janiskeisari"], budget=budget)
+    sleep.assert_awaited_once_with(connection_module.RATE_LIMIT_WINDOW)
+
+    # Others have spent the rest of the window, apart from the reserve
+    connection.rate_remaining = 40
+    await budget.wait()
+    assert sleep.await_count == 2
+
+    # A new window has started without waiting
+    connection.requests += 30
+    monotonic.return_value = connection_module.RATE_LIMIT_WINDOW
+    await budget.wait()
+    assert sleep.await_count == 2
+
+
+def test_providers_without_rate_limit_have_no_budget():
+    assert batch.rate_budget(_recommender(ProviderStub()), workers=2) is None
+
+
+def test_top_shows_fills_missing_fields():
+    shows = batch.top_shows(pl.DataFrame({"id": [3, 2, 1], "title": ["c", "b", "a"]}), top=2)
+
+    assert shows == [
+        {**dict.fromkeys(batch.SHOW_SCHEMA), "id": 3, "title": "c"},
+        {**dict.fromkeys(batch.SHOW_SCHEMA), "id": 2, "title": "b"},
+    ]
+
+
+def _rows(*statuses):
+    shows = [dict.fromkeys(batch.SHOW_SCHEMA) | {"id": 1, "discovery_score": 0.5}]
+    categories = [{"name": "Top Picks", "items": [1]}]
+
+    return [batch.result(user, status, shows, categories) for user, status in statuses]
+
+
+@pytest.mark.parametrize("file_format", batch.FILE_FORMATS)
+def test_output_parts_record_finished_users(tmp_path, file_format):
+    output = batch.BatchOutput(tmp_path / "results", file_format)
+
+    assert output.finished_users() == set()
+    assert output.read().schema == pl.Schema(batch.RESULT_SCHEMA)
+
+    output.write(_rows(("first", "ok"), ("second", "error")))
+    last = output.write(_rows(("third", "not_found")))
+
+    assert last.name == f"part-00001.{file_format}"
+    assert not list(output.directory.glob("*.tmp"))
+
+    results = batch.BatchOutput(tmp_path / "results", file_format).read()
+
+    assert results["user"].to_list() == ["first", "second", "third"]
+    assert results.schema == pl.Schema(batch.RESULT_SCHEMA)
+    assert results.item(0, "shows")[0]["discovery_score"] == 0.5
+    assert output.finished_users() == {"first", "second", "third"}
+    assert output.finished_users(retry_failed=True) == {"first", "third"}
+
+
+def test_output_continues_after_last_part(tmp_path):
+    output = batch.BatchOutput(tmp_path)
+    output.write(_rows(("first", "ok")))
+    output.write(_rows(("second", "ok")))
+    output.parts()[0].unlink()
+
+    assert output.write(_rows(("third", "ok"))).name == "part-00002.parquet"
+
+
+def test_output_rejects_unknown_format(tmp_path):
+    with pytest.raises(ValueError, match="csv"):
+        batch.BatchOutput(tmp_path, "csv")
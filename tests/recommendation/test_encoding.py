@@ -27,3 +27,24 @@ def test_weighted_encoder():
 
     actual = encoder.encode(original).struct.unnest().fill_null(0).to_numpy()[0]
     assert actual.tolist() == [0, 50, 85]
+
+
+def test_weighted_encoder_with_sparse_ranks():
+    classes = pl.Series(["Test 1", "Test 2", "Test 3"])
+
+    encoder = WeightedCategoricalEncoder()
+    encoder.fit(classes)
+
+    original = pl.DataFrame(
+        {
+            "features": [["Test 3", "Test 2"], ["Test 2"], []],
+            "clustering_ranks": [
+                [{"name": "Test 3", "weight": 127.5}, {"name": "Test 2", "weight": None}],
+                [{"name": "Test 2", "weight": 50.0}],
+                [],
+            ],
+        }
+    )
+
+    actual = encoder.encode(original).struct.unnest().fill_null(0).to_numpy()
+    assert actual.tolist() == [[0, 0, 127], [0, 50, 0], [0, 0, 0]]
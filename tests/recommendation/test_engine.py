@@ -1,6 +1,9 @@
+import tracemalloc
+
 import polars as pl
 import pytest
 
+from animeippo import memory
 from animeippo.analysis import encoding
 from animeippo.clustering import model as clustering
 from animeippo.profiling.model import UserProfile
@@ -198,6 +201,7 @@ def test_categorize():
     assert len(cats) > 0
     assert cats[0].get("name", False)
     assert cats[1].get("items", False)
+    assert list(recengine.iter_categorize_anime(data)) == cats
 
 
 def test_categorize_raises_error_without_ranking_orchestrator():
@@ -210,3 +214,40 @@ def test_categorize_raises_error_without_ranking_orchestrator():
 
     with pytest.raises(RuntimeError, match="No ranking orchestrator configured"):
         recengine.categorize_anime(data)
+
+    with pytest.raises(RuntimeError, match="No ranking orchestrator configured"):
+        recengine.iter_categorize_anime(data)
+
+
+@pytest.mark.asyncio
+async def test_fit_predict_records_memory_by_stage():
+    provider = ProviderStub()
+    data = RecommendationModel(
+        UserProfile("Test", await provider.get_user_anime_list()),
+        await provider.get_seasonal_anime_list(),
+    )
+
+    recengine = engine.AnimeRecommendationEngine(
+        clustering.AnimeClustering(), encoding.CategoricalEncoder()
+    )
+    scorer = scoring.FeatureCorrelationScorer()
+    recengine.add_scorer(scorer)
+
+    memory.enable()
+    try:
+        with memory.tracking() as tracker:
+            recengine.fit_predict(data)
+    finally:
+        tracemalloc.stop()
+
+    assert tracker.stages.keys() == {
+        "prepare",
+        "encode",
+        "cluster",
+        "similarity",
+        "score",
+        f"scorer_{scorer.name}",
+        "predict",
+        "funnel",
+    }
+    assert tracker.stages["score"]["peak"] >= tracker.stages[f"scorer_{scorer.name}"]["peak"]
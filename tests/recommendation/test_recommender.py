@@ -15,6 +15,9 @@ class EngineStub:
     def categorize_anime(self, dataset):
         return [[1, 2, 3]]
 
+    def iter_categorize_anime(self, dataset):
+        yield from self.categorize_anime(dataset)
+
 
 class SimpleProviderStub:
     """Provider stub without async context manager methods."""
@@ -104,6 +107,7 @@ async def test_recommender_categories():
 
     assert len(categories) > 0
     assert categories == [[1, 2, 3]]
+    assert list(rec.iter_categories(data)) == categories
 
 
 @pytest.mark.asyncio
@@ -211,3 +215,22 @@ async def test_recommender_context_manager_without_provider_context_manager():
         assert rec.engine is not None
 
     # No errors should occur - the hasattr checks should handle this gracefully
+
+
+@pytest.mark.asyncio
+async def test_recommender_can_recommend_from_a_shared_season():
+    provider = ProviderStub()
+
+    rec = recommender.AnimeRecommender(
+        provider=provider,
+        engine=EngineStub(),
+        recommendation_model_cls=RecommendationModel,
+        profile_model_cls=UserProfile,
+        fetch_related_anime=True,
+    )
+    season_data = await rec.get_season("2013", "winter")
+    data = await rec.recommend_from_season(season_data, "Janiskeisari")
+
+    assert data.seasonal["continuation_to"].to_list()[0] == [1]
+    assert data.user_profile.user == "Janiskeisari"
+    assert data.recommendations["id"].to_list() == season_data["id"].to_list()[::-1]
@@ -54,6 +54,18 @@ def test_builder_with_available_cache(mocker):
     )
 
 
+def test_recommenders_can_share_a_cache(mocker):
+    connect = mocker.patch("animeippo.cache.RedisCache")
+    shared_cache = CacheStub()
+
+    anilist = recommender_builder.build_recommender("anilist", shared_cache)
+    mixed = recommender_builder.build_recommender("mixed", shared_cache)
+
+    assert anilist.provider.cache is shared_cache
+    assert mixed.provider.cache is shared_cache
+    connect.assert_not_called()
+
+
 def test_debug_category_is_included_when_debug_env_is_set(monkeypatch):
     """Test that DebugCategory is prepended in all layouts when DEBUG=true."""
     monkeypatch.setenv("DEBUG", "true")
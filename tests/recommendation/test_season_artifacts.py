@@ -0,0 +1,74 @@
+import polars as pl
+import pytest
+
+from animeippo.cache import keys
+from animeippo.cache.redis_cache import RedisCache
+from animeippo.profiling.model import UserProfile
+from animeippo.providers.anilist import data, formatter
+from animeippo.recommendation import recommender, season_artifacts
+from animeippo.recommendation.model import RecommendationModel
+from tests.cache.test_cache import RedisStub
+from tests.performance.synthetic import PayloadGenerator
+from tests.recommendation.test_engine import ProviderStub
+from tests.recommendation.test_recommender import EngineStub
+
+
+def _seasonal():
+    pl.enable_string_cache()
+
+    return formatter.transform_seasonal_data(PayloadGenerator().seasonal(20), data.ALL_TAGS)
+
+
+class CachedProviderStub(ProviderStub):
+    def __init__(self, seasonal, cache):
+        super().__init__(cache=cache)
+        self.seasonal_data = seasonal
+
+    async def get_seasonal_anime_list(self, *args, **kwargs):
+        return self.seasonal_data
+
+
+def test_prepared_season_has_dense_ranks_and_show_metadata():
+    seasonal = _seasonal()
+    prepared = season_artifacts.prepare(seasonal)
+
+    assert isinstance(prepared["clustering_ranks"].dtype, pl.Struct)
+    assert {"moods", "intensity_score"} <= set(prepared.columns)
+    assert prepared["id"].to_list() == seasonal["id"].to_list()
+    # Preparing twice changes nothing
+    assert season_artifacts.prepare(prepared.drop("moods", "intensity_score")).equals(prepared)
+
+
+@pytest.mark.asyncio
+async def test_recommender_uses_stored_season(mocker):
+    mocker.patch("redis.Redis", RedisStub)
+    seasonal = _seasonal()
+    provider = CachedProviderStub(seasonal, RedisCache())
+
+    rec = recommender.AnimeRecommender(
+        provider=provider,
+        engine=EngineStub(),
+        recommendation_model_cls=RecommendationModel,
+        profile_model_cls=UserProfile,
+    )
+
+    assert (await rec.get_season("2025", "winter")).equals(seasonal)
+
+    prepared = await season_artifacts.store(provider, "2025", "winter", seasonal)
+
+    assert (await rec.get_season("2025", "winter")).equals(prepared)
+    assert await season_artifacts.load(provider, "2025", "spring") is None
+    assert season_artifacts.artifact_key(provider, "2025", None) == keys.make_key(
+        "CachedProviderStub", keys.Kind.SEASON_ARTIFACTS, "2025:"
+    )
+
+
+@pytest.mark.asyncio
+async def test_season_is_prepared_without_cache():
+    seasonal = _seasonal()
+    provider = CachedProviderStub(seasonal, None)
+
+    prepared = await season_artifacts.store(provider, "2025", "winter", seasonal)
+
+    assert "intensity_score" in prepared.columns
+    assert await season_artifacts.load(provider, "2025", "winter") is None
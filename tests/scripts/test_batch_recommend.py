@@ -0,0 +1,66 @@
+import polars as pl
+
+from animeippo.scripts import batch_recommend
+from tests.recommendation.test_batch import FailingProviderStub, _recommender, _response_error
+
+
+def _users_file(tmp_path, *lines):
+    path = tmp_path / "users.txt"
+    path.write_text("\n".join(lines))
+
+    return path
+
+
+def _run(tmp_path, users_file, mocker, provider, *extra):
+    mocker.patch.object(
+        batch_recommend.recommender_builder,
+        "build_recommender",
+        side_effect=lambda *args: _recommender(provider),
+    )
+    output = tmp_path / "results"
+    argv = [str(users_file), "--year", "2013", "--output", str(output), "--workers", "0"]
+
+    return batch_recommend.main([*argv, "--chunk-size", "2", *extra]), output
+
+
+def test_users_are_read_in_order_without_duplicates(tmp_path):
+    users_file = _users_file(tmp_path, "first", "", "# skipped", " second ", "first")
+
+    assert batch_recommend.read_users(users_file) == ["first", "second"]
+    assert batch_recommend.chunked(["a", "b", "c"], 2) == [["a", "b"], ["c"]]
+
+
+def test_batch_writes_a_part_per_chunk_and_resumes(tmp_path, mocker):
+    users_file = _users_file(tmp_path, "first", "second", "broken")
+    provider = FailingProviderStub({"broken": _response_error(500)})
+
+    exit_code, output = _run(tmp_path, users_file, mocker, provider)
+    results = pl.read_parquet(output / "part-*.parquet")
+
+    assert exit_code == 0
+    assert sorted(path.name for path in output.iterdir()) == [
+        "part-00000.parquet",
+        "part-00001.parquet",
+        batch_recommend.SEASON_FILE,
+    ]
+    assert results["status"].to_list() == ["ok", "ok", "error"]
+
+    # Finished users are skipped, failed ones only when asked to
+    provider.errors = {}
+    assert _run(tmp_path, users_file, mocker, provider)[0] == 0
+    assert len(list(output.glob("part-*"))) == 2
+
+    _run(tmp_path, users_file, mocker, provider, "--retry-failed")
+    results = pl.read_parquet(output / "part-00002.parquet")
+
+    assert results.select("user", "status").rows() == [("broken", "ok")]
+
+
+def test_batch_fails_without_season(tmp_path, mocker):
+    provider = FailingProviderStub({})
+    mocker.patch.object(provider, "get_seasonal_anime_list", return_value=None)
+
+    exit_code, output = _run(tmp_path, _users_file(tmp_path, "first"), mocker, provider)
+
+    assert exit_code == 1
+    assert not list(output.iterdir())
@@ -0,0 +1,59 @@
+from unittest import mock
+
+import pytest
+
+from animeippo.cache import keys
+from animeippo.scripts import clear_cache
+from tests.cache.test_cache import RedisStub
+
+
+@pytest.fixture
+def redis_stub(mocker):
+    stub = RedisStub()
+    stub.set(keys.make_key("anilist", keys.Kind.SEASONAL, "get_seasonal_anime_list:2025:"), b"")
+    stub.set(keys.make_key("anilist", keys.Kind.USER_LIST, "entries", user="tester"), b"")
+    stub.set("get_user_watchlist tester_MixedProvider", b"")
+    mocker.patch("redis.Redis", return_value=stub)
+
+    return stub
+
+
+def test_selected_entries_are_cleared_and_reported(redis_stub, capsys):
+    assert clear_cache.main(["--user", "Tester", "--legacy"]) == 0
+
+    output = capsys.readouterr().out
+    assert "Removed 2 keys" in output
+    assert "user_list" in output
+    assert list(redis_stub.plainstore) == [
+        keys.make_key("anilist", keys.Kind.SEASONAL, "get_seasonal_anime_list:2025:")
+    ]
+
+
+def test_stale_clears_entries_of_an_old_formatter(redis_stub, capsys):
+    with mock.patch.object(keys, "format_fingerprint", return_value="older"):
+        old_key = keys.make_key("anilist", keys.Kind.SEASONAL, "get_seasonal_anime_list:2025:")
+    redis_stub.set(old_key, b"")
+
+    assert clear_cache.main(["--stale"]) == 0
+
+    assert "Removed 1 keys" in capsys.readouterr().out
+    assert old_key not in redis_stub.plainstore
+    assert len(redis_stub.plainstore) == 3
+
+
+def test_dry_run_removes_nothing(redis_stub, capsys):
+    assert clear_cache.main(["--all", "--dry-run"]) == 0
+
+    assert "Would remove 2 keys" in capsys.readouterr().out
+    assert len(redis_stub.plainstore) == 3
+
+
+def test_something_must_be_selected(redis_stub):
+    with pytest.raises(SystemExit):
+        clear_cache.main([])
+
+
+def test_unavailable_redis_fails(redis_stub):
+    redis_stub.available = False
+
+    assert clear_cache.main(["--all"]) == 1
@@ -0,0 +1,173 @@
+import aiohttp
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from animeippo.providers.anilist import connection as anilist_connection
+from animeippo.providers.myanimelist import connection as mal_connection
+from animeippo.scripts import mock_upstream
+from animeippo.scripts.mock_upstream import Fixtures, MockUpstream
+
+QUERY = "query ($page: Int) { Page(page: $page) { media { id } } }"
+
+
+def _record_anilist(fixtures, query, variables, body):
+    key = mock_upstream.anilist_key({"query": query, "variables": variables})
+    fixtures.save("anilist", key, 200, {"X-RateLimit-Limit": "90"}, body)
+
+
+@pytest.mark.asyncio
+async def test_recorded_anilist_responses_are_replayed(tmp_path, mocker):
+    fixtures = Fixtures(tmp_path)
+    _record_anilist(fixtures, QUERY, {"page": 1}, {"data": {"Page": {"media": [{"id": 1}]}}})
+
+    async with TestServer(MockUpstream(Fixtures(tmp_path), rate_limit=10).app()) as server:
+        mocker.patch.object(anilist_connection, "ANI_API_URL", str(server.make_url("/anilist")))
+        connection = anilist_connection.AnilistConnection()
+
+        async with aiohttp.ClientSession() as session:
+            # Whitespace in the query doesn't matter
+            result = await connection.request_single(session, "  " + QUERY, {"page": 1})
+
+            with pytest.raises(aiohttp.ClientResponseError) as error:
+                await connection.request_single(session, QUERY, {"page": 2})
+
+    assert result == {"data": {"Page": {"media": [{"id": 1}]}}}
+    assert error.value.status == 404
+    assert connection.rate_limit == 10
+    assert connection.rate_remaining == 8
+
+
+@pytest.mark.asyncio
+async def test_anilist_rate_limit_is_emulated(tmp_path):
+    fixtures = Fixtures(tmp_path)
+    _record_anilist(fixtures, QUERY, {}, {"data": {}})
+
+    async with TestServer(MockUpstream(fixtures, rate_limit=1).app()) as server:
+        async with aiohttp.ClientSession() as session:
+            payload = {"query": QUERY, "variables": {}}
+
+            async with session.post(server.make_url("/anilist"), json=payload) as first:
+                assert first.status == 200
+                assert first.headers["X-RateLimit-Remaining"] == "0"
+
+            async with session.post(server.make_url("/anilist"), json=payload) as second:
+                assert second.status == 429
+                assert 0 < int(second.headers["Retry-After"]) <= 60
+
+
+@pytest.mark.asyncio
+async def test_mal_pages_are_replayed_through_mock(tmp_path, mocker):
+    fixtures = Fixtures(tmp_path)
+    next_url = f"{mock_upstream.MAL_URL}/users/test/animelist?limit=1&offset=1"
+
+    fixtures.save(
+        "mal",
+        mock_upstream.mal_key("users/test/animelist", {"limit": "1"}),
+        200,
+        {},
+        {"data": [{"node": {"id": 1}}], "paging": {"next": next_url}},
+    )
+    fixtures.save(
+        "mal",
+        mock_upstream.mal_key("users/test/animelist", {"limit": "1", "offset": "1"}),
+        200,
+        {},
+        {"data": [{"node": {"id": 2}}], "paging": {}},
+    )
+
+    async with TestServer(MockUpstream(fixtures, latency=1, jitter=1).app()) as server:
+        mocker.patch.object(mal_connection, "MAL_API_URL", str(server.make_url("/mal")))
+        mocker.patch.object(mal_connection, "MAL_REQUEST_INTERVAL", 0)
+
+        result = await mal_connection.MyAnimeListConnection().request_anime_list(
+            "/users/test/animelist", {"limit": "1"}
+        )
+
+    assert result == {"data": [{"node": {"id": 1}}, {"node": {"id": 2}}]}
+
+
+@pytest.mark.asyncio
+async def test_responses_are_recorded_through_mock(tmp_path, mocker):
+    upstream_fixtures = Fixtures(tmp_path / "upstream")
+    _record_anilist(upstream_fixtures, QUERY, {"page": 1}, {"data": {"Page": {"media": []}}})
+    upstream_fixtures.save(
+        "mal",
+        mock_upstream.mal_key("users/test/animelist", {}),
+        200,
+        {},
+        {"data": [], "paging": {}},
+    )
+
+    async with TestServer(MockUpstream(upstream_fixtures).app()) as upstream:
+        recorder = MockUpstream(
+            Fixtures(tmp_path / "recorded"),
+            record=True,
+            upstreams={
+                "anilist": str(upstream.make_url("/anilist")),
+                "mal": str(upstream.make_url("/mal")),
+            },
+        )
+
+        async with TestServer(recorder.app()) as server:
+            mocker.patch.object(anilist_connection, "ANI_API_URL", str(server.make_url("/anilist")))
+            mocker.patch.object(mal_connection, "MAL_API_URL", str(server.make_url("/mal")))
+
+            async with aiohttp.ClientSession() as session:
+                await anilist_connection.AnilistConnection().request_single(
+                    session, QUERY, {"page": 1}
+                )
+
+            await mal_connection.MyAnimeListConnection().request_anime_list(
+                "/users/test/animelist", {}
+            )
+
+    recorded = Fixtures(tmp_path / "recorded")
+
+    assert recorded.responses.keys() == upstream_fixtures.responses.keys()
+    assert len(list((tmp_path / "recorded" / "anilist").glob("*.json"))) == 1
+
+
+@pytest.mark.asyncio
+async def test_upstream_errors_are_passed_through_without_recording(tmp_path):
+    async def unavailable(request):
+        return web.Response(text="Service Unavailable", status=503)
+
+    failing = web.Application()
+    failing.add_routes([web.post("/anilist", unavailable)])
+    failing.add_routes([web.get("/mal/{path:.*}", unavailable)])
+
+    async with TestServer(failing) as upstream:
+        recorder = MockUpstream(
+            Fixtures(tmp_path),
+            record=True,
+            upstreams={
+                "anilist": str(upstream.make_url("/anilist")),
+                "mal": str(upstream.make_url("/mal")),
+            },
+        )
+
+        async with TestServer(recorder.app()) as server, aiohttp.ClientSession() as session:
+            payload = {"query": QUERY, "variables": {}}
+
+            async with session.post(server.make_url("/anilist"), json=payload) as response:
+                assert response.status == 503
+                assert await response.text() == "Service Unavailable"
+
+            async with session.get(server.make_url("/mal/users/test/animelist")) as response:
+                assert response.status == 503
+
+    assert not list(tmp_path.glob("*/*.json"))
+
+
+@pytest.mark.asyncio
+async def test_mal_token_refresh_is_refused(tmp_path, mocker):
+    async with TestServer(MockUpstream(Fixtures(tmp_path)).app()) as server:
+        mocker.patch.object(mal_connection, "MAL_AUTH_URL", str(server.make_url("/mal-auth")))
+        persist_tokens = mocker.patch.object(mal_connection.MyAnimeListConnection, "persist_tokens")
+
+        with pytest.raises(aiohttp.ClientResponseError) as error:
+            await mal_connection.MyAnimeListConnection().do_token_refresh()
+
+    assert error.value.status == 401
+    persist_tokens.assert_not_called()
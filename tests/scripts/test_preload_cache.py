@@ -0,0 +1,98 @@
+import asyncio
+from unittest.mock import AsyncMock
+
+import pytest
+
+from animeippo.cache.redis_cache import RedisCache
+from animeippo.providers.anilist.connection import AnilistConnection
+from animeippo.scripts import preload_cache
+from tests.cache.test_cache import RedisStub
+from tests.recommendation.test_season_artifacts import _seasonal
+
+
+class SeasonalProviderStub:
+    def __init__(self, connection, failing=(), load=None):
+        self.cache = None
+        self.connection = connection
+        self.failing = set(failing)
+        self.requests = []
+        # Requests running at once, shared between providers
+        self.load = load if load is not None else {"running": 0, "most": 0}
+
+    async def get_seasonal_anime_list(self, year, season):
+        self.requests.append((year, season))
+        self.load["running"] += 1
+        self.load["most"] = max(self.load["most"], self.load["running"])
+
+        await asyncio.sleep(0)
+        self.load["running"] -= 1
+
+        if season in self.failing:
+            raise ValueError("Failed")
+
+        return _seasonal()
+
+
+@pytest.fixture
+def progress(mocker):
+    mocker.patch("redis.Redis", RedisStub)
+
+    return preload_cache.Progress(RedisCache(), "2025-01-01")
+
+
+@pytest.mark.asyncio
+async def test_items_are_loaded_concurrently_and_resumed(progress):
+    connection = AnilistConnection()
+    load = {"running": 0, "most": 0}
+    providers = {
+        "anilist": SeasonalProviderStub(connection, failing={"FALL"}, load=load),
+        "mixed": SeasonalProviderStub(connection, load=load),
+    }
+    items = preload_cache.get_items(providers, [2025])
+
+    failed = await preload_cache.preload_items(providers, items, progress, concurrency=2)
+
+    assert len(items) == 2 * len(preload_cache.SEASONS)
+    assert failed == ["anilist 2025 FALL"]
+    assert load["most"] == 2
+    assert progress.done["mixed 2025 year"]["count"] == 20
+    assert progress.done["anilist 2025 WINTER"].keys() == {"fetch", "prepare", "count"}
+
+    # A new run only loads what failed
+    providers["anilist"].failing = set()
+    resumed = preload_cache.Progress(progress.cache, "2025-01-01")
+
+    assert resumed.done.keys() == progress.done.keys()
+
+    assert await preload_cache.preload_items(providers, items, resumed) == []
+    assert providers["anilist"].requests[-1] == ("2025", "FALL")
+    assert len(providers["anilist"].requests) == len(preload_cache.SEASONS) + 1
+    assert len(resumed.done) == len(items)
+
+
+@pytest.mark.asyncio
+async def test_items_wait_for_rate_limit(progress, mocker):
+    connection = AnilistConnection()
+    connection.rate_remaining = 1
+    wait = mocker.patch.object(
+        connection,
+        "wait_for_window",
+        AsyncMock(side_effect=lambda: setattr(connection, "rate_remaining", 90)),
+    )
+    providers = {"anilist": SeasonalProviderStub(connection)}
+    items = [preload_cache.PreloadItem("anilist", 2025, None)]
+
+    assert await preload_cache.preload_items(providers, items, progress) == []
+    wait.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_missing_season_is_a_failure(progress, mocker):
+    provider = SeasonalProviderStub(AnilistConnection())
+    mocker.patch.object(provider, "get_seasonal_anime_list", AsyncMock(return_value=None))
+    items = [preload_cache.PreloadItem("anilist", 2025, "WINTER")]
+
+    failed = await preload_cache.preload_items({"anilist": provider}, items, progress)
+
+    assert failed == ["anilist 2025 WINTER"]
+    assert not progress.done
@@ -0,0 +1,168 @@
+import asyncio
+import time
+
+import pytest
+
+from animeippo.admission import AdmissionLimiter, AdmissionMiddleware, Overloaded, admit
+
+
+async def _hold(limiter, started, release):
+    await limiter.acquire()
+    start = time.monotonic()
+
+    try:
+        started.set()
+        await release.wait()
+    finally:
+        limiter.finish(start)
+
+
+@pytest.mark.asyncio
+async def test_requests_over_concurrency_wait_for_a_slot():
+    limiter = AdmissionLimiter(1, queue_size=1, queue_timeout=1)
+    started, release = asyncio.Event(), asyncio.Event()
+    first = asyncio.create_task(_hold(limiter, started, release))
+    await started.wait()
+
+    second_started = asyncio.Event()
+    second = asyncio.create_task(_hold(limiter, second_started, asyncio.Event()))
+    await asyncio.sleep(0)
+
+    assert len(limiter.waiters) == 1
+    assert not second_started.is_set()
+
+    release.set()
+    await first
+    await second_started.wait()
+
+    assert limiter.active == 1
+    assert limiter.service_time is not None
+
+    second.cancel()
+    await asyncio.gather(second, return_exceptions=True)
+
+    assert limiter.active == 0
+
+
+@pytest.mark.asyncio
+async def test_requests_over_queue_size_are_turned_away():
+    limiter = AdmissionLimiter(1, queue_size=0, queue_timeout=3)
+    started, release = asyncio.Event(), asyncio.Event()
+    task = asyncio.create_task(_hold(limiter, started, release))
+    await started.wait()
+
+    with pytest.raises(Overloaded) as overloaded:
+        await limiter.acquire()
+
+    release.set()
+    await task
+
+    assert overloaded.value.reason == "queue_full"
+    assert overloaded.value.retry_after == 3
+    assert limiter.active == 0
+
+
+@pytest.mark.asyncio
+async def test_requests_waiting_past_deadline_are_turned_away():
+    limiter = AdmissionLimiter(1, queue_size=2, queue_timeout=0.01)
+    limiter.record(4.0)
+    limiter.record(2.0)
+    await limiter.acquire()
+
+    with pytest.raises(Overloaded) as overloaded:
+        await limiter.acquire()
+
+    assert overloaded.value.reason == "queue_timeout"
+    assert overloaded.value.retry_after == 4
+    assert not limiter.waiters
+
+
+@pytest.mark.asyncio
+async def test_slot_handed_to_a_cancelled_waiter_is_passed_on():
+    limiter = AdmissionLimiter(1, queue_size=2, queue_timeout=1)
+    await limiter.acquire()
+
+    cancelled = asyncio.create_task(limiter.acquire())
+    admitted = asyncio.create_task(limiter.acquire())
+    await asyncio.sleep(0)
+
+    limiter.release()
+    cancelled.cancel()
+
+    with pytest.raises(asyncio.CancelledError):
+        await cancelled
+    await admitted
+
+    assert limiter.active == 1
+    assert not limiter.waiters
+
+
+def _endpoint(limiter, started):
+    async def endpoint(scope, receive, send):
+        await admit(scope, limiter)
+        assert limiter.active == 1
+        started.append(scope)
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"done"})
+
+    return endpoint
+
+
+@pytest.mark.asyncio
+async def test_slot_is_held_until_the_request_ends():
+    limiter = AdmissionLimiter(1)
+    started = []
+    sent = []
+
+    async def send(message):
+        sent.append(message["type"])
+
+    await AdmissionMiddleware(_endpoint(limiter, started))({"type": "http"}, None, send)
+
+    assert sent == ["http.response.start", "http.response.body"]
+    assert limiter.active == 0
+
+
+@pytest.mark.asyncio
+async def test_slot_is_released_when_the_client_is_gone_before_the_first_chunk():
+    limiter = AdmissionLimiter(1)
+    started = []
+
+    async def disconnected(message):
+        raise OSError("Connection reset by peer")
+
+    with pytest.raises(OSError, match="reset"):
+        await AdmissionMiddleware(_endpoint(limiter, started))({"type": "http"}, None, disconnected)
+
+    assert len(started) == 1
+    assert limiter.active == 0
+
+
+@pytest.mark.asyncio
+async def test_other_scopes_pass_through_admission():
+    scopes = []
+
+    async def app(scope, receive, send):
+        scopes.append(scope)
+
+    await AdmissionMiddleware(app)({"type": "lifespan"}, None, None)
+
+    assert scopes == [{"type": "lifespan"}]
+
+
+@pytest.mark.asyncio
+async def test_release_skips_waiters_cancelled_in_the_meantime():
+    limiter = AdmissionLimiter(1, queue_size=1, queue_timeout=1)
+    await limiter.acquire()
+
+    waiting = asyncio.create_task(limiter.acquire())
+    await asyncio.sleep(0)
+
+    waiting.cancel()
+    limiter.release()
+
+    with pytest.raises(asyncio.CancelledError):
+        await waiting
+
+    assert limiter.active == 0
+    assert not limiter.waiters
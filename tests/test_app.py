@@ -1,11 +1,21 @@
+import asyncio
+import json
+import tracemalloc
 from unittest.mock import AsyncMock, MagicMock
 
 import aiohttp
 import polars as pl
+import pyarrow as pa
+import pyarrow.parquet as pq
 import pytest
 from fastapi.testclient import TestClient
 
 import app as appmod
+from animeippo import memory, precompute
+from animeippo.admission import AdmissionLimiter
+from animeippo.cache.redis_cache import RedisCache
+from animeippo.providers.abstract_provider import QueryProfile
+from tests.cache.test_cache import RedisStub
 
 
 class MockDataset:
@@ -37,6 +47,7 @@ def client(monkeypatch):
     mock_profiler = MagicMock()
     mock_profiler.analyse = AsyncMock(return_value=(MockProfile(), [], None))
     mock_profiler.provider.get_genres.return_value = set()
+    mock_profiler.provider.get_user_anime_list = AsyncMock(return_value=MockProfile().watchlist)
 
     # Characteristics is computed in /profile route — mock it to avoid needing full data
     monkeypatch.setattr(
@@ -48,6 +59,7 @@ def client(monkeypatch):
         "app.recommenders", {"anilist": mock_recommender, "mixed": mock_recommender}
     )
     monkeypatch.setattr("app.profilers", {"anilist": mock_profiler, "mixed": mock_profiler})
+    monkeypatch.setattr("app.get_responses", lambda: precompute.ResponseCache(None))
 
     return TestClient(appmod.app, raise_server_exceptions=False)
 
@@ -108,6 +120,206 @@ def test_recommend_returns_200(client):
     assert response.status_code == 200
 
 
+def test_seasonal_and_recommend_negotiate_arrow_formats(client):
+    by_header = client.get(
+        "/seasonal?year=2025", headers={"Accept": "application/vnd.apache.arrow.stream"}
+    )
+    by_parameter = client.get("/recommend?user=Test&year=2025&format=parquet")
+
+    assert by_header.headers["content-type"] == "application/vnd.apache.arrow.stream"
+    assert pa.ipc.open_stream(by_header.content).read_all()["title"].to_pylist() == ["Test Anime"]
+    assert by_parameter.headers["content-type"] == "application/vnd.apache.parquet"
+    assert pq.read_table(pa.BufferReader(by_parameter.content))["id"].to_pylist() == [1]
+    assert client.get("/seasonal?year=2025&format=json").json()["data"]["shows"]
+
+
+def test_recommend_streams_categories_as_ndjson(client):
+    categories = [{"name": "Top", "items": [1]}, {"name": "Popular", "items": [1]}]
+    appmod.recommenders["anilist"].iter_categories.return_value = iter(categories)
+
+    response = client.get(
+        "/recommend?user=Test&year=2025", headers={"Accept": "application/x-ndjson"}
+    )
+    lines = [json.loads(line) for line in response.text.splitlines()]
+
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert lines[0]["shows"][0]["title"] == "Test Anime"
+    assert [line["category"] for line in lines[1:]] == categories
+    appmod.recommenders["anilist"].get_categories.assert_not_called()
+
+
+def test_admission_slot_is_released_after_streamed_body(client, monkeypatch):
+    limiter = AdmissionLimiter(1, queue_size=0)
+    monkeypatch.setattr("app.limiters", {"/recommend": limiter})
+    appmod.recommenders["anilist"].iter_categories.return_value = iter([])
+
+    assert client.get("/recommend?user=Test&year=2025&format=ndjson").status_code == 200
+    assert limiter.active == 0
+
+
+def test_zero_concurrency_disables_admission(client, monkeypatch):
+    limiter = AdmissionLimiter(0)
+    monkeypatch.setattr("app.limiters", {"/recommend": limiter})
+
+    assert client.get("/recommend?user=Test&year=2025").status_code == 200
+    assert limiter.active == 0
+
+
+def test_failing_request_releases_admission_slot(client, monkeypatch):
+    limiter = AdmissionLimiter(1, queue_size=0)
+    monkeypatch.setattr("app.limiters", {"/recommend": limiter})
+    appmod.recommenders["anilist"].recommend_seasonal_anime = AsyncMock(
+        side_effect=ValueError("boom")
+    )
+
+    assert client.get("/recommend?user=Test&year=2025").status_code == 500
+    assert limiter.active == 0
+
+
+def test_unknown_format_is_rejected(client):
+    assert client.get("/seasonal?year=2025&format=xml").status_code == 400
+    assert client.get("/recommend?user=Test&year=2025&format=xml").status_code == 400
+
+
+def test_providers_are_built_on_first_use_with_a_shared_cache(monkeypatch, mocker):
+    monkeypatch.setattr("app.recommenders", {})
+    monkeypatch.setattr("app.profilers", {})
+    shared_cache = object()
+    mocker.patch("app.get_cache", return_value=shared_cache)
+    build = mocker.patch.object(appmod.recommender_builder, "build_recommender")
+
+    mixed, _ = appmod.get_provider_instances("mixed")
+    assert appmod.get_provider_instances("mixed")[0] is mixed
+
+    anilist, profiler = appmod.get_provider_instances("unknown")
+
+    assert build.call_args_list == [
+        mocker.call("mixed", shared_cache),
+        mocker.call("anilist", shared_cache),
+    ]
+    assert appmod.recommenders == {"mixed": mixed, "anilist": anilist}
+    assert profiler.provider is anilist.provider
+
+
+def test_cache_is_connected_once(mocker):
+    build_cache = mocker.patch.object(appmod.recommender_builder, "build_cache")
+    appmod.get_cache.cache_clear()
+
+    try:
+        assert appmod.get_cache() is appmod.get_cache()
+    finally:
+        appmod.get_cache.cache_clear()
+
+    build_cache.assert_called_once()
+
+
+def test_precomputed_recommendations_are_served_once(client, monkeypatch, mocker):
+    mocker.patch("redis.Redis", RedisStub)
+    responses = precompute.ResponseCache(RedisCache())
+    monkeypatch.setattr("app.get_responses", lambda: responses)
+    request = precompute.RecommendRequest("Test", "anilist", "2025", None)
+    responses.store(request, b'{"data": {"precomputed": true}}')
+    recommend = appmod.recommenders["anilist"].recommend_seasonal_anime
+
+    assert client.get("/recommend?user=Test&year=2025&format=arrow").status_code == 200
+    assert client.get("/recommend?user=Test&year=2025").json() == {"data": {"precomputed": True}}
+    assert recommend.await_count == 1
+
+    assert "shows" in client.get("/recommend?user=Test&year=2025").json()["data"]
+    assert recommend.await_count == 2
+    # Unknown providers are recorded as the default one
+    client.get("/recommend?user=Other&year=2025&provider=unknown")
+    assert responses.recent(10) == [
+        precompute.RecommendRequest("Other", "anilist", "2025", None),
+        request,
+    ]
+
+
+def test_precomputed_recommendations_bypass_admission(client, monkeypatch, mocker):
+    mocker.patch("redis.Redis", RedisStub)
+    responses = precompute.ResponseCache(RedisCache())
+    monkeypatch.setattr("app.get_responses", lambda: responses)
+    limiter = AdmissionLimiter(1, queue_size=0)
+    monkeypatch.setattr("app.limiters", {"/recommend": limiter})
+    request = precompute.RecommendRequest("Test", "anilist", "2025", None)
+    responses.store(request, b'{"data": {"precomputed": true}}')
+
+    # A request already holds the only slot
+    limiter.active = 1
+
+    assert client.get("/recommend?user=Test&year=2025").json() == {"data": {"precomputed": True}}
+    assert client.get("/recommend?user=Test&year=2025").status_code == 503
+
+
+def test_precomputing_runs_in_the_background(client, monkeypatch, mocker):
+    started = []
+
+    async def run_daily(precomputer, hour):
+        started.append(hour)
+        await asyncio.Event().wait()
+
+    monkeypatch.setattr("app.PRECOMPUTE_HOUR", "4")
+    mocker.patch.object(appmod.precompute, "run_daily", run_daily)
+
+    with client:
+        assert client.get("/seasonal?year=2025").status_code == 200
+
+    assert started == [4]
+
+    monkeypatch.setattr("app.PRECOMPUTE_HOUR", None)
+
+    with client:
+        assert started == [4]
+
+
+def test_heavy_requests_over_limit_are_shed(client, monkeypatch):
+    limiter = AdmissionLimiter(1, queue_size=0, queue_timeout=2)
+    monkeypatch.setattr("app.limiters", {"/recommend": limiter})
+
+    assert client.get("/recommend?user=Test&year=2025").status_code == 200
+    assert limiter.active == 0
+
+    # A request already holds the only slot
+    limiter.active = 1
+    response = client.get("/recommend?user=Test&year=2025")
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+    assert client.get("/seasonal?year=2025").status_code == 200
+
+
+def test_invalid_requests_are_rejected_before_admission(client, monkeypatch):
+    limiter = AdmissionLimiter(1, queue_size=0)
+    monkeypatch.setattr("app.limiters", {"/recommend": limiter, "/analyse": limiter})
+
+    # A request already holds the only slot
+    limiter.active = 1
+
+    assert client.get("/recommend?year=2025").status_code == 400
+    assert client.get("/recommend?user=Test").status_code == 400
+    assert client.get("/analyse").status_code == 400
+    assert client.get("/analyse?user=Test").status_code == 503
+
+
+def test_request_memory_is_logged_by_stage(client, monkeypatch):
+    logger = MagicMock()
+    monkeypatch.setattr("app.MEMORY_TRACKING", True)
+    monkeypatch.setattr("app.logger", logger)
+
+    memory.enable()
+    try:
+        response = client.get("/recommend?user=Test&year=2025")
+    finally:
+        tracemalloc.stop()
+
+    completed = logger.info.call_args_list[-1]
+
+    assert response.status_code == 200
+    assert completed.args == ("request_completed",)
+    assert completed.kwargs["memory"].keys() == {"request", "view"}
+    assert completed.kwargs["max_rss_mb"] > 0
+
+
 def test_analyse_returns_200(client):
     response = client.get("/analyse?user=Test")
     assert response.status_code == 200
@@ -118,6 +330,13 @@ def test_profile_returns_200(client):
     assert response.status_code == 200
 
 
+def test_profile_requests_slim_watchlist(client):
+    client.get("/profile?user=Test")
+
+    get_user_anime_list = appmod.profilers["anilist"].provider.get_user_anime_list
+    assert get_user_anime_list.call_args.kwargs["profile"] == QueryProfile.PROFILE_STATS
+
+
 # --- User not found (API 404) ---
 
 
@@ -0,0 +1,86 @@
+import tracemalloc
+
+import numpy as np
+import pytest
+
+from animeippo import memory
+
+ARRAY_SIZE = 4 * memory.MB
+
+
+@pytest.fixture
+def tracing():
+    memory.enable()
+    yield
+    tracemalloc.stop()
+
+
+def _allocate():
+    array = np.ones(ARRAY_SIZE, dtype=np.uint8)
+    return int(array.sum())
+
+
+def test_stage_records_peak_of_released_allocations(tracing):
+    tracker = memory.MemoryTracker()
+
+    with tracker.stage("allocate"):
+        _allocate()
+
+    usage = tracker.stages["allocate"]
+
+    assert usage["peak"] >= ARRAY_SIZE
+    assert usage.keys() == {"peak", "arrow", "rss"}
+
+
+def test_outer_stage_peak_includes_inner_stages(tracing):
+    tracker = memory.MemoryTracker()
+
+    with tracker.stage("outer"):
+        with tracker.stage("inner"):
+            _allocate()
+
+        with tracker.stage("empty"):
+            pass
+
+    assert tracker.stages["outer"]["peak"] >= tracker.stages["inner"]["peak"] >= ARRAY_SIZE
+    assert tracker.stages["empty"]["peak"] < ARRAY_SIZE
+
+
+def test_nothing_is_recorded_without_tracing():
+    tracker = memory.MemoryTracker()
+
+    with tracker.stage("allocate"):
+        _allocate()
+
+    assert tracker.stages == {}
+
+
+def test_stages_are_recorded_to_current_tracker(tracing):
+    with memory.stage("untracked"):
+        _allocate()
+
+    with memory.tracking() as tracker:
+        with memory.stage("allocate"):
+            _allocate()
+
+    with memory.stage("untracked"):
+        pass
+
+    summary = tracker.summary()
+
+    assert summary.keys() == {"allocate"}
+    assert summary["allocate"]["peak"] >= ARRAY_SIZE / memory.MB
+
+
+def test_resident_memory_is_zero_without_proc(mocker, tmp_path):
+    mocker.patch.object(memory, "STATM_PATH", tmp_path / "statm")
+
+    assert memory.resident_memory() == 0
+    assert memory.max_resident_memory() > 0
+
+
+def test_enabling_twice_keeps_traces(tracing):
+    array = np.ones(ARRAY_SIZE, dtype=np.uint8)
+    memory.enable()
+
+    assert tracemalloc.get_traced_memory()[0] >= array.nbytes
@@ -0,0 +1,180 @@
+import asyncio
+import json
+import types
+from datetime import UTC, datetime
+from unittest.mock import AsyncMock, MagicMock
+
+import polars as pl
+import pytest
+
+from animeippo import precompute
+from animeippo.cache.redis_cache import RedisCache
+from animeippo.providers import caching
+from animeippo.providers.anilist import connection as connection_module
+from tests.cache.test_cache import RedisStub
+
+NOW = 1_000_000
+
+
+class DatasetStub:
+    def __init__(self, recommendations):
+        self.recommendations = recommendations
+        self.all_features = {"Action", "Ecchi"}
+        self.nsfw_tags = {"Ecchi"}
+
+
+def _responses(mocker):
+    mocker.patch("redis.Redis", RedisStub)
+
+    return precompute.ResponseCache(RedisCache())
+
+
+def _recommender(connection=None):
+    recommender = MagicMock()
+    recommender.provider = types.SimpleNamespace(connection=connection)
+    recommender.recommend_seasonal_anime = AsyncMock(
+        return_value=DatasetStub(pl.DataFrame({"id": [1], "title": ["Test"]}))
+    )
+    recommender.get_categories.return_value = [{"name": "Top Picks", "items": [1]}]
+
+    return recommender
+
+
+def test_recent_requests_are_most_recent_first(mocker):
+    responses = _responses(mocker)
+    first = precompute.RecommendRequest("first", "anilist", "2025", None)
+    second = precompute.RecommendRequest("second", "mixed", "2025", "winter")
+    old = precompute.RecommendRequest("old", "anilist", "2024", "fall")
+
+    responses.record(old, now=NOW - precompute.ACTIVITY_WINDOW.total_seconds() - 1)
+    responses.record(first, now=NOW - 10)
+    responses.record(second, now=NOW)
+
+    assert responses.recent(10, now=NOW) == [second, first]
+    assert responses.recent(1, now=NOW) == [second]
+
+
+def test_response_cache_does_nothing_without_cache():
+    responses = precompute.ResponseCache(None)
+    request = precompute.RecommendRequest("user", "anilist", "2025", None)
+
+    responses.record(request)
+
+    assert responses.recent(10) == []
+    assert responses.take(request) is None
+    assert not responses.lock("today", 60)
+
+
+@pytest.mark.asyncio
+async def test_precomputer_stores_payloads_of_recent_requests(mocker):
+    responses = _responses(mocker)
+    failing = precompute.RecommendRequest("failing", "anilist", "2025", None)
+    user = precompute.RecommendRequest("user", "anilist", "2025", "winter")
+    responses.record(failing)
+    responses.record(user)
+
+    recommender = _recommender()
+    dataset = await recommender.recommend_seasonal_anime()
+    recommender.recommend_seasonal_anime.side_effect = [dataset, ValueError("Failed")]
+
+    summary = await precompute.Precomputer(responses, lambda provider: recommender).run()
+    payload = json.loads(responses.take(user))
+
+    assert summary == {"requests": 2, "computed": 1, "failed": 1}
+    assert payload["data"]["tags"] == ["Action"]
+    assert payload["data"]["shows"] == [{"id": 1, "title": "Test"}]
+    assert responses.take(user) is None
+    assert responses.take(failing) is None
+    recommender.recommend_seasonal_anime.assert_any_await("2025", "winter", "user")
+
+
+@pytest.mark.asyncio
+async def test_payloads_are_computed_from_refreshed_user_lists():
+    refreshing = []
+    recommender = _recommender()
+    dataset = await recommender.recommend_seasonal_anime()
+
+    async def recommend(*args):
+        refreshing.append(caching.refreshing_users.get())
+        return dataset
+
+    recommender.recommend_seasonal_anime = recommend
+    request = precompute.RecommendRequest("user", "anilist", "2025", None)
+
+    await precompute.recommendation_payload(recommender, request)
+
+    assert refreshing == [True]
+    assert not caching.refreshing_users.get()
+
+
+@pytest.mark.asyncio
+async def test_precomputer_stops_when_budget_is_spent(mocker):
+    responses = _responses(mocker)
+    responses.record(precompute.RecommendRequest("user", "anilist", "2025", None))
+
+    recommender = _recommender()
+    summary = await precompute.Precomputer(
+        responses, lambda provider: recommender, max_seconds=-1
+    ).run()
+
+    assert summary["computed"] == 0
+    recommender.recommend_seasonal_anime.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_precomputer_leaves_rate_limit_to_users(mocker):
+    sleep = mocker.patch.object(connection_module.asyncio, "sleep", AsyncMock())
+    responses = _responses(mocker)
+    responses.record(precompute.RecommendRequest("user", "anilist", "2025", None))
+
+    connection = connection_module.AnilistConnection()
+    connection.rate_remaining = 10
+    recommender = _recommender(connection)
+    precomputer = precompute.Precomputer(responses, lambda provider: recommender)
+
+    assert (await precomputer.run())["computed"] == 1
+    sleep.assert_awaited_once_with(connection_module.RATE_LIMIT_WINDOW)
+    assert connection.rate_remaining == connection.rate_limit
+
+    # Waiting for the window would take past the deadline
+    connection.rate_remaining = 10
+    precomputer.max_seconds = connection_module.RATE_LIMIT_WINDOW - 1
+
+    assert (await precomputer.run())["computed"] == 0
+
+
+def test_seconds_until_next_hour():
+    assert precompute.seconds_until(4, datetime(2025, 1, 1, 3, 30, tzinfo=UTC)) == 1800
+    assert precompute.seconds_until(4, datetime(2025, 1, 1, 4, 0, tzinfo=UTC)) == 24 * 3600
+
+
+@pytest.mark.asyncio
+async def test_daily_run_is_done_by_one_worker(mocker):
+    responses = _responses(mocker)
+    workers = [AsyncMock(responses=responses), AsyncMock(responses=responses)]
+
+    for worker in workers:
+        # Wakes up once, then is cancelled while waiting for the next day
+        mocker.patch.object(
+            precompute.asyncio, "sleep", AsyncMock(side_effect=[None, asyncio.CancelledError])
+        )
+
+        with pytest.raises(asyncio.CancelledError):
+            await precompute.run_daily(worker, 4)
+
+    workers[0].run.assert_awaited_once()
+    workers[1].run.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_failed_day_does_not_stop_daily_runs(mocker):
+    worker = AsyncMock(responses=MagicMock())
+    worker.run.side_effect = [RuntimeError("Redis went away"), None]
+    mocker.patch.object(
+        precompute.asyncio, "sleep", AsyncMock(side_effect=[None, None, asyncio.CancelledError])
+    )
+
+    with pytest.raises(asyncio.CancelledError):
+        await precompute.run_daily(worker, 4)
+
+    assert worker.run.await_count == 2
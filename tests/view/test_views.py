@@ -1,6 +1,8 @@
 import json
 
 import polars as pl
+import pyarrow as pa
+import pyarrow.parquet as pq
 
 from animeippo.profiling import characteristics, model
 from animeippo.view import views
@@ -98,3 +100,60 @@ def test_recommendations_web_view_excludes_scorer_columns_in_normal_mode():
     assert "discovery_score" in shows[0]
     # Other scorer columns are NOT included in normal mode
     assert "directscore" not in shows[0]
+
+
+def test_profile_views_keep_field_order():
+    df = pl.DataFrame(test_data.FORMATTED_MAL_USER_LIST)
+    seasonal = pl.DataFrame(test_data.FORMATTED_MAL_SEASONAL_LIST)
+
+    result = json.loads(views.profile_cluster_web_view(df, [], seasonal=seasonal))
+
+    assert list(result["data"]["shows"][0]) == [
+        field for field in views.PROFILE_FIELDS if field in df.columns
+    ]
+    assert list(result["data"]["seasonal"][0]) == [
+        field for field in views.SEASONAL_FIELDS if field in seasonal.columns
+    ]
+
+
+def test_arrow_views_carry_categories_in_schema_metadata():
+    df = pl.DataFrame(test_data.FORMATTED_MAL_SEASONAL_LIST).with_columns(
+        discovery_score=pl.lit(0.8)
+    )
+    categories = [{"name": "Top", "items": [1]}]
+
+    stream = pa.ipc.open_stream(
+        views.recommendations_arrow_view(df, categories, ["Drama", "Action"])
+    ).read_all()
+    parquet = pq.read_table(
+        pa.BufferReader(views.recommendations_arrow_view(df, categories, file_format="parquet"))
+    )
+
+    assert stream.column_names == [
+        field for field in views.RECOMMENDATION_FIELDS if field in df.columns
+    ]
+    assert pl.from_arrow(stream)["title"].to_list() == df["title"].to_list()
+    assert json.loads(stream.schema.metadata[b"categories"]) == categories
+    assert json.loads(stream.schema.metadata[b"tags"]) == ["Action", "Drama"]
+    assert parquet.to_pylist() == stream.to_pylist()
+    assert json.loads(parquet.schema.metadata[b"categories"]) == categories
+
+
+def test_arrow_view_without_shows_has_only_metadata():
+    table = pa.ipc.open_stream(views.recommendations_arrow_view(None, ["Action"])).read_all()
+
+    assert table.num_columns == 0
+    assert json.loads(table.schema.metadata[b"categories"]) == ["Action"]
+
+
+def test_ndjson_view_sends_shows_before_each_category():
+    df = pl.DataFrame(test_data.FORMATTED_MAL_SEASONAL_LIST)
+    categories = [{"name": "Top", "items": [1]}, {"name": "Popular", "items": [2]}]
+
+    lines = views.recommendations_ndjson_view(df, iter(categories), ["Action"])
+    head = json.loads(next(lines))
+
+    assert head["shows"][0]["title"] == df[0]["title"].item()
+    assert head["tags"] == ["Action"]
+    assert [json.loads(line)["category"] for line in lines] == categories
+    assert list(json.loads(next(views.recommendations_ndjson_view(None, [])))) == ["tags"]